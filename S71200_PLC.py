@@ -1,38 +1,172 @@
-import snap7
-from snap7.util import get_bool, set_bool, get_string
-from snap7.type import Area
+# S71200_PLC.py
+#
+# Siemens S7-1200 access for the balance shield and the QR reader, through
+# one shared PLCConnection: it connects on first use (not at import), lets
+# one thread at a time talk to the PLC, and reconnects with backoff after
+# the connection drops.
+
+import os
+import threading
 import time
 
-# Connect to PLC
-plc = snap7.client.Client()
-plc.connect("192.168.1.1", 0, 1)  # Replace with your PLC's IP, rack, and slot
+try:
+    import snap7
+    from snap7.util import get_bool, set_bool, get_string
+    from snap7.type import Area
+except ImportError:  # reported on first use; importing this module never needs the PLC
+    snap7 = None
+
+PLC_HOST = os.environ.get("CSDF_PLC_HOST", "192.168.1.1")  # Replace with your PLC's IP
+PLC_RACK = 0
+PLC_SLOT = 1
+
+HEALTH_CHECK_S = 30.0     # a connection idle this long is checked before it is used
+RETRY_START_S = 1.0       # after a failed connect, fail fast until the backoff has passed
+RETRY_MAX_S = 30.0
+
+
+class PLCUnavailable(ConnectionError):
+    """No PLC connection (connect failed or still backing off)."""
+
+
+class PLCConnection:
+    """
+    Lazily connected snap7 client shared by plc_qr_seq and balance/shield.
+
+    run(fn) calls fn(client) under a lock (read-modify-write of an %M byte
+    stays atomic between threads). If the call fails the connection is
+    dropped, rebuilt once and fn is retried; if connecting fails, further
+    calls raise PLCUnavailable without waiting on the network until the
+    backoff (RETRY_START_S doubling to RETRY_MAX_S) has passed.
+    """
+
+    def __init__(self, host=PLC_HOST, rack=PLC_RACK, slot=PLC_SLOT):
+        self.host = host
+        self.rack = rack
+        self.slot = slot
+        self.client = None
+        self.last_ok = 0.0
+        self.last_error = None
+        self.reconnects = 0
+        self._retry_s = RETRY_START_S
+        self._next_try = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def connected(self):
+        return self.client is not None
+
+    def status(self):
+        return {
+            "connected": self.connected,
+            "host": self.host,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        }
+
+    def _drop(self):
+        if self.client is not None:
+            try:
+                self.client.disconnect()
+                self.client.destroy()
+            except Exception:
+                pass
+        self.client = None
+
+    def connect(self):
+        with self._lock:
+            if self.client is not None:
+                return self.client
+            if snap7 is None:
+                raise PLCUnavailable("python-snap7 is not installed")
+            now = time.monotonic()
+            if now < self._next_try:
+                raise PLCUnavailable(f"PLC {self.host} unavailable ({self.last_error}); retry in {self._next_try - now:.0f}s")
+            try:
+                client = snap7.client.Client()
+                client.connect(self.host, self.rack, self.slot)
+            except Exception as e:
+                self.last_error = str(e)
+                self._next_try = now + self._retry_s
+                self._retry_s = min(self._retry_s * 2, RETRY_MAX_S)
+                raise PLCUnavailable(f"Could not connect to PLC {self.host}: {e}")
+            if self.last_ok:
+                self.reconnects += 1
+            print(f"✅ PLC connected ({self.host}).")
+            self.client = client
+            self.last_ok = time.monotonic()
+            self._retry_s = RETRY_START_S
+            self._next_try = 0.0
+            return client
+
+    def _healthy(self):
+        # a long-idle connection may have been dropped by the PLC / network
+        if self.client is None:
+            return False
+        if time.monotonic() - self.last_ok < HEALTH_CHECK_S:
+            return True
+        try:
+            return bool(self.client.get_connected())
+        except Exception:
+            return False
+
+    def run(self, fn):
+        with self._lock:
+            if not self._healthy():
+                self._drop()
+            for attempt in (1, 2):
+                client = self.connect()
+                try:
+                    result = fn(client)
+                except Exception as e:
+                    self.last_error = str(e)
+                    self._drop()
+                    if attempt == 2:
+                        raise
+                    print(f"[WARN] PLC call failed ({e}); reconnecting")
+                    continue
+                self.last_ok = time.monotonic()
+                return result
+
+    def warm_up(self):
+        """Connects in the background so the first routine does not wait for it."""
+        def connect():
+            try:
+                with self._lock:
+                    self.connect()
+            except PLCUnavailable as e:
+                print(f"[WARN] {e}")
+        threading.Thread(target=connect, name="plc-connect", daemon=True).start()
+
+    def close(self):
+        with self._lock:
+            self._drop()
+
+
+plc = PLCConnection()
+
 
 # Function to write to a memory bit (%M)
 def write_memory_bit(byte_index, bit_index, value):
-    data = plc.read_area(Area.MK, 0, byte_index, 1)
-    set_bool(data, 0, bit_index, value)  # Modify Bit
-    plc.write_area(Area.MK, 0, byte_index, data)
+    def write(client):
+        data = client.read_area(Area.MK, 0, byte_index, 1)
+        set_bool(data, 0, bit_index, value)  # Modify Bit
+        client.write_area(Area.MK, 0, byte_index, data)
+    plc.run(write)
     print(f"Set %M{byte_index}.{bit_index} to {value}")
 
-# Function to read an input bit (%I)
-def read_input_bit(byte_index, bit_index):
-    data = plc.read_area(Area.PE, 0, byte_index, 1)
+# Function to read an input bit (%I); verbose=False for fast polling loops
+def read_input_bit(byte_index, bit_index, verbose=True):
+    data = plc.run(lambda client: client.read_area(Area.PE, 0, byte_index, 1))
     value = get_bool(data, 0, bit_index)
-    print(f"Read %I{byte_index}.{bit_index} -> {value}")
+    if verbose:
+        print(f"Read %I{byte_index}.{bit_index} -> {value}")
     return value
 
 def read_db_string(db_number, start, size):
-    data = plc.db_read(db_number, start, size)
+    data = plc.run(lambda client: client.db_read(db_number, start, size))
     return get_string(data, 0)  # Skip the first 2 bytes (length info)
 
 def close_connection():
     """Close the PLC connection"""
-    plc.disconnect()
-    plc.destroy()
-
-
-
-
-
-
-
+    plc.close()
@@ -1,6 +1,5 @@
-import time
-import S71200_PLC
 import failvial
+from .shield import close_shield, open_shield
 
 def balance_check(client):
     """
@@ -8,18 +7,8 @@ def balance_check(client):
     """
     print("Executing Routine balance_check")
     try:
-        # PLC Code
-        S71200_PLC.write_memory_bit(100, 0, False) # Open(100.0)
-        time.sleep(1)
-        S71200_PLC.write_memory_bit(100, 1, False) # Close(100.1)
-        time.sleep(1)
-    
-        S71200_PLC.write_memory_bit(100, 0, True)
-        time.sleep(5)
-        S71200_PLC.write_memory_bit(100, 0, False)
-        time.sleep(1)
-
-        Shield_sensor = S71200_PLC.read_input_bit(0, 0)
+        # PLC: open the shield (Shield_sensor True = closed)
+        Shield_sensor = not open_shield("balance_check")
 
         if not Shield_sensor:   
 
@@ -69,7 +58,4 @@ def balance_check(client):
         raise
 
     finally:
-        S71200_PLC.write_memory_bit(100, 1, True)
-        time.sleep(5)
-        S71200_PLC.write_memory_bit(100, 1, False)
-        time.sleep(1)
+        close_shield("balance_check")
@@ -1,8 +1,6 @@
 # balance_pick.py
-import time
-import S71200_PLC
-from .balance_tcp import BalanceTCPClient 
 import robot_data
+from .shield import open_shield
 
 def balance_pick(client):
     """
@@ -10,18 +8,8 @@ def balance_pick(client):
     """
     print("Executing Routine balance_pick")
     try:
-        # PLC Code
-        S71200_PLC.write_memory_bit(100, 0, False) # Open(100.0)
-        time.sleep(1)
-        S71200_PLC.write_memory_bit(100, 1, False) # Close(100.1)
-        time.sleep(1)
-    
-        S71200_PLC.write_memory_bit(100, 0, True)
-        time.sleep(5)
-        S71200_PLC.write_memory_bit(100, 0, False)
-        time.sleep(1)
-
-        Shield_sensor = S71200_PLC.read_input_bit(0, 0)
+        # PLC: open the shield (Shield_sensor True = closed)
+        Shield_sensor = not open_shield("balance_pick")
 
         if not Shield_sensor:   
             
@@ -32,7 +20,6 @@ def balance_pick(client):
                 print("Robot moved to Balance.")
                 # Robot Data
                 insert = robot_data.pf3400_rail(client, position_name="Balance")
-                time.sleep(0.5)
                 client.SendCommand("movej 1 1046.97 -16.638 113.639 -7.258 109.165 343.377") # Balance approach
                 reply = client.SendCommand("waitforeom")
 
@@ -42,7 +29,6 @@ def balance_pick(client):
                 if command == "0 -1":
                     # Robot Data
                     insert = robot_data.pf3400_robot(client, position_name="Balance_Pick")
-                    time.sleep(0.5)
                     client.SendCommand("movej 2 1046.97 -1.398 124.000 179.77 109.165 343.377") # Safe Pos Balance
                     reply = client.SendCommand("waitforeom")
 
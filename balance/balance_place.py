@@ -1,8 +1,8 @@
 # balance_place.py
-import time
-import S71200_PLC
-from .balance_tcp import BalanceTCPClient
 import robot_data
+from robot_wait import pad
+from .balance_tcp import BalanceTCPClient
+from .shield import close_shield, open_shield
 
 def balance_place(client):
     """
@@ -10,24 +10,14 @@ def balance_place(client):
     """
     print("Executing Routine balance_place")
     try:
-        # PLC Code
-        S71200_PLC.write_memory_bit(100, 0, False) # Open(100.0)
-        time.sleep(1)
-        S71200_PLC.write_memory_bit(100, 1, False) # Close(100.1)
-        time.sleep(1)
-    
-        S71200_PLC.write_memory_bit(100, 1, True)
-        time.sleep(5)
-        S71200_PLC.write_memory_bit(100, 1, False)
-        time.sleep(1)
-
-        Shield_sensor = S71200_PLC.read_input_bit(0, 0)
+        # PLC: close the shield (Shield_sensor True = closed)
+        Shield_sensor = close_shield("balance_place")
 
         if Shield_sensor:   
             
             # Balance Zero
             balance = BalanceTCPClient()
-            time.sleep(1)
+            pad(1, "balance_place")   # balance settles after connect before it takes a zero
             zero = balance.zero_balance()
             if zero == "Z A":
 
@@ -40,7 +30,6 @@ def balance_place(client):
                 print("Robot moved to Balance.")
                 # Robot Data
                 insert = robot_data.pf3400_rail(client, position_name="Balance")
-                time.sleep(0.5)
                 client.SendCommand("movej 2 1046.97 -1.398 124.000 179.77 109.165 343.377") # Safe Pos Balance
                 reply = client.SendCommand("waitforeom")
                 
@@ -48,11 +37,7 @@ def balance_place(client):
                 reply = client.SendCommand("waitforeom")
 
                 # PLC code to open Balance Shield
-                S71200_PLC.write_memory_bit(100, 0, True)
-                time.sleep(5)
-                S71200_PLC.write_memory_bit(100, 0, False)
-                time.sleep(1)
-                Shield_sensor = S71200_PLC.read_input_bit(0, 0)
+                Shield_sensor = not open_shield("balance_place")
 
                 if not Shield_sensor:
 
@@ -60,7 +45,6 @@ def balance_place(client):
                     reply = client.SendCommand("waitforeom")
                     # Robot Data
                     insert = robot_data.pf3400_robot(client, position_name="Balance_place")
-                    time.sleep(0.5)
                     # client.SendCommand("movej 1 1046.97 -1.398 124.000 179.77 103.064 343.377") # Safe Pos Balance
                     # reply = client.SendCommand("waitforeom")
 
@@ -78,7 +62,4 @@ def balance_place(client):
         raise
 
     finally:
-        S71200_PLC.write_memory_bit(100, 1, True)
-        time.sleep(5)
-        S71200_PLC.write_memory_bit(100, 1, False)
-        time.sleep(1)
+        close_shield("balance_place")
@@ -0,0 +1,54 @@
+# shield.py
+#
+# Balance draft shield, driven by PLC pulses:
+#   %M100.0 pulse -> open, %M100.1 pulse -> close, %I0.0 True = shield closed
+
+import S71200_PLC
+from robot_wait import WaitTimeout, pad, plc_input, wait_until
+
+OPEN_BIT = (100, 0)
+CLOSE_BIT = (100, 1)
+CLOSED_SENSOR = (0, 0)
+
+EDGE_S = 0.1          # both coils low this long before a pulse, so the PLC sees a fresh rising edge
+MOVE_S = 5.0          # open pulse width; longest a close may take
+SENSOR_POLL_S = 0.2
+
+
+def shield_closed():
+    return S71200_PLC.read_input_bit(*CLOSED_SENSOR)
+
+
+def _release(routine):
+    S71200_PLC.write_memory_bit(*OPEN_BIT, False)
+    S71200_PLC.write_memory_bit(*CLOSE_BIT, False)
+    pad(EDGE_S, routine)
+
+
+def open_shield(routine=None):
+    """
+    Pulses open for the full MOVE_S (only the closed position has a sensor,
+    so there is no earlier sign that it is all the way open).
+    Returns True if the shield left the closed position.
+    """
+    _release(routine)
+    S71200_PLC.write_memory_bit(*OPEN_BIT, True)
+    try:
+        pad(MOVE_S, routine)
+    finally:
+        S71200_PLC.write_memory_bit(*OPEN_BIT, False)
+    return not shield_closed()
+
+
+def close_shield(routine=None):
+    """Holds the close pulse until the sensor reports closed (at most MOVE_S). Returns True if closed."""
+    _release(routine)
+    S71200_PLC.write_memory_bit(*CLOSE_BIT, True)
+    try:
+        wait_until(plc_input(*CLOSED_SENSOR, True), MOVE_S, poll_s=SENSOR_POLL_S,
+                   routine=routine, what="balance shield closed")
+    except WaitTimeout as e:
+        print(f"[WARN] {e}")
+    finally:
+        S71200_PLC.write_memory_bit(*CLOSE_BIT, False)
+    return shield_closed()
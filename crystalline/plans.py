@@ -0,0 +1,435 @@
+# crystalline/plans.py
+#
+# The crystalline load (task type 1) and unload (task type 2) routines as
+# motion plans (see motion_plan.py), one table row per station in
+# crystalline/stations.json. Replaces the per-station copies
+# crystalline/{1,2}Station{1..6}.py.
+
+import json
+import time
+from pathlib import Path
+
+import requests
+
+import failvial
+import Vial_to_ventionplace
+import error_task
+from balance import balance_check, balance_pick, balance_place
+from balance.balance_tcp import BalanceTCPClient
+from dashboard import Dashboard
+from motion_plan import END, FINALLY, START, PlanError, compile_plans
+from plc_qr_seq import plc_qr_seq
+from qr import qr_check, qr_pick_vial, qr_place_vial
+from robot_wait import WaitTimeout, stable_weight, wait_until
+
+STATIONS_FILE = Path(__file__).resolve().parent / "stations.json"
+STATIONS_VERSION = 1
+
+STATUS_FILE = "status.json"
+STATION1_SUCCESS_API = "http://localhost:8006/csdfstation2_initiated_success"
+STATION3_INITIATE_API = "http://localhost:8005/initiate_CSDF_Station3"
+
+# balance: "S" answers "S S ..." once the reading is stable
+WEIGH_TIMEOUT_S = 10.0
+WEIGH_POLL_S = 0.5
+
+HOME = "movej 1 1017.83 -2.902 180.537 178.063 103.542 -934.686"
+
+# poses relative to the station (row_z / retreat_z / place_z come from its level)
+SAFE = "movej {p} {row_z} -1.398 124.000 179.77 103.064 {axis_6}"
+LIFTED = "movej {p} {row_z} -1.398 184.317 179.77 103.064 {axis_6}"
+RETREAT = "movej {p} {retreat_z} -2.902 180.537 178.063 103.542 {axis_6}"
+PLACE_APPROACH = "movej 2 {place_z} -1.398 124 -0.849 103.081 {axis_6}"
+
+dash = Dashboard()
+
+
+def _pose(template, profile):
+    # profile is either a number or a station parameter ("{exit_profile}")
+    return template.replace("{p}", str(profile))
+
+
+# Steps shared by both routines: pallet index, rail to the station, approach, pickplate
+_TO_STATION = {
+    START: [
+        ("move", "palletindex {station} {row} {col}", "eom"),
+        ("if", "eom", "0", "to_station", "bad_index"),
+    ],
+    "bad_index": [
+        ("say", "Failed to set pallet index {station} {row} {col}! Stopping Execution"),
+    ],
+    "to_station": [
+        ("say", "Pallet index set successfully to {station} {row} {col}"),
+        ("move", "moveoneaxis 6 {axis_6} 1", "eom"),
+        ("if", "eom", "0", "approach", "bad_rail"),
+    ],
+    "bad_rail": [
+        ("say", "Failed to move to Crystalline {station}! Stopping Execution"),
+    ],
+}
+
+
+def _approach(then_block, else_block, expect):
+    return [
+        ("when", "below_row", ("move", "moveoneaxis 1 {row_z} 1")),
+        ("move", _pose(SAFE, 1)),
+        ("send", "pickplate {station}", "pick"),
+        ("send", "waitforeom"),
+        ("if", "pick", expect, then_block, else_block),
+    ]
+
+
+# Task type 1: bring a new vial (QR -> balance -> crystalline), push it in,
+# check it is seated, then start the experiment.
+LOAD_VIAL = dict(_TO_STATION, **{
+    "approach": _approach("fetch_vial", "occupied", "0 0"),
+    "occupied": [
+        # something is already in the slot (pickplate picked it)
+        ("move", _pose(SAFE, "{exit_profile}")),
+        ("move", _pose(RETREAT, "{exit_profile}")),
+        ("when", "failvial_if_occupied", ("call", "failvial")),
+    ],
+    "fetch_vial": [
+        ("say", "Vial not present"),
+        ("move", _pose(SAFE, 1)),
+        ("move", _pose(RETREAT, 1)),
+        ("when", "below_row", ("move", "moveoneaxis 1 1017.83 1")),
+        ("say", "Executing qr_pick_vial"),
+        ("call", "qr_pick_vial"),
+        ("call", "balance_place"),
+        ("call", "weigh", "START"),
+        ("move", "moveoneaxis 6 {axis_6} 1"),
+        ("when", "below_row", ("move", "moveoneaxis 1 {row_z} 1")),
+        ("move", _pose(SAFE, 2)),
+        ("move", PLACE_APPROACH),
+        ("move", "placeplate {station}"),
+        # push the vial home with the closed gripper
+        ("move", "graspplate -119 60 10"),
+        ("move", "moveoneaxis 1 {push_z} 1"),
+        ("move", "moveoneaxis 1 {push_back_z} 1"),
+        ("sleep", "{settle_s}"),          # vial settles in the slot before the gripper lets go
+        # open gripper, go down to the vial and grip it to check it is there
+        ("send", "graspplate 117 60 10", "grip"),
+        ("if", "grip", "0 0", "check_vial", "gripper_stuck"),
+    ],
+    "check_vial": [
+        ("send", "moveoneaxis 1 {check_z} 2", "reach"),
+        ("send", "waitforeom"),
+        ("if", "reach", "0", "grasp_check", "not_reached"),
+    ],
+    "grasp_check": [
+        ("send", "graspplate -117 60 10", "grip"),
+        ("if", "grip", "0 -1", "vial_ok", "vial_missing"),
+    ],
+    "vial_ok": [
+        ("say", "Vial Present Starting Experiment"),
+        ("move", "graspplate 117 60 10"),
+        ("move", "moveoneaxis 1 {clear_z} 1"),
+        ("move", _pose(SAFE, "{exit_profile}")),
+        ("move", _pose(LIFTED, "{exit_profile}")),
+        ("move", HOME),
+        ("call", "initiate_experiment"),
+        ("call", "append_status"),
+        ("say", "Crystalline {station} {row} {col} Complete"),
+        ("sleep", 5),
+    ],
+    "vial_missing": [
+        ("say", "Vial Not Present Stopping Execution"),
+        ("move", "graspplate 117 60 10"),
+        ("move", "moveoneaxis 1 {clear_z} 1"),
+        ("goto", "leave"),
+    ],
+    "not_reached": [
+        ("say", "Robot Didn't Reach Vial Point. Stoping Execution"),
+        ("move", "moveoneaxis 1 {clear_z} 1"),
+        ("goto", "leave"),
+    ],
+    "gripper_stuck": [
+        ("say", "Gripper Didn't Open. Stopping Execution"),
+        ("move", "moveoneaxis 1 {clear_z} 1"),
+        ("goto", "leave"),
+    ],
+    "leave": [
+        ("move", _pose(SAFE, "{exit_profile}")),
+        ("move", _pose(LIFTED, "{exit_profile}")),
+    ],
+    FINALLY: [
+        ("move", HOME),
+        ("call", "notify_station1"),
+    ],
+})
+
+# Task type 2: take the finished vial out, identify it (QR), weigh it and
+# hand it over to the Vention table / Station 3.
+UNLOAD_VIAL = dict(_TO_STATION, **{
+    START: [
+        ("call", "balance_check"),
+        ("say", "Executing qr_check"),
+        ("call", "qr_check"),
+    ] + _TO_STATION[START],
+    "approach": _approach("take_vial", "empty", "0 -1"),
+    "take_vial": [
+        ("say", "Vial present"),
+        ("move", _pose(SAFE, 2)),
+        ("move", _pose(RETREAT, 2)),
+        ("when", "below_row", ("move", "moveoneaxis 1 1017.83 1")),
+        ("send", "graspplate -117 60 10", "grip"),
+        ("if", "grip", "0 -1", "identify", "lost_vial"),
+    ],
+    "lost_vial": [
+        ("say", "Stopping Execution! Vial is not in gripper"),
+        ("call", "add_error_task"),
+    ],
+    "identify": [
+        ("call", "mark_reactor_free"),
+        ("say", "Executing qr_place_vial"),
+        ("call", "qr_place_vial"),
+        ("say", "Executing qr plc sequence"),
+        ("call", "resolve_exp_id"),        # -> "exp_mismatch" on a QR / task exp_id conflict
+        ("say", "Executing qr_pick_vial"),
+        ("call", "qr_pick_vial"),
+        ("call", "balance_place"),
+        ("call", "weigh", "END"),
+        ("say", "Executing Vention Place"),
+        ("call", "vention_place"),
+        ("say", "Successfully completed vention vial place"),
+        ("move", HOME),
+        ("call", "initiate_station3"),
+        ("say", "Crystalline {station} {row} {col} Complete"),
+    ],
+    "exp_mismatch": [
+        ("say", "Executing qr_pick_vial"),
+        ("call", "qr_pick_vial"),
+        ("say", "Executing fail vial"),
+        ("call", "failvial"),
+    ],
+    "empty": [
+        ("move", _pose(SAFE, 1)),
+        ("move", _pose(RETREAT, 1)),
+        ("when", "below_row", ("move", "moveoneaxis 1 1017.83 1")),
+        ("move", HOME),
+    ],
+    FINALLY: [
+        ("move", HOME),
+    ],
+})
+
+PLANS = {"load_vial": LOAD_VIAL, "unload_vial": UNLOAD_VIAL}
+TASK_PLAN = {1: "load_vial", 2: "unload_vial"}
+
+
+# =========================
+# Hooks: station work that is not a plain robot command
+# =========================
+def _weigh(client, ctx, named_time):
+    # waits up to WEIGH_TIMEOUT_S for a stable reading; without one the vial goes to failvial and the plan stops
+    balance = BalanceTCPClient()
+    try:
+        result = wait_until(stable_weight(balance), WEIGH_TIMEOUT_S, poll_s=WEIGH_POLL_S,
+                            routine="weigh", what="stable balance reading")
+    except WaitTimeout as e:
+        print(f"Error Reading weight: {e}")
+        result = None
+    finally:
+        balance.disconnect()
+
+    if result is None:
+        balance_pick.balance_pick(client)
+        print("Executing fail vial")
+        failvial.failvial(client)
+        return END
+
+    dash.add_vial_mass(named_time=named_time, mass=result["data"], exp_id=ctx["exp_id"])
+    balance_pick.balance_pick(client)
+    return None
+
+
+def _initiate_experiment(client, ctx):
+    exp_id, cid, rid = ctx["exp_id"], ctx["cid"], ctx["rid"]
+    max_retries = 3
+    for attempt in range(1, max_retries + 1):
+        try:
+            dash.initiate_experiment(exp_id, cid, rid)
+            print(f"✅ Experiment started at {cid} {rid} with experiment id {exp_id}")
+            return None
+        except Exception as e:
+            print(f"[WARN] Attempt {attempt}: Failed to initiate experiment (exp_id={exp_id}) — {e}")
+            if attempt < max_retries:
+                print("⏳ Retrying in 5 seconds...")
+                time.sleep(5)
+    print("❌ All retries failed — stopping execution.")
+    return END
+
+
+def _append_status(client, ctx):
+    # status.json: experiments running in the crystallines (read by status_service)
+    exp_id, cid, rid = ctx["exp_id"], ctx["cid"], ctx["rid"]
+    try:
+        try:
+            with open(STATUS_FILE, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = []
+        data.append({"exp_id": exp_id, "cid": cid, "rid": rid})
+        with open(STATUS_FILE, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"[📥] Added to status.json: exp_id={exp_id}, cid={cid}, rid={rid}")
+    except Exception as e:
+        print(f"[ERROR] Failed to write to status.json: {e}")
+
+
+def _notify_station1(client, ctx):
+    try:
+        resp = requests.post(STATION1_SUCCESS_API)
+        print(f"[INFO] Station2 success callback sent. Status={resp.status_code}")
+    except Exception as e:
+        print(f"[WARN] Could not notify CSDF_Station1 success: {e}")
+
+
+def _add_error_task(client, ctx):
+    exp_id = ctx["exp_id"] if ctx["exp_id"] is not None else "unknown"
+    error_task.add_error_task(exp_id=exp_id, cid=ctx["cid"], rid=ctx["rid"])
+
+
+def _mark_reactor_free(client, ctx):
+    dash.mark_reactor_free(ctx["cid"], ctx["letter"])
+    print(f"Reactor {ctx['cid']} {ctx['letter']} marked free")
+
+
+def read_qr_with_retry(max_tries=2, delay=0.5):
+    """
+    Try reading QR up to `max_tries` times.
+    Returns the final qr_data dict from plc_qr_seq().
+    """
+    last = None
+    for attempt in range(1, max_tries + 1):
+        qr_data = plc_qr_seq()
+        if qr_data.get("success"):
+            return qr_data
+        print(f"[WARN] QR scan failed (attempt {attempt}/{max_tries}). "
+              f"Error: {qr_data.get('error') or qr_data.get('data')}")
+        last = qr_data
+        if attempt < max_tries:
+            time.sleep(delay)
+    return last or {"success": False, "error": "Unknown QR error"}
+
+
+def _resolve_exp_id(client, ctx):
+    """
+    Effective exp_id for a type-2 task:
+      1) QR exp_id and task exp_id both known -> must match, else stop (failvial)
+      2) only QR exp_id -> use it
+      3) QR / lookup failed -> task exp_id (dashboard note, no failvial)
+    """
+    exp_id_task = ctx["exp_id"]
+    exp_id_from_qr = None
+
+    qr_data = read_qr_with_retry(max_tries=2, delay=0.5)
+    if qr_data.get("success"):
+        print(f"Scan Okay: {qr_data['data']}")
+        vial_id = qr_data["data"]
+        exp_response = dash.get_experiment_id(vial_id)
+        if exp_response and exp_response.get("found"):
+            exp_id_from_qr = (exp_response.get("exp") or {}).get("exp_id")
+            print(f"Experiment found for vial {vial_id}: exp_id = {exp_id_from_qr}")
+        else:
+            print(f"No experiment found for vial {vial_id}. exp_id_from_qr=None")
+    else:
+        print(f"Scan Failed: {qr_data.get('data')}, Error: {qr_data.get('error')}")
+
+    if exp_id_from_qr is not None and exp_id_task is not None:
+        if str(exp_id_from_qr).strip() != str(exp_id_task).strip():
+            print(f"[ERROR] EXP_ID MISMATCH! qr={exp_id_from_qr} task={exp_id_task}. Stopping and failing vial.")
+            try:
+                dash.add_note(
+                    exp_id=exp_id_task,
+                    additional_note=f"CSDF Station2 Type-2: EXP_ID mismatch. QR/Dashboard={exp_id_from_qr} but task exp_id={exp_id_task}. Manual intervention required."
+                )
+            except Exception as e:
+                print(f"[WARN] Could not add dashboard note: {e}")
+            return "exp_mismatch"
+
+    elif exp_id_from_qr is not None:
+        ctx["exp_id"] = exp_id_from_qr
+
+    else:
+        print(f"[WARN] QR scan/lookup failed. Falling back to exp_id from task: {exp_id_task}")
+        try:
+            dash.add_note(
+                exp_id=exp_id_task,
+                additional_note=(
+                    "CSDF Station2 Type-2: QR scan failed (after retries). Using exp_id from task JSON. "
+                    "Downstream actions (mass, station3 offline image, Raman) may be associated to fallback exp_id. "
+                    "Please verify vial identity / data association."
+                )
+            )
+        except Exception as e:
+            print(f"[WARN] Could not add dashboard note: {e}")
+    return None
+
+
+def _initiate_station3(client, ctx):
+    requests.post(STATION3_INITIATE_API, json={"exp_id": str(ctx["exp_id"])})
+
+
+HOOKS = {
+    "balance_check": lambda client, ctx: balance_check.balance_check(client),
+    "qr_check": lambda client, ctx: qr_check.qr_check(client),
+    "qr_pick_vial": lambda client, ctx: qr_pick_vial.qr_pick_vial(client),
+    "qr_place_vial": lambda client, ctx: qr_place_vial.qr_place_vial(client),
+    "balance_place": lambda client, ctx: balance_place.balance_place(client),
+    "failvial": lambda client, ctx: failvial.failvial(client),
+    "vention_place": lambda client, ctx: Vial_to_ventionplace.Vial_to_ventionplace(client),
+    "weigh": _weigh,
+    "initiate_experiment": _initiate_experiment,
+    "append_status": _append_status,
+    "notify_station1": _notify_station1,
+    "add_error_task": _add_error_task,
+    "mark_reactor_free": _mark_reactor_free,
+    "resolve_exp_id": _resolve_exp_id,
+    "initiate_station3": _initiate_station3,
+}
+
+
+# =========================
+# Station table + compiled plans
+# =========================
+def load_stations(path=STATIONS_FILE):
+    """
+    stations.json: {"version": 1, "levels": {name: params}, "stations": {"1": {"level": name, ...}}}
+    Returns {station number: level params + station params + "station"}.
+    """
+    with open(path, "r") as f:
+        table = json.load(f)
+    if table.get("version") != STATIONS_VERSION:
+        raise PlanError(f"{path}: unsupported stations version {table.get('version')!r}")
+
+    stations = {}
+    for key, params in table["stations"].items():
+        level = params.get("level")
+        if level not in table["levels"]:
+            raise PlanError(f"{path}: station {key} has unknown level {level!r}")
+        stations[int(key)] = dict(table["levels"][level], **params, station=int(key))
+    return stations
+
+
+# compiled once, at import (csdfstation2 startup): {(plan name, station): MotionPlan}
+COMPILED = compile_plans(PLANS, load_stations(), HOOKS)
+
+
+def run_task(client, task_type, cid, pallet_row, pallet_col, exp_id=None):
+    """Runs the type-1 (load) / type-2 (unload) routine for crystalline `cid`."""
+    plan = COMPILED.get((TASK_PLAN.get(task_type), cid))
+    if plan is None:
+        raise PlanError(f"No crystalline plan for task type {task_type} at station {cid}")
+    if task_type == 1 and exp_id is None:
+        raise ValueError("Task type 1 needs an exp_id")
+
+    rid = (pallet_row - 1) * 4 + (pallet_col - 1)
+    print(f"Running {plan.name} with palletindex {cid} {pallet_row} {pallet_col} exp_id={exp_id}")
+    try:
+        return plan.run(client, row=pallet_row, col=pallet_col, exp_id=exp_id,
+                        cid=cid, rid=rid, letter="ABCDEFGH"[rid])
+    except Exception as e:
+        print(f"[ERROR] In {cid} {pallet_row} {pallet_col} {e}")
+        raise
@@ -3,13 +3,11 @@ import os
 import json
 import time
 import threading
-import importlib.util
-import sys
-from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import requests
-from fastapi import FastAPI
+from fastapi import FastAPI, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
@@ -28,37 +26,33 @@ import failvial
 
 # PLC QR reader used by retry helper
 from plc_qr_seq import plc_qr_seq
-
-# Funtion to load crystalline task module
-def load_crystalline_module(task_type: int, cid: int):
-    filename = f"{task_type}Station{cid}.py"
-
-    base_dir = Path(__file__).resolve().parent              # folder containing csdfstation2.py
-    path = base_dir / "crystalline" / filename              # CSDF_STATION2/crystalline/...
-
-    print(f"[DEBUG] csdfstation2.py dir = {base_dir}", flush=True)
-    print(f"[DEBUG] loading task file   = {path}", flush=True)
-
-    if not path.exists():
-        # show what's actually inside crystalline to catch naming mismatch
-        cryst_dir = base_dir / "crystalline"
-        if cryst_dir.exists():
-            files = sorted(p.name for p in cryst_dir.glob("*.py"))
-            print(f"[DEBUG] crystalline contains: {files}", flush=True)
-        raise ModuleNotFoundError(f"Task file not found: {path}")
-
-    module_name = f"_crystalline_{task_type}_{cid}"
-    spec = importlib.util.spec_from_file_location(module_name, str(path))
-    mod = importlib.util.module_from_spec(spec)
-    sys.modules[module_name] = mod
-    spec.loader.exec_module(mod)
-    return mod
+# Shared PLC connection (connects on first use / warm_up, reconnects after drops)
+import S71200_PLC
+
+# Resident task queue (tasks.json) + task format helpers
+from task_store import open_stores, TaskRecord, normalize_task, rid_to_letter, task_key
+from scheduler import CLASS_EXPERIMENT, CLASS_PRIORITY_EXPERIMENT, classes_except
+# Crystalline load/unload routines: motion plans compiled once at import (crystalline/stations.json)
+from crystalline import plans as crystalline_plans
+from queue_feed import QueueFeed, FEED_RESET
+# Skips repeated poses / homes the next move does not need (SAFE_TRANSITIONS)
+from motion_optimizer import MotionOptimizer
+# Idle time per routine (fixed pads vs. condition waits)
+import robot_wait
+# Robot telemetry snapshots (uploaded in the background, spooled while the endpoint is down)
+import robot_data
+# Robot state trend (joints, temperature, ...) over a separate status connection
+from robot_sampler import StateSampler
 
 # =========================
 # Constants / Endpoints
 # =========================
 TASK_FILE = "tasks.json"                 # SINGLE source of truth for tasks
 INITIATE_FILE = "initiate_task.json"     # persistent queue for Station-1 initiation triggers
+TASK_DB = "csdfstation2.db"              # used instead of both files when TASK_BACKEND == "sqlite"
+
+# "json" (tasks.json + initiate_task.json) or "sqlite" (TASK_DB, migrated from the json files on first run)
+TASK_BACKEND = os.environ.get("CSDF_TASK_BACKEND", "json")
 
 TRAY_API       = "http://localhost:8002/is_tray_ready"   # tray gate for experiments (optional)
 SEND_VIAL_API  = "http://localhost:8005/send_vial"       # cleanup permission (type 2)
@@ -67,14 +61,30 @@ CSDF_STATION1_STATUS_API = "http://130.159.93.21:8006/csdfstation1_status" # che
 
 CSDF_STATION1_CALLBACK_API = "http://130.159.93.21:8006/csdfstation2_initiated_success" # post csdf station 2 success callback
 
+# Dispatcher wakeups: new work wakes it immediately, these are only the idle/poll periods
+STATION1_POLL_S  = 5.0    # idle: how often to check Station1 for a pending success callback
+SEND_VIAL_POLL_S = 2.0    # permission watcher: sendvial poll period (only while cleanup tasks are queued)
+
+# Per-command robot latency (robot_metrics): /metrics/robot, dumps go here
+ROBOT_METRICS_DIR = "robot_metrics"
+
+# TCS link health (robot_health.LinkHealth): how long the dispatcher waits for a reconnect per attempt
+ROBOT_RECONNECT_WAIT_S = 60.0
+
+# Motion optimizer (motion_optimizer.py); CSDF_MOTION_OPTIMIZER=0 sends every routine command as written
+MOTION_OPTIMIZER = os.environ.get("CSDF_MOTION_OPTIMIZER", "1") != "0"
+
+# Queue change feed (/queue?since=rev long-poll, /queue/stream SSE)
+QUEUE_LONGPOLL_S     = 25.0   # default long-poll wait
+QUEUE_LONGPOLL_MAX_S = 60.0   # cap for a client-supplied ?timeout=
+QUEUE_SSE_KEEPALIVE_S = 15.0  # SSE comment line so proxies keep the stream open
+
 # Node-RED UI endpoints
 NODERED_STATUS = "http://127.0.0.1:1880/robot-status"
 NODERED_TASK   = "http://127.0.0.1:1880/task-update"
 NODERED_WEIGHT = "http://127.0.0.1:1880/weight-update"
 NODERED_QR     = "http://127.0.0.1:1880/qr-update"
 
-RID_TO_LETTER = "ABCDEFGH"
-
 
 # =========================
 # App / Globals
@@ -84,11 +94,27 @@ app = FastAPI()
 # IMPORTANT: use RLock to avoid deadlocks when nested functions acquire the same lock
 lock = threading.RLock()
 
+# Task + initiation queues behind the same lock (backend chosen by TASK_BACKEND).
+# json: tasks.json held in memory, every mutation is journaled (tasks.journal.jsonl)
+#       and tasks.json is rewritten as a snapshot on compaction.
+# Every queue change is also published to queue_feed (revisioned deltas for /queue?since= and /queue/stream).
+queue_feed = QueueFeed()
+task_store, initiate_queue = open_stores(TASK_BACKEND, TASK_FILE, INITIATE_FILE, TASK_DB, lock,
+                                         on_change=queue_feed.publish)
+
+# Set whenever the dispatcher may have something new to do
+# (task/initiation queued, task finished, sendvial permission changed)
+work_event = threading.Event()
+
 robot_ready = False
 robot_busy = False
 client = None
+state_sampler = None
 shutdown_flag = False
 
+# last sendvial answer seen by the permission watcher (None = unknown -> ask live)
+cleanup_allowed: Optional[bool] = None
+
 error_flag = False
 error_message = ""
 
@@ -113,6 +139,14 @@ class TaskPayload(BaseModel):
     task: Union[Dict[str, Any], List[Any]]
 
 
+class TaskListPayload(BaseModel):
+    """
+    Bulk form of TaskPayload: {"tasks": [ {...}, [1, 2, "A"], ... ]}
+    Each item may use the dict or the legacy list format.
+    """
+    tasks: List[Union[Dict[str, Any], List[Any]]]
+
+
 class InitiatePayload(BaseModel):
     note: Optional[str] = None
 
@@ -123,304 +157,155 @@ class AutomatedDosingInitiatePayload(BaseModel):
 
 
 # =========================
-# Persistence: tasks.json (SINGLE source of truth)
+# Persistence: tasks (SINGLE source of truth)
 # =========================
-def _ensure_file(path: str, default_json: Any) -> None:
-    if not os.path.exists(path):
-        with open(path, "w") as f:
-            json.dump(default_json, f, indent=2)
-
-
-def _atomic_write_json(path: str, data: Any) -> None:
-    tmp = f"{path}.tmp"
-    with open(tmp, "w") as f:
-        json.dump(data, f, indent=2)
-    os.replace(tmp, path)  # atomic replace
-
-
-def _read_json_list(path: str) -> List[Any]:
-    _ensure_file(path, [])
-    try:
-        with open(path, "r") as f:
-            data = json.load(f)
-        return data if isinstance(data, list) else []
-    except Exception:
-        # reset corrupted file safely
-        _atomic_write_json(path, [])
-        return []
-
-
-def rid_to_letter(rid_val) -> Optional[str]:
-    if rid_val is None:
-        return None
-    s = str(rid_val).strip().upper()
-
-    # exact single letter A..H
-    if len(s) == 1 and s in RID_TO_LETTER:
-        return s
-
-    # pure integer 0..7
-    if s.isdigit():
-        try:
-            idx = int(s)
-            if 0 <= idx < len(RID_TO_LETTER):
-                return RID_TO_LETTER[idx]
-        except ValueError:
-            pass
-
-    # pick first A..H found anywhere (handles "A42", "B-1", etc.)
-    for ch in s:
-        if ch in RID_TO_LETTER:
-            return ch
-
-    # optional: if string starts with single digit 0..7, map that
-    if s and s[0] in "01234567":
-        return RID_TO_LETTER[int(s[0])]
-
-    return None
-
-
-def normalize_task(item: Union[Dict[str, Any], List[Any]]) -> Optional[Dict[str, Any]]:
-    """
-    Normalizes task into keyword dict format:
-      {"type": int, "cid": int, "rid": "A".."H", "exp_id": optional int}
-    Also supports your "status json" style:
-      {"exp_id": 1609, "cid": 2, "rid": 0}  -> becomes {"type":1,"cid":2,"rid":"A","exp_id":1609}
-    """
-    # dict input
-    if isinstance(item, dict):
-        # status-style (no "type", rid numeric)
-        if "type" not in item and "exp_id" in item and "cid" in item and "rid" in item:
-            letter = rid_to_letter(item.get("rid"))
-            if not letter:
-                return None
-            return {
-                "type": 1,
-                "cid": int(item["cid"]),
-                "rid": letter,
-                "exp_id": int(item["exp_id"]),
-            }
-
-        # recommended task style
-        if "type" in item and "cid" in item and "rid" in item:
-            ttype = int(item["type"])
-            cid = int(item["cid"])
-            letter = rid_to_letter(item.get("rid"))
-            if not letter:
-                return None
-
-            out = {"type": ttype, "cid": cid, "rid": letter}
-            if "exp_id" in item and item["exp_id"] is not None:
-                out["exp_id"] = item["exp_id"]   # keep as-is (string or int)
-            return out
-
-        return None
-
-    # legacy list input
-    if isinstance(item, list) and len(item) >= 3:
-        try:
-            ttype = int(item[0])
-            cid = int(item[1])
-            letter = rid_to_letter(item[2])
-            if not letter:
-                return None
-
-            out = {"type": ttype, "cid": cid, "rid": letter}
-            if len(item) >= 4 and item[3] is not None:
-                out["exp_id"] = item[3]  # keep as-is
-            return out
-        except Exception:
-            return None
-
-    return None
-
-
 def read_tasks() -> List[Dict[str, Any]]:
     """
-    Reads tasks.json and normalizes everything to dict-based tasks.
-    If the file contains status-style objects (exp_id,cid,rid int), they become type-1 tasks.
-    If legacy list tasks exist, they become dict tasks.
+    Returns a copy of the resident queue (canonical dict-based tasks).
+    tasks.json is only parsed at startup or after it was edited outside this
+    process (detected by its stat key), never on the polling path.
     """
-    with lock:
-        raw = _read_json_list(TASK_FILE)
-        normalized: List[Dict[str, Any]] = []
-        changed = False
-
-        for item in raw:
-            nt = normalize_task(item)
-            if nt is None:
-                # skip invalid entries (but mark changed so we rewrite cleanly)
-                changed = True
-                continue
-            normalized.append(nt)
-            if nt != item:
-                changed = True
+    return task_store.snapshot()
 
-        # If we normalized/cleaned anything, rewrite in canonical format
-        if changed:
-            _atomic_write_json(TASK_FILE, normalized)
 
-        return normalized
+def read_tasks_with_rev():
+    """(feed rev, queue) taken together, so deltas after rev apply to exactly this queue."""
+    with task_store.lock:
+        return queue_feed.rev, read_tasks()
 
 
 def write_tasks(tasks: List[Dict[str, Any]]) -> None:
-    with lock:
-        _atomic_write_json(TASK_FILE, tasks)
+    task_store.replace(tasks)
 
 
-def task_equals(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
-    # strict equality on keys used by the system
-    keys = set(a.keys()) | set(b.keys())
-    for k in keys:
-        if a.get(k) != b.get(k):
-            return False
-    return True
+def task_exists(t: Dict[str, Any]) -> bool:
+    # O(1): the store is keyed by task_key()
+    return task_store.contains(t)
 
 
-def task_exists(tasks: List[Dict[str, Any]], t: Dict[str, Any]) -> bool:
-    return any(task_equals(x, t) for x in tasks)
+def enqueue_task(t: Dict[str, Any]) -> bool:
+    """
+    Append task unless it is already queued. Returns True if it was added.
+    """
+    added = task_store.append(t)
+    if added:
+        wake_dispatcher()
+    return added
 
 
-def enqueue_task(t: Dict[str, Any]) -> None:
-    tasks = read_tasks()
-    if task_exists(tasks, t):
-        return
-    tasks.append(t)
-    write_tasks(tasks)
+def enqueue_tasks(ts: List[Dict[str, Any]]) -> List[bool]:
+    """
+    Append many tasks with a single persistence flush. Returns one bool per
+    task: True if it was added (False = already queued / duplicate in batch).
+    """
+    added = task_store.extend(ts)
+    if any(added):
+        wake_dispatcher()
+    return added
 
 
 def enqueue_priority_task(t: Dict[str, Any]) -> None:
     """
     Put task at the FRONT of tasks.json, removing any duplicate.
     """
-    tasks = read_tasks()
-    tasks = [x for x in tasks if not task_equals(x, t)]
-    tasks.insert(0, t)
-    write_tasks(tasks)
+    task_store.push_front(t)
+    wake_dispatcher()
     print(f"[DEBUG] enqueue_priority_task -> queued at front: {t}", flush=True)
 
 
 def remove_task_from_file(t: Dict[str, Any]) -> None:
-    tasks = read_tasks()
-    new_tasks: List[Dict[str, Any]] = []
-    removed = False
-    for x in tasks:
-        if not removed and task_equals(x, t):
-            removed = True
-            continue
-        new_tasks.append(x)
-    if removed:
-        write_tasks(new_tasks)
+    task_store.remove(t)
 
 
-def queue_has_type2(tasks: List[Dict[str, Any]]) -> bool:
-    return any(x.get("type") == 2 for x in tasks)
+def queue_has_type2() -> bool:
+    return task_store.has_type(2)
 
 
-def queue_has_type1(tasks: List[Dict[str, Any]]) -> bool:
-    return any(x.get("type") == 1 for x in tasks)
+def queue_has_type1() -> bool:
+    return task_store.has_type(1)
 
 
-def queue_has_priority_task(tasks: List[Dict[str, Any]]) -> bool:
+def queue_has_priority_task() -> bool:
     # priority: experiment tasks created by initiation (has exp_id)
-    return any(x.get("type") == 1 and "exp_id" in x for x in tasks)
+    return task_store.has_priority()
 
 
-def select_next_task(tasks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    """
-    Priority rule:
-      - First experiment task with exp_id (type=1 AND has exp_id)
-      - Else first in file order
-    """
-    for x in tasks:
-        if x.get("type") == 1 and "exp_id" in x:
-            return x
-    return tasks[0] if tasks else None
+# blocked set for select_next_task while cleanup is blocked: only type-1 (experiment) tasks may run
+TYPE1_ONLY = classes_except({CLASS_PRIORITY_EXPERIMENT, CLASS_EXPERIMENT})
 
 
-def bring_any_type1_to_front() -> Optional[Dict[str, Any]]:
+def select_next_task(blocked: Iterable[str] = ()) -> Optional[TaskRecord]:
     """
-    When cleanup is blocked (sendvial false), search tasks.json for ANY type-1.
-    If found, move it to the front and persist.
-    Returns the moved task or None.
+    Priority rule (scheduler.SCHEDULER_POLICY):
+      - First experiment task with exp_id (type=1 AND has exp_id)
+      - Else first in file order
+    Classes listed in `blocked` are skipped without reordering the queue.
     """
-    tasks = read_tasks()
-    if not tasks:
-        return None
-
-    idx = None
-    # prefer priority experiment (has exp_id) first
-    for i, t in enumerate(tasks):
-        if t.get("type") == 1 and "exp_id" in t:
-            idx = i
-            break
-    # else any type 1
-    if idx is None:
-        for i, t in enumerate(tasks):
-            if t.get("type") == 1:
-                idx = i
-                break
-
-    if idx is None:
-        return None
-
-    t = tasks.pop(idx)
-    tasks.insert(0, t)
-    write_tasks(tasks)
-    print(f"[INFO] Cleanup blocked -> moved type-1 to front: {t}", flush=True)
-    return t
+    return task_store.select_next(blocked)
 
 
 # =========================
-# Persistence: initiate_task.json (unchanged, file-backed)
+# Persistence: Station-1 initiation queue
 # =========================
-def _read_initiate_list() -> List[dict]:
-    with lock:
-        if not os.path.exists(INITIATE_FILE):
-            with open(INITIATE_FILE, "w") as f:
-                json.dump([], f)
-            return []
-        try:
-            with open(INITIATE_FILE, "r") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    return data
-                return []
-        except Exception:
-            print("[WARN] initiate_task.json unreadable; resetting to empty list.")
-            with open(INITIATE_FILE, "w") as f:
-                json.dump([], f)
-            return []
-
-
-def _write_initiate_list(items: List[dict]) -> None:
-    with lock:
-        _atomic_write_json(INITIATE_FILE, items)
+def enqueue_initiate(payload: dict) -> None:
+    initiate_queue.push(payload or {})
+    wake_dispatcher()
 
 
-def enqueue_initiate(payload: dict) -> None:
-    items = _read_initiate_list()
-    items.append(payload or {})
-    _write_initiate_list(items)
+def pop_next_initiate() -> Optional[Tuple[int, dict]]:
+    """
+    (item id, payload) of the oldest initiation. It stays persisted until
+    ack_initiate(id), so a crash mid-initiation replays it on restart.
+    """
+    return initiate_queue.pop()
 
 
-def pop_next_initiate() -> Optional[dict]:
-    items = _read_initiate_list()
-    if not items:
-        return None
-    nxt = items.pop(0)
-    _write_initiate_list(items)
-    return nxt
+def ack_initiate(item_id: int) -> None:
+    initiate_queue.ack(item_id)
 
 
 def has_initiate() -> bool:
-    items = _read_initiate_list()
-    return len(items) > 0
+    return len(initiate_queue) > 0
 
 
 # =========================
 # Helpers
 # =========================
+def wake_dispatcher() -> None:
+    work_event.set()
+
+
+def park_robot() -> None:
+    """Sends the home move the optimizer held back for the next task (robot idles at home)."""
+    if client is None:
+        return
+    try:
+        client.flush()
+    except Exception as e:
+        print(f"[WARN] Could not move robot home: {e}", flush=True)
+
+
+def wait_for_work(timeout: float) -> None:
+    """
+    Block until wake_dispatcher() is called or `timeout` seconds pass.
+    Callers re-check the queues afterwards, so a wakeup that arrives between
+    wait() and clear() is never lost. The robot is parked at home first.
+    """
+    park_robot()
+    work_event.wait(timeout)
+    work_event.clear()
+
+
+def check_cleanup_allowed() -> bool:
+    """Live sendvial check (cleanup permission for type-2 tasks)."""
+    try:
+        resp = requests.get(SEND_VIAL_API, timeout=5)
+        return bool(resp.ok and resp.json().get("sendvial", False))
+    except Exception as e:
+        print(f"[WARN] Cleanup permission check failed: {e}", flush=True)
+        return False
+
+
 def set_error(msg: str):
     global error_flag, error_message
     error_flag = True
@@ -434,14 +319,6 @@ def clear_error():
     error_message = ""
 
 
-def get_pallet_row_col(letter: str):
-    mapping = {
-        'A': (1, 1), 'B': (1, 2), 'C': (1, 3), 'D': (1, 4),
-        'E': (2, 1), 'F': (2, 2), 'G': (2, 3), 'H': (2, 4),
-    }
-    return mapping[letter.upper()]
-
-
 def is_tray_ready() -> bool:
     try:
         res = requests.get(TRAY_API, timeout=2)
@@ -493,7 +370,7 @@ def read_qr_with_retry(max_tries=2, delay=0.5):
 # =========================
 @app.on_event("startup")
 def startup_event():
-    global client, robot_ready, robot_busy, current_task
+    global client, robot_ready, robot_busy, current_task, state_sampler
 
     clear_error()
     robot_ready = False
@@ -501,16 +378,16 @@ def startup_event():
     current_task = {"type": "STARTUP"}
     set_dashboard(status="busy", task_txt="", weight=0.0, qr="")
 
-    # Ensure files exist (no in-memory queue load)
-    _ensure_file(TASK_FILE, [])
-    _ensure_file(INITIATE_FILE, [])
+    # Load + normalize the queues once (supports your status-json format too)
+    task_store.load()
+    initiate_queue.load()
 
-    # Normalize tasks.json immediately (supports your status-json format too)
-    _ = read_tasks()
+    # PLC connects in the background; a slow / absent PLC only delays the routines that need it
+    S71200_PLC.plc.warm_up()
 
     print("⚙️  Initializing robot...", flush=True)
     try:
-        client = robot_setup.setup_robot()
+        client = MotionOptimizer(robot_setup.setup_robot(), enabled=MOTION_OPTIMIZER)
         print("✅ Robot setup finished.", flush=True)
     except Exception as e:
         set_error(f"Robot setup failed: {e}")
@@ -525,26 +402,54 @@ def startup_event():
     current_task = None
     set_dashboard(status="idle")
 
-    threading.Thread(target=keep_robot_alive_loop, daemon=True).start()
+    # idle liveness probes, periodic re-attach, reconnect when the link drops
+    client.health.is_busy = lambda: robot_busy
+    client.health.start()
+    # connects in its own thread; a controller without a free status connection only shows up in its status
+    state_sampler = StateSampler(robot_setup.ROBOT_HOST, robot_setup.ROBOT_STATUS_PORT).start()
+    threading.Thread(target=permission_watcher_loop, daemon=True).start()
     threading.Thread(target=dispatcher_loop, daemon=True).start()
 
 
 # =========================
 # Background loops
 # =========================
-def keep_robot_alive_loop():
-    global robot_busy, client, shutdown_flag
+def robot_link_ready() -> bool:
+    """
+    Called by the dispatcher before handing out work: probes a quiet TCS link
+    and reconnects a dropped one (Connect + InitTCS + attach, with backoff;
+    see robot_health.LinkHealth), so a network blip costs a short wait instead
+    of the next task.
+    """
+    global robot_ready
+    if client is None:
+        return False
+    ok = client.health.ensure_ready(timeout=ROBOT_RECONNECT_WAIT_S)
+    if ok and not robot_ready:
+        print("✅ Robot link ready again.", flush=True)
+    robot_ready = ok
+    return ok
+
+
+def permission_watcher_loop():
+    """
+    Polls sendvial only while cleanup tasks are queued and wakes the dispatcher
+    when the answer changes (e.g. false -> true unblocks a waiting cleanup).
+    """
+    global cleanup_allowed, shutdown_flag
     while not shutdown_flag:
         try:
-            if client is not None and not robot_busy:
-                client.SendCommand("attach 1")
-        except Exception as e:
-            # Avoid flipping error flag during runs; only raise when idle
-            if not robot_busy:
-                set_error(f"Keep-alive failed: {e}")
+            if queue_has_type2():
+                allowed = check_cleanup_allowed()
+                if allowed != cleanup_allowed:
+                    print(f"[INFO] sendvial changed: {cleanup_allowed} -> {allowed}", flush=True)
+                    cleanup_allowed = allowed
+                    wake_dispatcher()
             else:
-                print(f"[WARN] Keep-alive failed while busy: {e}", flush=True)
-        time.sleep(600)  # every 10 minutes
+                cleanup_allowed = None   # stale once nothing needs it; dispatcher asks live next time
+        except Exception as e:
+            print(f"[WARN] Permission watcher: {e}", flush=True)
+        time.sleep(SEND_VIAL_POLL_S)
 
 
 def dispatcher_loop():
@@ -560,80 +465,88 @@ def dispatcher_loop():
 
     Extra condition:
       - If we select a type-2 (cleanup) and sendvial is false:
-          bring any type-1 in tasks.json to the front (priority) and run that first.
-          Then continue normally.
+          mask the cleanup class and run the best remaining task (type-1) instead.
+          The queue order itself is left untouched.
+
+    Wakeups: the loop sleeps on work_event (see wake_dispatcher) instead of
+    polling. New tasks/initiations, finished tasks and sendvial changes wake
+    it at once; the Station1 callback check runs every STATION1_POLL_S when idle.
     """
     global robot_busy, shutdown_flag
 
     while not shutdown_flag:
         try:
             if robot_busy:
-                time.sleep(0.5)
+                wait_for_work(STATION1_POLL_S)
                 continue
 
-            tasks = read_tasks()
+            # Work waiting but the TCS link is down: heal it before taking anything
+            if (len(task_store) or has_initiate()) and not robot_link_ready():
+                wait_for_work(STATION1_POLL_S)
+                continue
 
             # 1) If there are tasks in file -> process them first
-            if tasks:
-                t = select_next_task(tasks)
+            if len(task_store):
+                t = select_next_task()
                 if t is not None:
-                    # if cleanup is blocked, bring type-1 to front and try again
-                    if t.get("type") == 2:
-                        allow_cleanup = False
-                        try:
-                            resp = requests.get(SEND_VIAL_API, timeout=5)
-                            allow_cleanup = resp.ok and resp.json().get("sendvial", False)
-                        except Exception as e:
-                            print(f"[WARN] Cleanup permission check failed: {e}", flush=True)
-                            allow_cleanup = False
+                    # if cleanup is blocked, pick the best non-cleanup task instead
+                    if t.type == 2:
+                        # watcher's cached answer; ask live only if it has none yet
+                        allow_cleanup = cleanup_allowed
+                        if allow_cleanup is None:
+                            allow_cleanup = check_cleanup_allowed()
 
                         if not allow_cleanup:
 
                             print("[BLOCK] Cleanup blocked because sendvial=false.", flush=True)
-                            # NEW RULE: if sendvial false, move any type-1 to front (if exists)
-                            moved = bring_any_type1_to_front()
-                            if moved is not None:
-
-                                print(f"[BLOCK] Found type-1 task, moved to front: {moved}", flush=True)
-                                # Let loop re-read and execute type-1 next
-                                time.sleep(0.2)
+                            # NEW RULE: if sendvial false, take the next type-1 (if exists): every other class is masked
+                            t = select_next_task(blocked=TYPE1_ONLY)
+                            if t is not None:
+                                print(f"[BLOCK] Found type-1 task, running it first: {t}", flush=True)
+                            else:
+                                print("[BLOCK] No type-1 task available.", flush=True)
+
+                                # No type-1 found -> try initiation if any
+                                if has_initiate():
+
+                                    print("[BLOCK] Initiation exists. Running initiation.", flush=True)
+                                    item = pop_next_initiate()
+                                    if item:
+                                        item_id, payload = item
+                                        try:
+                                            if payload:
+                                                print("[INFO] Running Station-2 initiation due to blocked cleanup (no type-1 in tasks).", flush=True)
+                                                run_station2_initiation(payload)
+                                                continue
+                                        finally:
+                                            ack_initiate(item_id)
+
+                                    print("[BLOCK] No initiation available. Waiting for sendvial=true...", flush=True)
+
+                                # Still blocked and nothing else to do: sleep until new work or sendvial changes
+                                wait_for_work(STATION1_POLL_S)
                                 continue
 
-                            print("[BLOCK] No type-1 task available.", flush=True)
-
-                            # No type-1 found -> try initiation if any
-                            if has_initiate():
-
-                                print("[BLOCK] Initiation exists. Running initiation.", flush=True)
-                                payload = pop_next_initiate()
-                                if payload:
-                                    print("[INFO] Running Station-2 initiation due to blocked cleanup (no type-1 in tasks).", flush=True)
-                                    run_station2_initiation(payload)
-                                    time.sleep(0.2)
-                                    continue
-                                
-                                print("[BLOCK] No initiation available. Waiting for sendvial=true...", flush=True)
-
-                            # Still blocked and nothing else to do
-                            time.sleep(1.0)
-                            continue
-
                     # Execute the selected task (remove from file only after outcome)
                     process_task(t)
-                    time.sleep(0.2)
                     continue
 
             # 2) No tasks.json tasks -> initiation allowed (same idea as before)
             if has_initiate():
-                payload = pop_next_initiate()
-                if payload:
-                    mode = (payload or {}).get("mode")
-                    if mode == "automated_dosing":
-                        run_station2_initiation_automated_dosing(payload)
-                    else:
-                        run_station2_initiation(payload)
-                    time.sleep(0.5)
-                    continue
+                item = pop_next_initiate()
+                if item:
+                    item_id, payload = item
+                    try:
+                        if payload:
+                            mode = (payload or {}).get("mode")
+                            if mode == "automated_dosing":
+                                run_station2_initiation_automated_dosing(payload)
+                            else:
+                                run_station2_initiation(payload)
+                            continue
+                    finally:
+                        # done (or failed) -> drop it; only a crash leaves it for replay
+                        ack_initiate(item_id)
 
             # --- Station1 callback check here (idle path) ---
             try:
@@ -652,7 +565,7 @@ def dispatcher_loop():
             except requests.RequestException as e:
                 print(f"[WARN] Station1 status check failed: {e}", flush=True)
 
-            time.sleep(1.0)
+            wait_for_work(STATION1_POLL_S)
 
         except Exception as e:
             set_error(f"dispatcher_loop: {e}")
@@ -662,7 +575,7 @@ def dispatcher_loop():
 # =========================
 # Task processing (file-based tasks.json)
 # =========================
-def process_task(task: Dict[str, Any]):
+def process_task(task: TaskRecord):
     """
     task dict shapes:
       - {"type": 1, "cid": int, "rid": "A".."H"}  (exp_id optional)
@@ -675,23 +588,19 @@ def process_task(task: Dict[str, Any]):
       - Cleanup blocked:
           - we do not remove it; we just defer it (dispatcher decides what to do next)
     """
-    global robot_busy, client, current_task, error_flag, error_message, robot_ready
+    global robot_busy, client, current_task, error_flag, error_message, robot_ready, cleanup_allowed
 
     if not robot_ready or client is None:
         print("⛔ Robot not ready; will retry later (task stays in file).", flush=True)
         time.sleep(1)
         return
 
-    nt = normalize_task(task)
-    if nt is None:
-        set_error(f"Invalid task format (removing from file): {task}")
-        remove_task_from_file(task)
-        return
-
-    task_type = nt["type"]
-    cid = nt["cid"]
-    col_letter = nt["rid"]
-    exp_id = nt.get("exp_id")
+    # already validated when it was queued (TaskRecord), no re-normalizing here
+    nt = task.as_dict()
+    task_type = task.type
+    cid = task.cid
+    col_letter = task.rid
+    exp_id = task.exp_id
 
     # ---- reset error state BEFORE starting the task ----
     error_flag = False
@@ -699,26 +608,21 @@ def process_task(task: Dict[str, Any]):
     # ----------------------------------------------------
 
     robot_busy = True
-    current_task = {"type": task_type, "cid": cid, "rid": col_letter}
-    if exp_id is not None:
-        current_task["exp_id"] = exp_id
+    current_task = nt
 
     task_txt = f"{task_type} {cid} {col_letter}" + (f" exp_id={exp_id}" if exp_id is not None else "")
     set_dashboard(status="busy", task_txt=task_txt)
+    client.metrics.tag = f"{task_type}Station{cid}"   # crystalline routine, for /metrics/robot by_tag
 
     try:
         # Cleanup gate check is handled in dispatcher (so we don't duplicate too much),
         # but keep a last-guard here as well.
         if task_type == 2:
-            allow_cleanup = False
-            try:
-                resp = requests.get(SEND_VIAL_API, timeout=5)
-                allow_cleanup = resp.ok and resp.json().get("sendvial", False)
-            except Exception as e:
-                print(f"[WARN] Cleanup permission check failed: {e}", flush=True)
-                allow_cleanup = False
+            allow_cleanup = check_cleanup_allowed()
 
             if not allow_cleanup:
+                # remember it so the dispatcher masks cleanup until the watcher sees sendvial=true
+                cleanup_allowed = False
                 print("⛔ Cleanup blocked (process_task guard). Task stays in file.", flush=True)
                 return
 
@@ -728,31 +632,23 @@ def process_task(task: Dict[str, Any]):
         #     return
 
         print(f"🚀 Running task: {nt}", flush=True)
-        row, col = get_pallet_row_col(col_letter)
-        module = load_crystalline_module(task_type, cid)
-
-        # Try to pass exp_id if available; fallback to 3-arg signature
-        if exp_id is not None:
-            try:
-                module.run(client, row, col, exp_id)
-            except TypeError:
-                module.run(client, row, col)
-        else:
-            module.run(client, row, col)
+        crystalline_plans.run_task(client, task_type, cid, task.row, task.col, exp_id)
 
         print(f"✅ Task completed: {nt}", flush=True)
         # Remove from file ONLY AFTER success
-        remove_task_from_file(nt)
+        remove_task_from_file(task)
 
     except Exception as e:
         # On failure, DO NOT requeue (matches your current behavior)
         set_error(f"Task execution failed: {e}")
-        remove_task_from_file(nt)
+        remove_task_from_file(task)
 
     finally:
+        client.metrics.tag = None
         robot_busy = False
         current_task = None
         set_dashboard(status="idle", task_txt="", weight=0.0, qr="")
+        wake_dispatcher()
 
 
 # =========================
@@ -775,22 +671,20 @@ def run_station2_initiation(payload: dict):
     robot_busy = True
     current_task = {"type": "INIT_STATION2"}
     set_dashboard(status="busy", task_txt="INIT_STATION2")
+    client.metrics.tag = "INIT_STATION2"
 
     try:
         # Balance check (keep if needed in your workflow)
         balance_check.balance_check(client)
-        time.sleep(0.5)
 
         # QR check
         print("Executing qr_check", flush=True)
         qr_check.qr_check(client)
-        time.sleep(0.5)
 
         # In vial tray
         print("Executing in_vial_tray", flush=True)
         if not in_vial_tray.in_vial_tray(client):
             return
-        time.sleep(0.5)
 
         # QR place vial at the scanner
         print("Executing qr_place_vial", flush=True)
@@ -830,7 +724,6 @@ def run_station2_initiation(payload: dict):
                     set_error(f"Invalid rid from experiment lookup: {rid_val}")
                     print("Executing qr_pick_vial (invalid rid)", flush=True)
                     qr_pick_vial.qr_pick_vial(client)
-                    time.sleep(0.5)
                     print("Executing fail vial (invalid rid)", flush=True)
                     failvial.failvial(client)
                     return
@@ -852,7 +745,6 @@ def run_station2_initiation(payload: dict):
                 print(f"No experiment found for vial {vial_id}. Picking and failing vial.", flush=True)
                 print("Executing qr_pick_vial", flush=True)
                 qr_pick_vial.qr_pick_vial(client)
-                time.sleep(0.5)
                 print("Executing fail vial", flush=True)
                 failvial.failvial(client)
                 return
@@ -862,7 +754,6 @@ def run_station2_initiation(payload: dict):
             print(f"Scan Failed: {qr_data.get('data')}, Error: {qr_data.get('error')}", flush=True)
             print("Executing qr_pick_vial (scan fail)", flush=True)
             qr_pick_vial.qr_pick_vial(client)
-            time.sleep(0.5)
             print("Executing fail vial (scan fail)", flush=True)
             failvial.failvial(client)
             return
@@ -878,9 +769,11 @@ def run_station2_initiation(payload: dict):
         except Exception as e:
             print(f"[WARN] Failed to move home in initiation finally: {e}", flush=True)
 
+        client.metrics.tag = None
         robot_busy = False
         current_task = None
         set_dashboard(status="idle", task_txt="", weight=0.0, qr="")
+        wake_dispatcher()
 
 def run_station2_initiation_automated_dosing(payload: dict):
     global robot_busy, client, current_task, error_flag, error_message, robot_ready
@@ -905,21 +798,19 @@ def run_station2_initiation_automated_dosing(payload: dict):
         status="busy",
         task_txt=f"INIT_STATION2_AUTOMATED_DOSING vial_id={vial_id_from_station1}"
     )
+    client.metrics.tag = "INIT_STATION2_AUTOMATED_DOSING"
     try:
         # Balance check
         balance_check.balance_check(client)
-        time.sleep(0.5)
 
         # QR check
         print("Executing qr_check", flush=True)
         qr_check.qr_check(client)
-        time.sleep(0.5)
 
         # In vial
         print("Executing in_vial", flush=True)
         if not in_vial.in_vial(client):
             return
-        time.sleep(0.5)
 
         # QR place vial
         print("Executing qr_place_vial", flush=True)
@@ -1012,7 +903,6 @@ def run_station2_initiation_automated_dosing(payload: dict):
 
             print("Executing qr_pick_vial", flush=True)
             qr_pick_vial.qr_pick_vial(client)
-            time.sleep(0.5)
 
             print("Executing fail vial", flush=True)
             failvial.failvial(client)
@@ -1026,7 +916,6 @@ def run_station2_initiation_automated_dosing(payload: dict):
 
             print("Executing qr_pick_vial", flush=True)
             qr_pick_vial.qr_pick_vial(client)
-            time.sleep(0.5)
 
             print("Executing fail vial", flush=True)
             failvial.failvial(client)
@@ -1079,9 +968,11 @@ def run_station2_initiation_automated_dosing(payload: dict):
         except Exception as e:
             print(f"[WARN] Failed to move home in automated dosing initiation finally: {e}", flush=True)
 
+        client.metrics.tag = None
         robot_busy = False
         current_task = None
         set_dashboard(status="idle", task_txt="", weight=0.0, qr="")
+        wake_dispatcher()
 
         robot_busy = False
         current_task = None
@@ -1122,8 +1013,10 @@ def status():
         "error_message": error_message if error_flag else None,
         "status_message": status_message,
         "current_task": current_task,                    # {"type":..., "cid":..., "rid": "A".. "H", ...}
-        "initiate_queue_len": len(_read_initiate_list()), # for visibility
-        "tasks_len": len(read_tasks()),
+        "initiate_queue_len": len(initiate_queue),        # for visibility
+        "tasks_len": len(task_store),
+        "robot_link": client.health.status() if client is not None else None,
+        "plc_link": S71200_PLC.plc.status(),
     }
 
 
@@ -1165,15 +1058,38 @@ def add_task(payload: TaskPayload):
             "task": payload.task
         }
 
-    tasks = read_tasks()
-    if task_exists(tasks, nt):
+    if not enqueue_task(nt):
         return {"status": "Task already exists", "task": nt}
-
-    tasks.append(nt)
-    write_tasks(tasks)
     return {"status": "Task added", "task": nt}
 
 
+@app.post("/add_tasks")
+def add_tasks(payload: TaskListPayload):
+    results: List[Optional[Dict[str, Any]]] = []
+    valid: List[Dict[str, Any]] = []
+    seen = set()
+
+    for raw in payload.tasks:
+        nt = normalize_task(raw)
+        if nt is None:
+            results.append({"status": "Invalid task format", "task": raw})
+        elif task_key(nt) in seen:
+            results.append({"status": "Duplicate in batch", "task": nt})
+        else:
+            seen.add(task_key(nt))
+            results.append(None)   # filled in after the single enqueue below
+            valid.append(nt)
+
+    added = iter(zip(valid, enqueue_tasks(valid)))
+    for i, r in enumerate(results):
+        if r is None:
+            nt, ok = next(added)
+            results[i] = {"status": "Task added" if ok else "Task already exists", "task": nt}
+
+    n_added = sum(1 for r in results if r["status"] == "Task added")
+    return {"status": f"{n_added} task(s) added", "added": n_added, "results": results}
+
+
 @app.get("/tasks")
 def get_tasks():
     # Always returns canonical dict-based tasks
@@ -1181,9 +1097,58 @@ def get_tasks():
 
 
 @app.get("/queue")
-def get_queue():
-    # Alias
-    return {"queue": read_tasks()}
+def get_queue(since: Optional[int] = None, timeout: float = QUEUE_LONGPOLL_S):
+    """
+    Without ?since: the full queue plus its rev.
+    With ?since=rev: long-poll. Waits up to `timeout` s for changes after rev and
+    returns only those deltas ({"rev","op","task"}, op = add/remove/front).
+    If rev is too old (or from before a restart/reload) the full queue is
+    returned with "reset": true instead.
+    """
+    if since is None:
+        rev, queue = read_tasks_with_rev()
+        return {"rev": rev, "queue": queue}
+
+    queue_feed.wait(since, min(max(timeout, 0.0), QUEUE_LONGPOLL_MAX_S))
+    rev, changes = queue_feed.changes_since(since)
+    if changes is None:
+        rev, queue = read_tasks_with_rev()
+        return {"rev": rev, "reset": True, "queue": queue}
+    return {"rev": rev, "changes": changes}
+
+
+def _sse(event: str, rev: int, data: Dict[str, Any]) -> str:
+    return f"id: {rev}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _queue_events(since: Optional[int]):
+    rev, changes = (None, None) if since is None else queue_feed.changes_since(since)
+    while not shutdown_flag:
+        if changes is None:
+            rev, queue = read_tasks_with_rev()
+            yield _sse(FEED_RESET, rev, {"rev": rev, "queue": queue})
+        else:
+            for c in changes:
+                yield _sse(c["op"], c["rev"], c)
+
+        if not queue_feed.wait(rev, QUEUE_SSE_KEEPALIVE_S):
+            yield ": keepalive\n\n"
+            changes = []
+            continue
+        rev, changes = queue_feed.changes_since(rev)
+
+
+@app.get("/queue/stream")
+def queue_stream(since: Optional[int] = None, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events: a "reset" event with the full queue (unless resuming
+    via ?since= or Last-Event-ID), then one event per change (add / remove /
+    front, or reset). Event ids are feed revs.
+    """
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(_queue_events(since), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
 
 @app.post("/remove_task")
@@ -1204,6 +1169,71 @@ def requeue_task(payload: TaskPayload):
     return {"status": "Task requeued (appended if not duplicate)", "task": nt}
 
 
+@app.get("/metrics/robot")
+def get_robot_metrics(recent: int = 0):
+    """
+    Per-verb latency histograms (count, total, p50/p90/p99/max; biggest time
+    sinks first), time per verb for each crystalline routine / initiation
+    (by_tag), moves / homes the motion optimizer skipped, idle time per
+    routine (fixed sleeps vs. condition waits), telemetry upload counters,
+    and optionally the last `recent` raw commands.
+    """
+    if client is None:
+        return {"error": "Robot not initialized"}
+    out = client.metrics.summary()
+    out["motion_optimizer"] = dict(client.stats, enabled=client.enabled)
+    out["idle"] = robot_wait.IDLE.report()
+    out["telemetry"] = dict(robot_data.uploader.stats, buffered=len(robot_data.uploader.buffer))
+    if recent > 0:
+        out["recent"] = client.metrics.recent(recent)
+    return out
+
+
+@app.get("/metrics/robot/state")
+def get_robot_state(seconds: float = 3600.0, points: int = 200):
+    """
+    Robot state trend from the status connection: the last `seconds` of
+    joint positions, controller temperature (mean / min / max), trajectory
+    time and speed, averaged into at most `points` time buckets.
+    """
+    if state_sampler is None:
+        return {"error": "Robot not initialized"}
+    return {
+        "sampler": state_sampler.status(),
+        "latest": state_sampler.ring.latest(),
+        "window": state_sampler.ring.window(seconds=seconds, points=min(max(points, 1), 2000)),
+    }
+
+
+@app.post("/metrics/robot/dump")
+def dump_robot_metrics():
+    """Writes the summary + every buffered command to ROBOT_METRICS_DIR/robot_metrics_<time>.json."""
+    if client is None:
+        return {"error": "Robot not initialized"}
+    return {"path": dump_robot_metrics_file()}
+
+
+def dump_robot_metrics_file() -> str:
+    os.makedirs(ROBOT_METRICS_DIR, exist_ok=True)
+    path = os.path.join(ROBOT_METRICS_DIR, time.strftime("robot_metrics_%Y%m%d_%H%M%S.json"))
+    return client.metrics.dump(path)
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    park_robot()
+    if state_sampler is not None:
+        state_sampler.stop()
+    # last telemetry upload; what the endpoint does not take stays in the spool for next start
+    robot_data.uploader.stop()
+    # keep the session's latency record
+    if client is not None and len(client.metrics.ring):
+        try:
+            print(f"Robot metrics written to {dump_robot_metrics_file()}", flush=True)
+        except OSError as e:
+            print(f"[WARN] Could not dump robot metrics: {e}", flush=True)
+
+
 @app.get("/next_task")
 def get_next_task():
     """
@@ -1211,9 +1241,8 @@ def get_next_task():
     because tasks.json is the single source of truth and dispatcher is the consumer.
     It simply returns what WOULD be selected next by the priority rule.
     """
-    tasks = read_tasks()
-    t = select_next_task(tasks)
-    return {"task": t}
+    t = select_next_task()
+    return {"task": t.as_dict() if t is not None else None}
 
 
 # =========================
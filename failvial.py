@@ -1,4 +1,4 @@
-import time
+from robot_wait import pad
 
 def failvial(client):
 
@@ -20,7 +20,7 @@ def failvial(client):
             client.SendCommand("graspplate 117 60 10")
             reply = client.SendCommand("waitforeom")
 
-            time.sleep(1)
+            pad(1, "failvial")   # vial drops out of the opened gripper before the arm moves off
 
             client.SendCommand("movej 1 182.018 -2.902 180.537 178.063 103.542 431.523")
             reply = client.SendCommand("waitforeom")
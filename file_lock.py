@@ -0,0 +1,91 @@
+# file_lock.py
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Advisory inter-process lock on `path` (a separate "<data file>.lock" file,
+    so the data files themselves can still be replaced atomically).
+
+      with lk.shared():     many readers at once, no writer
+      with lk.exclusive():  one writer, no readers
+
+    POSIX uses flock(). Windows (msvcrt) only has exclusive byte-range locks,
+    so shared() is exclusive there.
+
+    Re-entrant within one process: nested shared()/exclusive() inside an
+    exclusive section, or shared() inside shared(), cost nothing. Upgrading a
+    held shared lock to exclusive raises (release it and take exclusive).
+    Not thread-safe on its own: callers serialize threads with their own lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+        self._exclusive = False
+
+    def _acquire(self, exclusive: bool) -> None:
+        if self._depth:
+            if exclusive and not self._exclusive:
+                raise RuntimeError(f"Cannot upgrade shared lock on {self.path} to exclusive")
+            self._depth += 1
+            return
+
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+            exclusive = True
+
+        self._exclusive = exclusive
+        self._depth = 1
+
+    def _release(self) -> None:
+        self._depth -= 1
+        if self._depth:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def shared(self):
+        self._acquire(False)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextmanager
+    def exclusive(self):
+        self._acquire(True)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def close(self) -> None:
+        if self._fd is not None and not self._depth:
+            os.close(self._fd)
+            self._fd = None
@@ -1,6 +1,5 @@
 #in_vial.py
 
-import time
 
 def in_vial(client):
     """
@@ -15,8 +14,6 @@ def in_vial(client):
         if reply == "0":
             print("Robot moved to In Tray.")
 
-            time.sleep(0.5)
-
             # Try to pick the plate
             reply = client.SendCommand("pickplate 10")
             client.SendCommand("waitforeom")
@@ -1,4 +1,3 @@
-import time
 import os
 
 def in_vial_tray(client):
@@ -59,8 +58,6 @@ def in_vial_tray(client):
                 with open("tray_pos.txt", "w") as file:
                     file.write(str(tray_pos))
 
-                time.sleep(0.5)
-
                 # Try to pick the plate
                 reply = client.SendCommand("pickplate 7")
                 client.SendCommand("waitforeom")
@@ -0,0 +1,189 @@
+# motion_optimizer.py
+#
+# Drops robot moves that cannot change anything: a movej / moveoneaxis to
+# the pose the arm is already commanded to, and a return to home when the
+# next motion may safely start from where the arm is (SAFE_TRANSITIONS).
+
+import threading
+
+HOME = "movej 1 1017.83 -2.902 180.537 178.063 103.542 -934.686"
+HOME_POSE = (1017.83, -2.902, 180.537, 178.063, 103.542, -934.686)
+
+# shoulder / elbow / wrist with the arm folded in (every retreat, exit and home pose)
+FOLDED_ARM = (-2.902, 180.537, 178.063)
+
+POSE_TOLERANCE = 1e-3
+
+# (arm joints 2-4, minimum Z, next motion): a home is only skipped when the
+# pose it would start from and the first motion after it match one entry.
+# Every entry is a move the routines already make without homing in between.
+SAFE_TRANSITIONS = (
+    # arm folded at or above the QR exit height -> rail move
+    # (qr_pick_vial -> balance_place, balance_check -> qr_check, upper-level retreat -> qr_pick_vial)
+    (FOLDED_ARM, 732.082, "moveoneaxis 6 "),
+)
+
+# commands that neither move the arm nor depend on where it is
+PASSIVE_VERBS = ("waitforeom", "palletindex", "pd", "hp", "attach", "mode", "selectrobot")
+
+
+def _same(a, b):
+    return all(abs(x - y) <= POSE_TOLERANCE for x, y in zip(a, b))
+
+
+def _parse_movej(command):
+    # "movej <profile> j1..j6" -> (j1..j6) or None
+    parts = command.split()
+    if len(parts) != 8 or parts[0].lower() != "movej":
+        return None
+    try:
+        return tuple(float(x) for x in parts[2:8])
+    except ValueError:
+        return None
+
+
+def _parse_moveoneaxis(command):
+    # "moveoneaxis <axis> <position> <profile>" -> (axis index, position) or None
+    parts = command.split()
+    if len(parts) < 3 or parts[0].lower() != "moveoneaxis":
+        return None
+    try:
+        axis = int(parts[1])
+        pos = float(parts[2])
+    except ValueError:
+        return None
+    return (axis - 1, pos) if 1 <= axis <= 6 else None
+
+
+class MotionOptimizer:
+    """
+    Wraps a TCS client (PyClient / SyncPyClient); everything but SendCommand
+    and send_batch is passed through, so it can stand in for the client.
+
+    - The last commanded joint pose is tracked (movej, moveoneaxis on a known
+      pose); any other motion or a TCS error makes it unknown.
+    - A movej / moveoneaxis to the tracked pose is not sent (reply "0").
+    - HOME is deferred when the arm's pose could start a whitelisted
+      transition: the next motion either matches one (the home is dropped)
+      or HOME + waitforeom are sent first, as the routine had them.
+    - Passive commands (PASSIVE_VERBS) leave a deferred home pending;
+      anything else sends it first.
+    - A link failure or reconnect seen by the client's LinkHealth (its epoch
+      changed, e.g. through a health probe) makes the pose unknown: the arm
+      may have been jogged or re-homed meanwhile. A deferred home is then
+      always sent before the next motion.
+
+    flush() sends a pending home; the dispatcher calls it before it goes idle,
+    so the robot never waits for work away from home.
+    """
+
+    def __init__(self, client, transitions=SAFE_TRANSITIONS, enabled=True):
+        self.client = client
+        self.transitions = transitions
+        self.enabled = enabled
+        self.pose = None
+        self.pending_home = False
+        self.stats = {"moves_skipped": 0, "homes_skipped": 0, "homes_flushed": 0, "pose_resets": 0}
+        self._lock = threading.RLock()
+        self._epoch = self._link_epoch()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _link_epoch(self):
+        health = getattr(self.client, "health", None)
+        return getattr(health, "epoch", None)
+
+    def _check_link(self):
+        # caller holds _lock; the pose is only trusted while the link stayed up
+        epoch = self._link_epoch()
+        if epoch != self._epoch:
+            self._epoch = epoch
+            if self.pose is not None:
+                self.pose = None
+                self.stats["pose_resets"] += 1
+
+    def _home_may_skip(self, command):
+        if self.pose is None:
+            return False
+        for arm, min_z, prefix in self.transitions:
+            if _same(self.pose[1:4], arm) and self.pose[0] >= min_z - POSE_TOLERANCE:
+                if command is None or command.startswith(prefix):
+                    return True
+        return False
+
+    def _send_home(self):
+        # stays pending if this fails; the next motion / flush() tries again
+        self.client.SendCommand(HOME)
+        self.client.SendCommand("waitforeom")
+        self.pending_home = False
+        self.pose = HOME_POSE
+        self.stats["homes_flushed"] += 1
+
+    def flush(self):
+        """Sends a deferred home (no-op if none is pending)."""
+        with self._lock:
+            self._check_link()
+            if self.pending_home:
+                self._send_home()
+
+    def _target(self, command):
+        # pose after `command`: (pose, is_motion); pose None = unknown
+        joints = _parse_movej(command)
+        if joints is not None:
+            return joints, True
+        axis = _parse_moveoneaxis(command)
+        if axis is not None:
+            if self.pose is None:
+                return None, True
+            pose = list(self.pose)
+            pose[axis[0]] = axis[1]
+            return tuple(pose), True
+        parts = command.split(None, 1)
+        if not parts or parts[0].lower() in PASSIVE_VERBS:
+            return self.pose, False
+        return None, True   # pickplate, movec, graspplate, ...: pose not tracked
+
+    def SendCommand(self, command, timeout=None):
+        if not self.enabled:
+            return self.client.SendCommand(command, timeout=timeout)
+
+        with self._lock:
+            self._check_link()
+            target, moves = self._target(command)
+
+            if moves and target is not None and _same(target, HOME_POSE):
+                if self.pending_home or (self.pose is not None and _same(self.pose, HOME_POSE)):
+                    self.stats["moves_skipped"] += 1
+                    return "0"
+                if self._home_may_skip(None):
+                    self.pending_home = True
+                    return "0"
+
+            if self.pending_home and moves:
+                if self._home_may_skip(command):
+                    self.pending_home = False
+                    self.stats["homes_skipped"] += 1
+                else:
+                    self._send_home()
+                    target, moves = self._target(command)
+
+            if moves and target is not None and self.pose is not None and _same(target, self.pose):
+                self.stats["moves_skipped"] += 1
+                return "0"
+
+            try:
+                reply = self.client.SendCommand(command, timeout=timeout)
+            except Exception:
+                self.pose = None   # TCS error / lost link: the arm may be anywhere
+                raise
+            # a reconnect since _check_link() (another thread) leaves the pose unknown
+            self.pose = target if self._link_epoch() == self._epoch else None
+            return reply
+
+    def send_batch(self, commands, *args, **kwargs):
+        # batches are non-motion (calibration, robot_data): pose unchanged, home first unless all passive
+        commands = list(commands)
+        if any(command.split(None, 1)[0].lower() not in PASSIVE_VERBS for command in commands if command.strip()):
+            self.flush()
+        return self.client.send_batch(commands, *args, **kwargs)
@@ -0,0 +1,167 @@
+# motion_plan.py
+#
+# Robot routines as data: a plan is a graph of named blocks, each a list of
+# steps. Plans are compiled once per station (station parameters filled in,
+# references checked) and run by one interpreter.
+
+from robot_wait import pad
+
+# Steps (tuples):
+#   ("send", cmd[, var])         SendCommand(cmd); reply -> ctx[var]
+#   ("move", cmd[, var])         SendCommand(cmd) + waitforeom; eom reply -> ctx[var]
+#   ("sleep", seconds)           seconds may be a "{param}"; counted per plan in robot_wait.IDLE
+#   ("say", text)                print
+#   ("call", hook, *args)        hooks[hook](client, ctx, *args) -> None (go on), block name, or END
+#   ("when", param, step)        compile time: step kept only if the station's param is true
+# Transitions (end a block; a block without one ends the plan):
+#   ("if", var, value, then_block, else_block)
+#   ("goto", block)
+#   ("end",)
+# The "finally" block, if any, runs after every outcome, including exceptions.
+
+END = "end"
+START = "start"
+FINALLY = "finally"
+
+_TRANSITIONS = ("if", "goto", "end")
+
+
+class PlanError(ValueError):
+    """Plan does not compile (unknown step/hook/block, missing station parameter)."""
+
+
+class _Station(dict):
+    # format_map helper: station parameters are filled in, task fields ({row}, {col}, ...) stay
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def _fill(text, params):
+    text = text.format_map(_Station(params))
+    return text, ("{" in text)   # still needs the task fields at run time
+
+
+class MotionPlan:
+    """
+    One compiled plan for one station: blocks of
+    (op, arg, var, needs_format) steps and a transition per block.
+    """
+
+    def __init__(self, name, params, blocks, hooks):
+        self.name = name
+        self.params = dict(params)
+        self.hooks = hooks
+        self.blocks = {}
+        for block, steps in blocks.items():
+            self.blocks[block] = self._compile_block(block, steps)
+        self._check()
+
+    def _compile_step(self, block, step):
+        op = step[0]
+        if op in ("send", "move"):
+            cmd, dynamic = _fill(step[1], self.params)
+            return (op, cmd, step[2] if len(step) > 2 else None, dynamic)
+        if op == "say":
+            text, dynamic = _fill(step[1], self.params)
+            return (op, text, None, dynamic)
+        if op == "sleep":
+            seconds = step[1]
+            if isinstance(seconds, str):
+                seconds = float(_fill(seconds, self.params)[0])
+            return (op, float(seconds), None, False)
+        if op == "call":
+            if step[1] not in self.hooks:
+                raise PlanError(f"{self.name}/{block}: unknown hook {step[1]!r}")
+            return (op, step[1], tuple(step[2:]), False)
+        raise PlanError(f"{self.name}/{block}: unknown step {step!r}")
+
+    def _compile_block(self, block, steps):
+        compiled = []
+        transition = ("end",)
+        for i, step in enumerate(steps):
+            if step[0] == "when":
+                if step[1] not in self.params:
+                    raise PlanError(f"{self.name}/{block}: station has no parameter {step[1]!r}")
+                if not self.params[step[1]]:
+                    continue
+                step = step[2]
+            if step[0] in _TRANSITIONS:
+                if i != len(steps) - 1:
+                    raise PlanError(f"{self.name}/{block}: {step[0]!r} must be the last step")
+                transition = step
+                continue
+            try:
+                compiled.append(self._compile_step(block, step))
+            except (KeyError, IndexError, ValueError) as e:
+                raise PlanError(f"{self.name}/{block}: bad step {step!r}: {e}")
+        return compiled, transition
+
+    def _check(self):
+        if START not in self.blocks:
+            raise PlanError(f"{self.name}: no {START!r} block")
+        for block, (_, transition) in self.blocks.items():
+            targets = {"if": transition[3:5], "goto": transition[1:2]}.get(transition[0], ())
+            for target in targets:
+                if target not in self.blocks:
+                    raise PlanError(f"{self.name}/{block}: unknown block {target!r}")
+
+    def _run_block(self, client, ctx, block):
+        steps, transition = self.blocks[block]
+        for op, arg, var, dynamic in steps:
+            if dynamic:
+                arg = arg.format(**ctx)
+            if op == "send":
+                reply = client.SendCommand(arg)
+                if var:
+                    ctx[var] = reply
+            elif op == "move":
+                client.SendCommand(arg)
+                reply = client.SendCommand("waitforeom")
+                if var:
+                    ctx[var] = reply
+            elif op == "sleep":
+                pad(arg, self.name)
+            elif op == "say":
+                print(arg)
+            else:   # call
+                nxt = self.hooks[arg](client, ctx, *var)
+                if nxt is not None:
+                    return nxt
+
+        if transition[0] == "if":
+            _, var, value, then_block, else_block = transition
+            return then_block if ctx.get(var) == value else else_block
+        if transition[0] == "goto":
+            return transition[1]
+        return END
+
+    def run(self, client, **task):
+        """
+        Runs the plan from START with ctx = station params + task fields.
+        Exceptions propagate after the FINALLY block ran. Returns ctx.
+        """
+        ctx = dict(self.params, **task)
+        block = START
+        try:
+            while block != END:
+                if block not in self.blocks:
+                    raise PlanError(f"{self.name}: unknown block {block!r}")
+                block = self._run_block(client, ctx, block)
+        finally:
+            if FINALLY in self.blocks:
+                self._run_block(client, ctx, FINALLY)
+        return ctx
+
+
+def compile_plans(plans, stations, hooks):
+    """
+    plans: {plan_name: blocks}; stations: {station: params incl. "plans": [plan_name, ...]}.
+    Returns {(plan_name, station): MotionPlan}; raises PlanError on the first problem.
+    """
+    compiled = {}
+    for station, params in stations.items():
+        for name in params.get("plans", plans):
+            if name not in plans:
+                raise PlanError(f"station {station}: unknown plan {name!r}")
+            compiled[(name, station)] = MotionPlan(f"{name}@{station}", params, plans[name], hooks)
+    return compiled
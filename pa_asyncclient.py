@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+import time
+
+from robot_health import LinkHealth, LINK_ERRORS
+from robot_metrics import CommandMetrics, CODE_LINK, reply_code
+
+DEFAULT_TIMEOUT = None   # seconds per command; None waits for the reply like PyClient (waitforeom lasts the whole motion)
+BATCH_WINDOW = 8         # send_batch: commands written ahead of their replies
+CLIENT_TIMEOUT = object()   # per-call timeout argument: use the client's timeout (None = no timeout)
+
+
+class TCSError(Exception):
+    """Reply starting with "-" (same message format as PyClient: "TCS error: ...")."""
+
+
+class AsyncPyClient:
+    """
+    asyncio version of pa_pyclient.PyClient for the PF400 TCS, no telnetlib.
+
+    Same command/reply semantics:
+      - every command is one line, the reply ends with "\\r\\n"
+      - in mode 1 the TCS sends an extra line first; it is read and ignored
+      - a reply starting with "-" raises TCSError
+
+    Commands share one connection, so they are serialized by an asyncio.Lock:
+    several coroutines (task code, status queries, keep-alives) can use the
+    same client on one event loop without extra threads. A command waits for
+    its reply up to the timeout passed with it, else the client's timeout
+    (None: no limit, the default); if it times out or is cancelled mid-reply
+    the connection is closed (the reply stream would be out of step), the next
+    command reconnects only after connect() + init_tcs().
+    """
+
+    def __init__(self, host, port, mode=0, timeout=DEFAULT_TIMEOUT, verbose=True):
+        self.host = host
+        self.port = int(port)
+        self.mode = mode
+        self.timeout = timeout
+        self.verbose = verbose
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+        self.metrics = CommandMetrics()
+
+    @classmethod
+    async def open(cls, host, port, mode=0, timeout=DEFAULT_TIMEOUT, verbose=True):
+        """Connected and initialized client (like PyClient's constructor)."""
+        client = cls(host, port, mode=mode, timeout=timeout, verbose=verbose)
+        await client.connect()
+        await client.init_tcs()
+        return client
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), timeout=5
+            )
+        except Exception as e:
+            raise Exception(f"[ERROR] Could not establish TCS connection: {e}")
+        if self.verbose:
+            print("🔌 TCS connection established.")
+
+    async def init_tcs(self):
+        if not self.connected:
+            await self.connect()
+
+        mode_cmd = "mode 0" if self.mode == 0 else "mode 1"
+        try:
+            await self.send_command(mode_cmd)
+        except Exception as e:
+            print(f"[WARNING] Could not set mode: {e}. Retrying in 5 seconds...")
+            await asyncio.sleep(5)
+            if not self.connected:
+                await self.connect()
+            try:
+                await self.send_command(mode_cmd)
+            except Exception as e:
+                raise Exception(f"[FATAL] Failed to set mode twice: {e}")
+
+        try:
+            await self.send_command("selectrobot 1")
+        except Exception as e:
+            raise Exception(f"[FATAL] Could not select robot: {e}")
+
+    async def _readline(self):
+        line = await self._reader.readuntil(b"\r\n")
+        return line.rstrip().decode("ascii")
+
+    async def _exchange(self, command):
+        self._writer.write(command.encode("ascii") + b"\n")
+        await self._writer.drain()
+        if self.mode == 1:
+            _ = await self._readline()  # Ignore for now
+        return await self._readline()
+
+    def _timeout(self, timeout):
+        return self.timeout if timeout is CLIENT_TIMEOUT else timeout
+
+    async def send_command(self, command, timeout=CLIENT_TIMEOUT):
+        """Sends one command and returns its reply line. Raises TCSError on "-..." replies."""
+        async with self._lock:
+            if not self.connected:
+                raise ConnectionError("TCS not connected")
+            if self.verbose:
+                print(f">> {command}")
+            t_send = time.time()
+            try:
+                response = await asyncio.wait_for(self._exchange(command), self._timeout(timeout))
+            except (asyncio.TimeoutError, asyncio.CancelledError, asyncio.IncompleteReadError, OSError):
+                self.metrics.record(command, t_send, time.time(), CODE_LINK)
+                self._drop()
+                raise
+            self.metrics.record(command, t_send, time.time(), reply_code(response))
+
+        if response.startswith("-"):
+            raise TCSError(f"TCS error: {response}")
+
+        if self.verbose:
+            print(f"<< {response}")
+        return response
+
+    async def send_batch(self, commands, window=BATCH_WINDOW, timeout=CLIENT_TIMEOUT):
+        """
+        Pipelined non-motion commands, same rules as PyClient.send_batch: up to
+        `window` in flight, nothing more sent after the first "-" reply, all
+        in-flight replies drained, then TCSError naming the failed command.
+        `timeout` applies to each reply.
+        """
+        commands = list(commands)
+        timeout = self._timeout(timeout)
+        replies = []
+        sent_at = []
+        sent = 0
+        failed = None
+
+        async with self._lock:
+            if not self.connected:
+                raise ConnectionError("TCS not connected")
+            try:
+                while len(replies) < sent or (failed is None and sent < len(commands)):
+                    burst = []
+                    while failed is None and sent < len(commands) and sent - len(replies) < window:
+                        if self.verbose:
+                            print(f">> {commands[sent]}")
+                        burst.append(commands[sent].encode("ascii") + b"\n")
+                        sent += 1
+                    if burst:
+                        self._writer.write(b"".join(burst))
+                        await self._writer.drain()
+                        sent_at.extend([time.time()] * len(burst))
+
+                    command = commands[len(replies)]
+                    if self.mode == 1:
+                        _ = await asyncio.wait_for(self._readline(), timeout)
+                    response = await asyncio.wait_for(self._readline(), timeout)
+                    self.metrics.record(command, sent_at[len(replies)], time.time(), reply_code(response))
+                    replies.append(response)
+                    if failed is None and response.startswith("-"):
+                        failed = (command, response)
+                    elif self.verbose:
+                        print(f"<< {response}")
+            except (asyncio.TimeoutError, asyncio.CancelledError, asyncio.IncompleteReadError, OSError):
+                self._drop()
+                raise
+
+        if failed is not None:
+            raise TCSError(f"TCS error on batch command {failed[0]!r}: {failed[1]}")
+        return replies
+
+    def _drop(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            writer = self._writer
+            self._drop()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            if self.verbose:
+                print("🔒 Connection closed.")
+
+    async def __aenter__(self):
+        if not self.connected:
+            await self.connect()
+            await self.init_tcs()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class SyncPyClient:
+    """
+    Blocking facade with PyClient's interface (Connect / InitTCS / SendCommand /
+    Disconnect / Close, io_lock, health), so existing station routines keep
+    working unchanged. It runs an AsyncPyClient on a private event loop thread;
+    other coroutines (status polls, keep-alives) can share the connection
+    through submit().
+    """
+
+    def __init__(self, host, port, mode=0, timeout=DEFAULT_TIMEOUT):
+        print("Initializing connection...")
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.io_lock = threading.RLock()
+        self.health = LinkHealth(self)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="tcs-client", daemon=True)
+        self._thread.start()
+        self.aclient = self._run(self._make_client(host, port, mode, timeout))
+
+        self.Connect()
+        self.InitTCS()
+        print("✅ Robot connection ready.")
+
+    @staticmethod
+    async def _make_client(host, port, mode, timeout):
+        # created on the loop thread so its asyncio.Lock belongs to that loop
+        return AsyncPyClient(host, port, mode=mode, timeout=timeout)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    @property
+    def metrics(self):
+        return self.aclient.metrics
+
+    def submit(self, coro):
+        """Schedules a coroutine on the client's loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def Connect(self):
+        self._run(self.aclient.connect())
+
+    def InitTCS(self):
+        self._run(self.aclient.init_tcs())
+
+    def _exchange(self, coro):
+        with self.io_lock:
+            try:
+                result = self._run(coro)
+            except TCSError:
+                self.health.note_ok()
+                raise
+            except (asyncio.TimeoutError,) + LINK_ERRORS as e:
+                self.health.note_failure(e)
+                raise
+            self.health.note_ok()
+            return result
+
+    def SendCommand(self, command, timeout=CLIENT_TIMEOUT):
+        return self._exchange(self.aclient.send_command(command, timeout=timeout))
+
+    def send_batch(self, commands, timeout=CLIENT_TIMEOUT):
+        return self._exchange(self.aclient.send_batch(commands, timeout=timeout))
+
+    def Disconnect(self):
+        with self.io_lock:
+            self._run(self.aclient.close())
+
+    def Close(self):
+        self.health.stop()
+        if self.loop.is_running():
+            self._run(self.aclient.close())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
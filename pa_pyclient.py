@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
 
-import telnetlib
+import threading
 import time
 
+from robot_health import LinkHealth, LINK_ERRORS
+from robot_metrics import CommandMetrics, CODE_LINK, reply_code
+
+try:
+    import telnetlib
+except ImportError:  # removed in Python 3.13 -> use pa_asyncclient.SyncPyClient
+    telnetlib = None
+
+BATCH_WINDOW = 8   # send_batch: commands written ahead of their replies
+
 class PyClient:
 
     def __init__(self, host, port, mode=0):
@@ -11,12 +21,17 @@ class PyClient:
         self.port = port
         self.mode = mode
         self.connection = None
+        self.io_lock = threading.RLock()   # one exchange at a time (task thread vs. health probes)
+        self.health = LinkHealth(self)
+        self.metrics = CommandMetrics()    # per-command latency (ring + per-verb histograms)
 
         self.Connect()
         self.InitTCS()
         print("✅ Robot connection ready.")
 
     def Connect(self):
+        if telnetlib is None:
+            raise Exception("[ERROR] telnetlib is not available on this Python; use pa_asyncclient.SyncPyClient")
         try:
             self.connection = telnetlib.Telnet(self.host, self.port, timeout=5)
             print("🔌 Telnet connection established.")
@@ -51,14 +66,46 @@ class PyClient:
         except Exception as e:
             raise Exception(f"[FATAL] Could not select robot: {e}")
 
-    def SendCommand(self, command):
-        print(f">> {command}")
-        self.connection.write((command.encode("ascii") + b"\n"))
+    def _read_line(self, timeout=None):
+        line = self.connection.read_until(b"\r\n", timeout)
+        if not line.endswith(b"\r\n"):
+            # read_until gives back a partial line on timeout / closed connection
+            if timeout is not None:
+                raise TimeoutError(f"No TCS reply within {timeout}s")
+            raise EOFError("TCS connection closed")
+        return line.rstrip().decode("ascii")
 
+    def _read_reply(self, timeout=None):
         if self.mode == 1:
-            _ = self.connection.read_until(b"\r\n").rstrip().decode("ascii")  # Ignore for now
+            _ = self._read_line(timeout)  # Ignore for now
 
-        response = self.connection.read_until(b"\r\n").rstrip().decode("ascii")
+        return self._read_line(timeout)
+
+    def _link_lost(self, error):
+        # the reply stream is out of step (or gone): drop it, health reconnects
+        if self.connection:
+            try:
+                self.connection.close()
+            except OSError:
+                pass
+        self.connection = None
+        self.health.note_failure(error)
+
+    def SendCommand(self, command, timeout=None):
+        with self.io_lock:
+            print(f">> {command}")
+            t_send = time.time()
+            try:
+                if not self.connection:
+                    raise ConnectionError("TCS not connected")
+                self.connection.write((command.encode("ascii") + b"\n"))
+                response = self._read_reply(timeout)
+            except LINK_ERRORS as e:
+                self.metrics.record(command, t_send, time.time(), CODE_LINK)
+                self._link_lost(e)
+                raise
+            self.metrics.record(command, t_send, time.time(), reply_code(response))
+            self.health.note_ok()
 
         if response.startswith("-"):
             raise Exception(f"TCS error: {response}")
@@ -66,7 +113,59 @@ class PyClient:
         print(f"<< {response}")
         return response
 
+    def send_batch(self, commands, window=BATCH_WINDOW):
+        """
+        Pipelines non-motion (configuration) commands: up to `window` commands
+        are written ahead, replies are read back in order. Returns the replies.
+
+        On the first "-" reply nothing more is sent; the replies of commands
+        already in flight are still read (keeps the connection in step), then
+        it raises naming the failed command.
+        """
+        commands = list(commands)
+        replies = []
+        sent_at = []
+        sent = 0
+        failed = None
+
+        with self.io_lock:
+            try:
+                if not self.connection:
+                    raise ConnectionError("TCS not connected")
+                while len(replies) < sent or (failed is None and sent < len(commands)):
+                    burst = []
+                    while failed is None and sent < len(commands) and sent - len(replies) < window:
+                        print(f">> {commands[sent]}")
+                        burst.append(commands[sent].encode("ascii") + b"\n")
+                        sent += 1
+                    if burst:
+                        self.connection.write(b"".join(burst))
+                        sent_at.extend([time.time()] * len(burst))
+
+                    command = commands[len(replies)]
+                    response = self._read_reply()
+                    self.metrics.record(command, sent_at[len(replies)], time.time(), reply_code(response))
+                    replies.append(response)
+                    if failed is None and response.startswith("-"):
+                        failed = (command, response)
+                    else:
+                        print(f"<< {response}")
+            except LINK_ERRORS as e:
+                self._link_lost(e)
+                raise
+            self.health.note_ok()
+
+        if failed is not None:
+            raise Exception(f"TCS error on batch command {failed[0]!r}: {failed[1]}")
+        return replies
+
+    def Disconnect(self):
+        with self.io_lock:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+                print("🔒 Connection closed.")
+
     def Close(self):
-        if self.connection:
-            self.connection.close()
-            print("🔒 Connection closed.")
+        self.health.stop()
+        self.Disconnect()
@@ -1,48 +1,81 @@
-import time
+import os
 import S71200_PLC
 import requests
+from robot_wait import WaitTimeout, pad, wait_until
 
-def plc_qr_seq():
+# PLC QR reader
+CLEAR_BIT = (10, 1)          # %M10.1 pulse: clear the last result
+TRIGGER_BIT = (10, 0)        # %M10.0 pulse: start a scan
+COMPLETE_INPUT = (4, 0)      # %I4.0 scan finished
+ERROR_INPUT = (5, 0)         # %I5.0 scan finished without a code
+QR_DATA = (1, 136, 20)       # DB1.136, string[20]
+
+PULSE_S = 0.1                # pulse width: several PLC scan cycles
+CLEAR_TIMEOUT_S = 2.0        # a clear must drop %I4.0 / %I5.0 within this
+SCAN_TIMEOUT_S = float(os.environ.get("CSDF_QR_SCAN_TIMEOUT_S", "12"))   # the old fixed wait was 11 s
+POLL_S = 0.02
+RESULT_SETTLE_S = 0.05       # %I5.0 may follow %I4.0 by a PLC cycle
+
+
+def _pulse(bit):
+    S71200_PLC.write_memory_bit(*bit, True)
+    try:
+        pad(PULSE_S, "qr_scan")
+    finally:
+        S71200_PLC.write_memory_bit(*bit, False)
+
+
+def _result_clear():
+    return not (S71200_PLC.read_input_bit(*COMPLETE_INPUT, verbose=False)
+                or S71200_PLC.read_input_bit(*ERROR_INPUT, verbose=False))
+
+
+def plc_qr_seq(timeout=SCAN_TIMEOUT_S):
+    """
+    One QR scan: clear (verified: %I4.0 / %I5.0 drop), trigger, then poll
+    %I4.0 every POLL_S and read the result as soon as it is set, at most
+    `timeout` s after the trigger.
+    """
     print("Executing PLC QR Sequence")
 
     try:
-        # Trigger clr bit
-        S71200_PLC.write_memory_bit(10, 1, True)
-        time.sleep(1)
-        S71200_PLC.write_memory_bit(10, 1, False)
-        time.sleep(1)
+        # Trigger clr bit; a result still showing afterwards would be read as this scan's
+        _pulse(CLEAR_BIT)
+        wait_until(_result_clear, CLEAR_TIMEOUT_S, poll_s=POLL_S, routine="qr_scan", what="QR result clear")
 
         # Trigger sequence
-        S71200_PLC.write_memory_bit(10, 0, True)
-        time.sleep(1)
-        S71200_PLC.write_memory_bit(10, 0, False)
-        time.sleep(11)  # wait for scan
+        _pulse(TRIGGER_BIT)
+
+        # wait for scan
+        try:
+            wait_until(lambda: S71200_PLC.read_input_bit(*COMPLETE_INPUT, verbose=False), timeout,
+                       poll_s=POLL_S, routine="qr_scan", what="QR scan complete")
+        except WaitTimeout as e:
+            print(f"No valid QR result received: {e}")
+            return {"success": False, "data": None}
+        pad(RESULT_SETTLE_S, "qr_scan")
 
         # Read bits
-        QR_Comp = S71200_PLC.read_input_bit(4, 0)
-        QR_Error = S71200_PLC.read_input_bit(5, 0)
+        QR_Comp = S71200_PLC.read_input_bit(*COMPLETE_INPUT)
+        QR_Error = S71200_PLC.read_input_bit(*ERROR_INPUT)
 
         # Process result
         if QR_Comp and not QR_Error:
-            QR_Data = S71200_PLC.read_db_string(1, 136, 20)
+            QR_Data = S71200_PLC.read_db_string(*QR_DATA)
             print(f"QR Scan Successful! : {QR_Data}")
 
-            payload = {"qrdata": f"{QR_Data}"}        
+            payload = {"qrdata": f"{QR_Data}"}
             resp = requests.post("http://127.0.0.1:1880/qr-update", json=payload, timeout=1)
 
-            S71200_PLC.write_memory_bit(10, 1, True)
-            time.sleep(1)
-            S71200_PLC.write_memory_bit(10, 1, False)
+            _pulse(CLEAR_BIT)
 
             return {"success": True, "data": QR_Data}
 
         elif QR_Comp and QR_Error:
-            QR_Data = S71200_PLC.read_db_string(1, 136, 20)
+            QR_Data = S71200_PLC.read_db_string(*QR_DATA)
             print(f"QR Scan Unsuccessful! : {QR_Data}")
 
-            S71200_PLC.write_memory_bit(10, 1, True)
-            time.sleep(1)
-            S71200_PLC.write_memory_bit(10, 1, False)
+            _pulse(CLEAR_BIT)
 
             return {"success": False, "data": QR_Data}
 
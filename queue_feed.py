@@ -0,0 +1,66 @@
+# queue_feed.py
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+# change ops (the "op" of every delta)
+FEED_ADD = "add"        # task appended at the back
+FEED_REMOVE = "remove"  # task removed
+FEED_FRONT = "front"    # any equal task removed, task inserted at the FRONT
+FEED_RESET = "reset"    # queue replaced/reloaded: fetch the full queue again
+
+FEED_WINDOW = 1000      # deltas kept for consumers that fall behind
+
+
+class QueueFeed:
+    """
+    Revisioned change log of the task queue.
+
+    Every queue change bumps `rev` by one and is kept as
+    {"rev": n, "op": ..., "task": {...}} in a bounded deque. Consumers ask for
+    "everything after rev X" and can block until something newer exists, so
+    they only transfer changes instead of the whole list.
+
+    Revisions start at the process start time in milliseconds, so they keep
+    increasing across restarts and a rev from a previous run is always older
+    than the window (consumer resyncs from a full snapshot).
+
+    publish() is called by the task store while it holds its lock, so
+    (rev, snapshot) read under the same lock always match.
+    """
+
+    def __init__(self, window: int = FEED_WINDOW):
+        self._cond = threading.Condition()
+        self._changes: deque = deque(maxlen=window)
+        self.rev = int(time.time() * 1000)
+        self._base = self.rev   # oldest rev a consumer can continue from
+
+    def publish(self, op: str, task: Optional[Dict[str, Any]] = None) -> int:
+        with self._cond:
+            self.rev += 1
+            if op == FEED_RESET:
+                self._changes.clear()
+                self._base = self.rev
+            else:
+                self._changes.append({"rev": self.rev, "op": op, "task": task})
+                if len(self._changes) == self._changes.maxlen:
+                    self._base = self._changes[0]["rev"] - 1
+            self._cond.notify_all()
+            return self.rev
+
+    def changes_since(self, rev: int) -> Tuple[int, Optional[List[Dict[str, Any]]]]:
+        """
+        (current rev, deltas after `rev`). Deltas are None when `rev` is too
+        old, from another run or a reset happened since; the consumer then
+        needs the full queue.
+        """
+        with self._cond:
+            if rev < self._base or rev > self.rev:
+                return self.rev, None
+            return self.rev, [c for c in self._changes if c["rev"] > rev]
+
+    def wait(self, rev: int, timeout: Optional[float]) -> bool:
+        """Blocks until the feed is past `rev` (True) or `timeout` runs out (False)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.rev != rev, timeout)
@@ -1,16 +1,36 @@
 # robot_data.py
 
-import time
 import datetime
-import requests 
+import json
+import os
+import threading
+from collections import deque
+
+import requests
 
 API_URL = "http://10.5.49.10:8000/robot-data"
 
+TEMPERATURE_QUERY = "pd 126 1 0 3"   # controller temperature (also trended by robot_sampler)
+
+# one pipelined burst per snapshot (client.send_batch), in this order
+QUERIES = (
+    ("Robot Position", "pd 3504"),                # actual joint angles in deg or mm
+    ("Controller Temperature", TEMPERATURE_QUERY),
+    ("Trajectory Time", "pd 3521"),
+    ("Speed", "pd 601"),                          # global speed in %
+)
+
+BUFFER_SIZE = 1000                 # snapshots waiting for upload (oldest dropped beyond this)
+UPLOAD_EVERY_S = 5.0
+POST_TIMEOUT_S = 5
+SPOOL_FILE = "robot_data_spool.jsonl"   # snapshots the endpoint did not take, uploaded first next time
+SPOOL_MAX_LINES = 10000            # oldest spooled snapshots dropped beyond this (trimmed to 90%)
 
-def _send_to_endpoint(payload: dict):
+
+def _send_to_endpoint(payload: dict, session=None):
     """Send robot data dict to the FastAPI endpoint."""
     try:
-        response = requests.post(API_URL, json=payload, timeout=5)
+        response = (session or requests).post(API_URL, json=payload, timeout=POST_TIMEOUT_S)
         # Optional: raise for HTTP errors
         response.raise_for_status()
         print(f"[robot_data] Sent data OK: {response.status_code}")
@@ -21,78 +41,186 @@ def _send_to_endpoint(payload: dict):
         return None
 
 
-def pf3400_rail(client, position_name: str, send: bool = True):
-    def get_value(command: str):
-        """Send command and return only the second part (after '0')."""
-        resp = client.SendCommand(command)
-        time.sleep(0.5)
-        if isinstance(resp, str):
-            parts = resp.split(" ", 1)  # split only once
-            if len(parts) > 1:
-                return parts[1].strip()
-        return resp  # fallback if unexpected
-
-    dt = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    robot_pos = get_value("pd 3504")   # Actual joint angles in deg or mm
-    robot_temp = get_value("pd 126 1 0 3")
-    robot_time = get_value("pd 3521")
-    robot_speed = get_value("pd 601")  # Global speed in %
+class TelemetryUploader:
+    """
+    Uploads robot_data snapshots off the motion thread.
+
+    enqueue() only appends to a bounded in-memory buffer; a worker thread
+    posts what has collected every UPLOAD_EVERY_S (one keep-alive session).
+    If the endpoint is unreachable the rest of the batch is appended to
+    SPOOL_FILE (JSON lines), which is uploaded, oldest first, before any new
+    snapshot once the endpoint answers again. The spool is bounded like the
+    buffer: past spool_max lines the oldest are dropped (counted in
+    stats["dropped"]), down to 90% so it is not rewritten on every spill.
+    """
+
+    def __init__(self, spool_file=SPOOL_FILE, size=BUFFER_SIZE, every_s=UPLOAD_EVERY_S,
+                 spool_max=SPOOL_MAX_LINES):
+        self.spool_file = spool_file
+        self.spool_max = spool_max
+        self.every_s = every_s
+        self.buffer = deque(maxlen=size)
+        self.stats = {"queued": 0, "sent": 0, "spooled": 0, "dropped": 0}
+        self._spool_lines = None   # lines in spool_file, counted on first use
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._session = requests.Session()
+
+    def enqueue(self, payload):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.stats["dropped"] += 1
+        self.buffer.append(payload)
+        self.stats["queued"] += 1
+        self.start()
+
+    def _post(self, payload):
+        return _send_to_endpoint(payload, self._session) is not None
+
+    def _spool_count(self):
+        if self._spool_lines is None:
+            try:
+                with open(self.spool_file, "r") as f:
+                    self._spool_lines = sum(1 for line in f if line.strip())
+            except FileNotFoundError:
+                self._spool_lines = 0
+        return self._spool_lines
+
+    def _spill(self, payloads):
+        try:
+            count = self._spool_count()
+            with open(self.spool_file, "a") as f:
+                for payload in payloads:
+                    f.write(json.dumps(payload) + "\n")
+            self._spool_lines = count + len(payloads)
+            self.stats["spooled"] += len(payloads)
+        except OSError as e:
+            self._spool_lines = None   # a partial append: recount next time
+            self.stats["dropped"] += len(payloads)
+            print(f"[robot_data] Could not spool {len(payloads)} snapshot(s): {e}")
+            return
+        if self._spool_lines > self.spool_max:
+            self._trim_spool()
+
+    def _trim_spool(self):
+        # drop the oldest lines, keeping 90% of spool_max
+        try:
+            with open(self.spool_file, "r") as f:
+                lines = [line for line in f if line.strip()]
+            keep = self.spool_max * 9 // 10
+            excess = len(lines) - keep
+            if excess > 0:
+                tmp = self.spool_file + ".tmp"
+                with open(tmp, "w") as f:
+                    f.writelines(lines[excess:])
+                os.replace(tmp, self.spool_file)
+                self.stats["dropped"] += excess
+                print(f"[robot_data] Spool full: dropped the {excess} oldest snapshot(s)")
+            self._spool_lines = min(len(lines), keep)
+        except OSError as e:
+            self._spool_lines = None
+            print(f"[robot_data] Could not trim spool: {e}")
+
+    def _upload_spool(self):
+        # True once the spool is empty; on the first failure the rest is kept, in order
+        if not os.path.exists(self.spool_file):
+            return True
+        with open(self.spool_file, "r") as f:
+            pending = [line for line in f if line.strip()]
+        for i, line in enumerate(pending):
+            try:
+                payload = json.loads(line)
+            except ValueError:
+                continue   # torn last line from a crash
+            if not self._post(payload):
+                tmp = self.spool_file + ".tmp"
+                with open(tmp, "w") as f:
+                    f.writelines(pending[i:])
+                os.replace(tmp, self.spool_file)
+                self._spool_lines = len(pending) - i
+                return False
+            self.stats["sent"] += 1
+        os.remove(self.spool_file)
+        self._spool_lines = 0
+        return True
+
+    def flush(self):
+        """Uploads the spool, then the buffer; whatever does not go through is spooled."""
+        with self._flush_lock:
+            batch = []
+            while self.buffer:
+                batch.append(self.buffer.popleft())
+            try:
+                online = self._upload_spool()
+            except OSError as e:
+                print(f"[robot_data] Spool upload failed: {e}")
+                online = False
+            for i, payload in enumerate(batch):
+                if not online or not self._post(payload):
+                    self._spill(batch[i:])
+                    return
+                self.stats["sent"] += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.every_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[robot_data] Upload worker: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="robot-data-upload", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the worker after a last flush (leftovers end up in the spool)."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2 * POST_TIMEOUT_S + 1)
+        self.flush()
+
+
+uploader = TelemetryUploader()
+
+
+def _snapshot(client, position_name, serial_number, position_type, send):
+    # one pipelined burst; telemetry never stops a routine (a failed read is logged and skipped)
+    try:
+        replies = client.send_batch([command for _, command in QUERIES])
+    except Exception as e:
+        print(f"[robot_data] Snapshot at {position_name} failed: {e}")
+        return None
 
     robot_data = {
         "Robot Name": "PF3400 SCARA Robot",
-        "Robot Serial Number": "FXB-2410-4C-01283(Rail))",
+        "Robot Serial Number": serial_number,
         "Asset ID": "INV025957",
         "Robot Location": "TIC 617",
-        "Timestamp": dt,
+        "Timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "Position Name": position_name,
-        "Robot Position": robot_pos,
-        "Robot Position Type": "Joint Position",
-        "Controller Temperature": robot_temp,
-        "Speed": robot_speed,
-        "Trajectory Time": robot_time
+        "Robot Position Type": position_type,
     }
+    for (field, _), reply in zip(QUERIES, replies):
+        # only the part after the "0" status
+        parts = reply.split(" ", 1)
+        robot_data[field] = parts[1].strip() if len(parts) > 1 else reply
 
     if send:
-        _send_to_endpoint(robot_data)
+        uploader.enqueue(robot_data)
 
     # Still return the data in case caller wants to log/use it
     return robot_data
 
 
-def pf3400_robot(client, position_name: str, send: bool = True):
-    def get_value(command: str):
-        """Send command and return only the second part (after '0')."""
-        resp = client.SendCommand(command)
-        time.sleep(0.5)
-        if isinstance(resp, str):
-            parts = resp.split(" ", 1)
-            if len(parts) > 1:
-                return parts[1].strip()
-        return resp
-
-    dt = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    robot_pos = get_value("pd 3504")
-    robot_temp = get_value("pd 126 1 0 3")
-    robot_time = get_value("pd 3521")
-    robot_speed = get_value("pd 601")
-
-    robot_data = {
-        "Robot Name": "PF3400 SCARA Robot",
-        "Robot Serial Number": "FXB-2410-4C-01283",
-        "Asset ID": "INV025957",
-        "Robot Location": "TIC 617",
-        "Timestamp": dt,
-        "Position Name": position_name,
-        "Robot Position": robot_pos,
-        "Robot Position Type": "Cartesian Position",
-        "Controller Temperature": robot_temp,
-        "Speed": robot_speed,
-        "Trajectory Time": robot_time
-    }
+def pf3400_rail(client, position_name: str, send: bool = True):
+    return _snapshot(client, position_name, "FXB-2410-4C-01283(Rail))", "Joint Position", send)
 
-    if send:
-        _send_to_endpoint(robot_data)
 
-    return robot_data
+def pf3400_robot(client, position_name: str, send: bool = True):
+    return _snapshot(client, position_name, "FXB-2410-4C-01283", "Cartesian Position", send)
@@ -0,0 +1,201 @@
+# robot_health.py
+
+import threading
+import time
+
+PROBE_COMMAND = "hp"       # read-only query; any reply proves the TCS is answering
+PROBE_IDLE_S = 15.0        # probe when the link has been quiet this long
+PROBE_TIMEOUT_S = 5.0      # a probe reply later than this counts as a dead link
+ATTACH_EVERY_S = 600.0     # re-attach while idle (what keep_robot_alive_loop used to do)
+BACKOFF_START_S = 1.0
+BACKOFF_MAX_S = 30.0
+
+STATE_CONNECTED = "connected"
+STATE_DOWN = "down"
+STATE_RECONNECTING = "reconnecting"
+
+# errors that mean the connection itself is gone (a "-..." reply is not one of them)
+LINK_ERRORS = (EOFError, OSError, TimeoutError)
+
+
+class LinkHealth:
+    """
+    Connection state and transparent reconnect for a TCS client
+    (pa_pyclient.PyClient / pa_asyncclient.SyncPyClient).
+
+    The client reports every exchange: note_ok() on any reply, note_failure()
+    on a connection-level error. The monitor thread (start()) probes the link
+    when it has been idle for probe_idle_s, re-attaches every attach_every_s,
+    and when the link is down tries one reconnect per tick, backing off
+    exponentially: Connect + InitTCS (mode, selectrobot) + "attach 1".
+
+    is_busy: callable, True while a task owns the robot. The monitor does
+    nothing then, not even reconnect (the task's own commands report failures).
+
+    The dispatcher calls ensure_ready() before handing out work, so a dropped
+    link is healed instead of failing the next task.
+    """
+
+    def __init__(self, client, is_busy=None, probe_idle_s=PROBE_IDLE_S,
+                 probe_timeout_s=PROBE_TIMEOUT_S, attach_every_s=ATTACH_EVERY_S):
+        self.client = client
+        self.is_busy = is_busy or (lambda: False)
+        self.probe_idle_s = probe_idle_s
+        self.probe_timeout_s = probe_timeout_s
+        self.attach_every_s = attach_every_s
+
+        self.state = STATE_CONNECTED
+        self.last_ok = time.monotonic()
+        self.last_attach = time.monotonic()
+        self.last_error = None
+        self.reconnects = 0
+        self.epoch = 0   # bumped on every link failure and reconnect: cached robot state is stale
+        self._retry_s = BACKOFF_START_S   # monitor: one reconnect attempt per backoff step
+        self._next_try = 0.0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def healthy(self):
+        return self.state == STATE_CONNECTED
+
+    def note_ok(self):
+        self.last_ok = time.monotonic()
+        if self.state == STATE_DOWN:
+            self.state = STATE_CONNECTED
+
+    def note_failure(self, error):
+        if self.state == STATE_CONNECTED:
+            print(f"[WARN] TCS link lost: {error}", flush=True)
+        self.epoch += 1
+        self.state = STATE_DOWN
+        self.last_error = str(error)
+
+    def status(self):
+        return {
+            "state": self.state,
+            "idle_s": round(time.monotonic() - self.last_ok, 1),
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        }
+
+    def probe(self):
+        """
+        Sends PROBE_COMMAND with a short timeout. Returns False only if the link
+        is dead; a link in use by another thread counts as alive (not probed).
+        """
+        if not self.client.io_lock.acquire(blocking=False):
+            return self.healthy
+        try:
+            self.client.SendCommand(PROBE_COMMAND, timeout=self.probe_timeout_s)
+            return True
+        except LINK_ERRORS:
+            return False
+        except Exception:
+            return True   # "-..." reply: the TCS is answering
+        finally:
+            self.client.io_lock.release()
+
+    def _attempt(self, deadline=None):
+        """
+        One Connect + InitTCS + "attach 1". Holds the client's io_lock only for
+        the attempt, so nothing else talks to a half-set-up link; gives up
+        waiting for the lock at `deadline`. Returns True if the link is up.
+        """
+        wait = -1 if deadline is None else max(0.0, deadline - time.monotonic())
+        if not self.client.io_lock.acquire(timeout=wait):
+            return self.healthy
+        try:
+            if self.healthy:
+                return True   # another thread got there first
+            self.state = STATE_RECONNECTING
+            try:
+                self.client.Disconnect()
+                self.client.Connect()
+                self.client.InitTCS()
+                self.client.SendCommand("attach 1")
+            except Exception as e:
+                self.state = STATE_DOWN
+                self.last_error = str(e)
+                return False
+
+            self.state = STATE_CONNECTED
+            self.last_ok = self.last_attach = time.monotonic()
+            self.reconnects += 1
+            self.epoch += 1
+            self._retry_s = BACKOFF_START_S
+            self._next_try = 0.0
+            print("✅ TCS link restored.", flush=True)
+            return True
+        finally:
+            self.client.io_lock.release()
+
+    def reconnect(self, deadline=None):
+        """
+        Rebuilds the session, retrying with exponential backoff until it works,
+        `deadline` (time.monotonic()) passes or the monitor is stopped.
+        The io_lock is released between attempts.
+        """
+        delay = BACKOFF_START_S
+        while not self._stop.is_set():
+            if self._attempt(deadline):
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            print(f"[WARN] TCS reconnect failed ({self.last_error}); retrying in {delay:.0f}s", flush=True)
+            self._stop.wait(delay)
+            delay = min(delay * 2, BACKOFF_MAX_S)
+        return False
+
+    def ensure_ready(self, timeout=60.0):
+        """True once the link is known good; probes a quiet link, reconnects a dead one."""
+        if self.healthy and time.monotonic() - self.last_ok < self.probe_idle_s:
+            return True
+        if self.healthy and self.probe():
+            return True
+        return self.reconnect(deadline=time.monotonic() + timeout)
+
+    def _attach(self):
+        if not self.client.io_lock.acquire(blocking=False):
+            return
+        try:
+            self.client.SendCommand("attach 1")
+            self.last_attach = time.monotonic()
+        except LINK_ERRORS:
+            pass
+        except Exception as e:
+            print(f"[WARN] Keep-alive attach failed: {e}", flush=True)
+        finally:
+            self.client.io_lock.release()
+
+    def _run(self):
+        while not self._stop.wait(1.0):
+            try:
+                if self.is_busy():
+                    continue   # never rebuild the session under a running task
+                now = time.monotonic()
+                if not self.healthy:
+                    if now >= self._next_try and not self._attempt(deadline=now + self._retry_s):
+                        print(f"[WARN] TCS reconnect failed ({self.last_error}); "
+                              f"retrying in {self._retry_s:.0f}s", flush=True)
+                        self._next_try = time.monotonic() + self._retry_s
+                        self._retry_s = min(self._retry_s * 2, BACKOFF_MAX_S)
+                    continue
+                if now - self.last_ok >= self.probe_idle_s:
+                    self.probe()
+                if self.healthy and now - self.last_attach >= self.attach_every_s:
+                    self._attach()
+            except Exception as e:
+                print(f"[WARN] TCS health monitor: {e}", flush=True)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="tcs-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
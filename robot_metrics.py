@@ -0,0 +1,159 @@
+# robot_metrics.py
+
+import json
+import time
+from collections import deque, namedtuple
+
+RING_SIZE = 4096          # last N commands kept in full
+SUB_BUCKET_BITS = 7       # histogram resolution: 2^-6 (~1.6%) relative error
+
+CODE_LINK = "link"        # no reply: connection lost / reply timed out
+
+CommandSample = namedtuple("CommandSample", "t_send t_reply verb command code tag")
+
+
+def command_verb(command):
+    parts = command.split(None, 1)
+    return parts[0].lower() if parts else ""
+
+
+def reply_code(response):
+    # "0 1017.83 ..." -> "0", "-1012 ..." -> "-1012"
+    parts = (response or "").split(None, 1)
+    return parts[0] if parts else ""
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of latencies in microseconds.
+
+    Values below 2^SUB_BUCKET_BITS get one bucket each; above that every
+    power of two is split into 2^(SUB_BUCKET_BITS-1) equal buckets, so the
+    relative error is bounded at any scale (1 ms waitforeom polls and
+    40 s motions alike) with a few hundred sparse counters.
+    """
+
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS):
+        self.sub_count = 1 << sub_bucket_bits
+        self.half = self.sub_count >> 1
+        self.bits = sub_bucket_bits
+        self.counts = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _index(self, v):
+        if v < self.sub_count:
+            return v
+        e = v.bit_length() - self.bits
+        return self.sub_count + (e - 1) * self.half + ((v >> e) - self.half)
+
+    def _upper(self, idx):
+        # highest value that lands in bucket idx
+        if idx < self.sub_count:
+            return idx
+        k = idx - self.sub_count
+        e = k // self.half + 1
+        return (((k % self.half) + self.half + 1) << e) - 1
+
+    def record(self, seconds):
+        v = max(0, int(seconds * 1e6))
+        idx = self._index(v)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.count += 1
+        self.total_us += v
+        self.min_us = v if self.min_us is None else min(self.min_us, v)
+        self.max_us = max(self.max_us, v)
+
+    def percentile(self, q):
+        """Latency (s) at quantile q (0..100), to the histogram's resolution."""
+        if not self.count:
+            return None
+        target = max(1, -(-self.count * q // 100))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= target:
+                return min(self._upper(idx), self.max_us) / 1e6
+        return self.max_us / 1e6
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_s": round(self.total_us / 1e6, 3),
+            "mean_s": round(self.total_us / self.count / 1e6, 4) if self.count else None,
+            "min_s": self.min_us / 1e6 if self.min_us is not None else None,
+            "p50_s": self.percentile(50),
+            "p90_s": self.percentile(90),
+            "p99_s": self.percentile(99),
+            "max_s": self.max_us / 1e6,
+        }
+
+
+class CommandMetrics:
+    """
+    Per-command latency record for a TCS client.
+
+    Every exchange is appended to a bounded ring (deque(maxlen): a single
+    atomic append, no lock, old samples fall off) and to a per-verb
+    LatencyHistogram. Writers are already serialized by the client's
+    io_lock; readers (/metrics/robot) only copy.
+
+    `tag` labels what the robot is doing (e.g. "1Station3" while that
+    crystalline routine runs) so time can be broken down per routine.
+    """
+
+    def __init__(self, size=RING_SIZE):
+        self.ring = deque(maxlen=size)
+        self.histograms = {}
+        self.by_tag = {}
+        self.tag = None
+        self.started = time.time()
+
+    def record(self, command, t_send, t_reply, code):
+        verb = command_verb(command)
+        self.ring.append(CommandSample(t_send, t_reply, verb, command, code, self.tag))
+
+        hist = self.histograms.get(verb)
+        if hist is None:
+            hist = self.histograms[verb] = LatencyHistogram()
+        hist.record(t_reply - t_send)
+
+        if self.tag is not None:
+            per_verb = self.by_tag.setdefault(self.tag, {})
+            count, total = per_verb.get(verb, (0, 0.0))
+            per_verb[verb] = (count + 1, total + (t_reply - t_send))
+
+    def recent(self, n=100):
+        samples = list(self.ring)[-n:] if n > 0 else []
+        return [
+            {**s._asdict(), "latency_s": round(s.t_reply - s.t_send, 6)}
+            for s in samples
+        ]
+
+    def summary(self):
+        verbs = {verb: h.summary() for verb, h in list(self.histograms.items())}
+        tags = {
+            tag: {verb: {"count": c, "total_s": round(t, 3)} for verb, (c, t) in list(per_verb.items())}
+            for tag, per_verb in list(self.by_tag.items())
+        }
+        return {
+            "since": self.started,
+            "commands": sum(v["count"] for v in verbs.values()),
+            # biggest time sinks first
+            "verbs": dict(sorted(verbs.items(), key=lambda kv: -kv[1]["total_s"])),
+            "by_tag": tags,
+        }
+
+    def dump(self, path):
+        """Writes summary + the whole ring to `path` (JSON). Returns the path."""
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "samples": self.recent(len(self.ring))}, f, indent=2)
+        return path
+
+    def reset(self):
+        self.ring.clear()
+        self.histograms = {}
+        self.by_tag = {}
+        self.started = time.time()
@@ -0,0 +1,204 @@
+# robot_sampler.py
+#
+# Robot state trend data (joint position, controller temperature, trajectory
+# time, speed) sampled over a separate status connection into a fixed-size
+# NumPy ring buffer; window() returns downsampled series for drift / thermal
+# checks. The command channel and the motion routines are never touched.
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from pa_asyncclient import AsyncPyClient
+from robot_data import TEMPERATURE_QUERY
+
+SAMPLE_EVERY_S = 2.0
+RING_SIZE = 43200                 # 24 h at SAMPLE_EVERY_S
+CONNECT_TIMEOUT_S = 5.0
+RETRY_START_S = 5.0               # reconnect backoff while the status connection is refused / lost
+RETRY_MAX_S = 300.0
+
+COLUMNS = ("t", "j1", "j2", "j3", "j4", "j5", "j6", "temperature", "trajectory_time", "speed")
+
+# one pipelined burst per sample: (command, first column it fills, number of values)
+QUERIES = (
+    ("pd 3504", 1, 6),            # joint positions (deg / mm)
+    (TEMPERATURE_QUERY, 7, 1),    # controller temperature, same reading robot_data uploads
+    ("pd 3521", 8, 1),            # trajectory time
+    ("pd 601", 9, 1),             # global speed %
+)
+
+
+class StateRing:
+    """
+    Fixed-size time series: one float64 row per sample (COLUMNS), oldest
+    rows overwritten. Missing values are NaN.
+    """
+
+    def __init__(self, size=RING_SIZE):
+        self.data = np.full((size, len(COLUMNS)), np.nan)
+        self.next = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        with self._lock:
+            self.data[self.next] = row
+            self.next = (self.next + 1) % len(self.data)
+            self.count = min(self.count + 1, len(self.data))
+
+    def rows(self):
+        """Copy of the stored rows, oldest first."""
+        with self._lock:
+            if self.count < len(self.data):
+                return self.data[:self.count].copy()
+            return np.concatenate((self.data[self.next:], self.data[:self.next]))
+
+    def latest(self):
+        with self._lock:
+            if not self.count:
+                return None
+            return dict(zip(COLUMNS, self.data[(self.next - 1) % len(self.data)].tolist()))
+
+    def window(self, seconds=3600.0, points=200, until=None):
+        """
+        The last `seconds` (ending at `until`, default now) averaged into at
+        most `points` equal time buckets, plus each bucket's min / max
+        temperature. Returns {"t": [...], column: [...], ...}; empty buckets
+        are left out, NaN becomes None.
+        """
+        until = time.time() if until is None else until
+        rows = self.rows()
+        rows = rows[(rows[:, 0] > until - seconds) & (rows[:, 0] <= until)]
+        if not len(rows) or points < 1:
+            return {name: [] for name in COLUMNS}
+
+        edges = np.linspace(until - seconds, until, points + 1)
+        bucket = np.clip(np.searchsorted(edges, rows[:, 0], side="left") - 1, 0, points - 1)
+        filled = np.bincount(bucket, minlength=points) > 0
+
+        out = {}
+        for i, name in enumerate(COLUMNS):
+            values = rows[:, i]
+            valid = ~np.isnan(values)
+            sums = np.bincount(bucket, weights=np.where(valid, values, 0.0), minlength=points)
+            counts = np.bincount(bucket, weights=valid.astype(float), minlength=points)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = sums / counts
+            out[name] = [None if np.isnan(v) else round(float(v), 4) for v in means[filled]]
+
+        temp = rows[:, COLUMNS.index("temperature")]
+        lo = np.full(points, np.inf)
+        hi = np.full(points, -np.inf)
+        ok = ~np.isnan(temp)
+        np.minimum.at(lo, bucket[ok], temp[ok])
+        np.maximum.at(hi, bucket[ok], temp[ok])
+        out["temperature_min"] = [None if np.isinf(v) else float(v) for v in lo[filled]]
+        out["temperature_max"] = [None if np.isinf(v) else float(v) for v in hi[filled]]
+        return out
+
+
+def _values(reply, count):
+    # "0 1017.830 -2.902 ..." -> [1017.83, -2.902, ...] (NaN for anything missing)
+    parts = reply.split()[1:1 + count]
+    values = []
+    for part in parts:
+        try:
+            values.append(float(part))
+        except ValueError:
+            values.append(np.nan)
+    return values + [np.nan] * (count - len(values))
+
+
+class StateSampler:
+    """
+    Samples QUERIES every `every_s` on its own TCS connection (asyncio
+    client on a private thread) into `ring`. If the controller refuses a
+    second connection the sampler keeps retrying with backoff and reports
+    the reason in status(); it never falls back to the command channel.
+    """
+
+    def __init__(self, host, port, every_s=SAMPLE_EVERY_S, ring=None):
+        self.host = host
+        self.port = port
+        self.every_s = every_s
+        self.ring = ring if ring is not None else StateRing()
+        self.connected = False
+        self.last_error = None
+        self.samples = 0
+        self._loop = None
+        self._stop = None
+        self._thread = None
+
+    def status(self):
+        return {
+            "connected": self.connected,
+            "status_port": self.port,
+            "samples": self.samples,
+            "buffered": len(self.ring),
+            "last_error": self.last_error,
+        }
+
+    async def _sample(self, client):
+        replies = await client.send_batch([command for command, _, _ in QUERIES], timeout=CONNECT_TIMEOUT_S)
+        row = np.full(len(COLUMNS), np.nan)
+        row[0] = time.time()
+        for (_, first, count), reply in zip(QUERIES, replies):
+            row[first:first + count] = _values(reply, count)
+        self.ring.append(row)
+        self.samples += 1
+
+    async def _main(self):
+        self._stop = asyncio.Event()
+        retry = RETRY_START_S
+        while not self._stop.is_set():
+            client = None
+            try:
+                client = AsyncPyClient(self.host, self.port, timeout=CONNECT_TIMEOUT_S, verbose=False)
+                await client.connect()
+                await client.init_tcs()
+                self.connected, self.last_error, retry = True, None, RETRY_START_S
+                print(f"✅ Robot state sampler connected ({self.host}:{self.port}).", flush=True)
+                while not self._stop.is_set():
+                    await self._sample(client)
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), self.every_s)
+                    except asyncio.TimeoutError:
+                        pass
+            except Exception as e:
+                if self.connected or self.last_error is None:
+                    print(f"[WARN] Robot state sampler: {e}; retrying in {retry:.0f}s", flush=True)
+                self.connected = False
+                self.last_error = str(e) or type(e).__name__
+            finally:
+                if client is not None:
+                    await client.close()
+            try:
+                await asyncio.wait_for(self._stop.wait(), retry)
+            except asyncio.TimeoutError:
+                retry = min(retry * 2, RETRY_MAX_S)
+        self.connected = False
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="robot-state-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._stop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout=CONNECT_TIMEOUT_S + 1)
@@ -0,0 +1,102 @@
+# robot_wait.py
+#
+# Waits on the state a routine actually needs (PLC bit, stable balance, ...)
+# instead of a fixed time.sleep, and a per-routine record of the idle time
+# that is left: fixed pads (pad()) and condition waits (wait_until()).
+
+import threading
+import time
+
+import S71200_PLC
+
+POLL_S = 0.05
+
+
+class WaitTimeout(TimeoutError):
+    """wait_until(): the condition did not hold within the timeout."""
+
+
+class IdleBudget:
+    """
+    Seconds each routine spent idle: "sleep" = fixed pads, "wait" = condition
+    waits (how long the state really took). report() puts the biggest fixed
+    sleepers first, the candidates for turning into a condition.
+    """
+
+    def __init__(self):
+        self.routines = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, routine, kind, seconds, timed_out=False):
+        with self._lock:
+            r = self.routines.setdefault(routine or "other", {
+                "sleep_s": 0.0, "sleeps": 0, "wait_s": 0.0, "waits": 0, "timeouts": 0,
+            })
+            r[kind + "_s"] += seconds
+            r[kind + "s"] += 1
+            if timed_out:
+                r["timeouts"] += 1
+
+    def report(self):
+        with self._lock:
+            routines = {name: dict(r) for name, r in self.routines.items()}
+        for r in routines.values():
+            r["sleep_s"] = round(r["sleep_s"], 3)
+            r["wait_s"] = round(r["wait_s"], 3)
+        return {
+            "since": self.started,
+            "sleep_s": round(sum(r["sleep_s"] for r in routines.values()), 3),
+            "wait_s": round(sum(r["wait_s"] for r in routines.values()), 3),
+            "routines": dict(sorted(routines.items(), key=lambda kv: -kv[1]["sleep_s"])),
+        }
+
+    def reset(self):
+        with self._lock:
+            self.routines = {}
+            self.started = time.time()
+
+
+IDLE = IdleBudget()
+
+
+def pad(seconds, routine=None):
+    """A fixed sleep that is still needed (no state to wait on); counted in IDLE."""
+    if seconds > 0:
+        time.sleep(seconds)
+    IDLE.record(routine, "sleep", seconds)
+
+
+def wait_until(condition, timeout, poll_s=POLL_S, routine=None, what="condition"):
+    """
+    Polls condition() until it returns something truthy and returns that.
+    Raises WaitTimeout after `timeout` seconds. The time taken is counted in IDLE.
+    """
+    start = time.monotonic()
+    while True:
+        value = condition()
+        elapsed = time.monotonic() - start
+        if value:
+            IDLE.record(routine, "wait", elapsed)
+            return value
+        if elapsed >= timeout:
+            IDLE.record(routine, "wait", elapsed, timed_out=True)
+            raise WaitTimeout(f"{what} not met within {timeout:.1f}s")
+        time.sleep(poll_s)
+
+
+# =========================
+# Conditions (for wait_until)
+# =========================
+def plc_input(byte_index, bit_index, value=True):
+    """PLC input %I<byte>.<bit> reads `value`."""
+    return lambda: S71200_PLC.read_input_bit(byte_index, bit_index, verbose=False) == value
+
+
+def stable_weight(balance):
+    """Balance reports a stable weight: returns the read_weight() result, else None."""
+    def condition():
+        result = balance.read_weight()
+        return result if result["success"] else None
+    return condition
+
@@ -0,0 +1,158 @@
+# scheduler.py
+import heapq
+import itertools
+import json
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# =========================
+# Scheduling policy (data)
+# =========================
+# Each task belongs to the FIRST class whose "match" fits it.
+# Lower rank runs first; within the same rank, enqueue order wins
+# (so "experiment" and "cleanup" below keep plain file order between them).
+#
+# match keys:
+#   - any canonical task field ("type", "cid", "rid", "exp_id") -> equality
+#   - "has_exp_id": True/False
+CLASS_PRIORITY_EXPERIMENT = "priority_experiment"
+CLASS_EXPERIMENT = "experiment"
+CLASS_CLEANUP = "cleanup"
+CLASS_OTHER = "other"
+
+SCHEDULER_POLICY: List[Dict[str, Any]] = [
+    {"name": CLASS_PRIORITY_EXPERIMENT, "rank": 0, "match": {"type": 1, "has_exp_id": True}},
+    {"name": CLASS_EXPERIMENT,          "rank": 1, "match": {"type": 1}},
+    {"name": CLASS_CLEANUP,             "rank": 1, "match": {"type": 2}},
+    {"name": CLASS_OTHER,               "rank": 1, "match": {}},
+]
+
+
+def _matches(match: Dict[str, Any], t: Dict[str, Any]) -> bool:
+    for k, v in match.items():
+        if k == "has_exp_id":
+            if (t.get("exp_id") is not None) != bool(v):
+                return False
+        elif t.get(k) != v:
+            return False
+    return True
+
+
+def classify(t: Dict[str, Any], policy: List[Dict[str, Any]] = SCHEDULER_POLICY) -> str:
+    for cls in policy:
+        if _matches(cls["match"], t):
+            return cls["name"]
+    raise ValueError(f"No scheduling class matches task {t} (policy needs a catch-all class)")
+
+
+def classes_except(keep: Iterable[str], policy: List[Dict[str, Any]] = SCHEDULER_POLICY) -> frozenset:
+    """Names of every class in `policy` except `keep` (a `blocked` set that allows only `keep`)."""
+    keep = set(keep)
+    return frozenset(cls["name"] for cls in policy if cls["name"] not in keep)
+
+
+def class_where(name: str, policy: List[Dict[str, Any]] = SCHEDULER_POLICY) -> Tuple[str, list]:
+    """
+    SQL WHERE fragment selecting exactly the tasks of class `name`
+    (its match, and none of the earlier classes). Used by the SQLite backend.
+    Columns: type, cid, rid, exp_id (JSON text), has_exp_id.
+    """
+    def frag(match: Dict[str, Any]) -> Tuple[str, list]:
+        parts, args = [], []
+        for k, v in match.items():
+            if k == "has_exp_id":
+                parts.append("has_exp_id = ?")
+                args.append(int(bool(v)))
+            elif k == "exp_id":
+                parts.append("exp_id = ?")
+                args.append(json.dumps(v))
+            else:
+                parts.append(f"{k} = ?")
+                args.append(v)
+        return (" AND ".join(parts) or "1"), args
+
+    where, args = [], []
+    for cls in policy:
+        sql, a = frag(cls["match"])
+        if cls["name"] == name:
+            where.append(f"({sql})")
+            args.extend(a)
+            return " AND ".join(where), args
+        where.append(f"NOT ({sql})")
+        args.extend(a)
+    raise KeyError(name)
+
+
+# =========================
+# Heap scheduler
+# =========================
+class Scheduler:
+    """
+    One min-heap per scheduling class, entries (enqueue_seq, key).
+
+    - push(front=True) gets a decreasing negative seq, so it sorts before
+      everything already queued (same meaning as "insert at index 0").
+    - discard() is lazy: the key is forgotten and its heap entry skipped when
+      it reaches the top.
+    - select(blocked) compares the heads of the non-blocked classes by
+      (rank, seq). Blocking a class (e.g. cleanup while sendvial=false) only
+      hides it from selection, nothing is reordered.
+
+    push / discard / select are O(log n) (times the small, fixed number of classes).
+    Keys are whatever the owning store uses (task_key()).
+    """
+
+    def __init__(self, policy: Optional[List[Dict[str, Any]]] = None):
+        self.policy = policy or SCHEDULER_POLICY
+        self._rank = {cls["name"]: cls["rank"] for cls in self.policy}
+        self.clear()
+
+    def clear(self) -> None:
+        self._heaps: Dict[str, List[Tuple[int, Hashable]]] = {name: [] for name in self._rank}
+        self._live: Dict[Hashable, Tuple[int, str]] = {}
+        self._counts: Dict[str, int] = {name: 0 for name in self._rank}
+        self._back = itertools.count(0)
+        self._front = itertools.count(-1, -1)
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def count(self, name: str) -> int:
+        return self._counts.get(name, 0)
+
+    def push(self, key: Hashable, t: Dict[str, Any], front: bool = False) -> None:
+        self.discard(key)
+        name = classify(t, self.policy)
+        seq = next(self._front) if front else next(self._back)
+        self._live[key] = (seq, name)
+        self._counts[name] += 1
+        heap = self._heaps[name]
+        heapq.heappush(heap, (seq, key))
+        if len(heap) > 64 and len(heap) > 2 * self._counts[name]:
+            # too many stale entries: rebuild from live ones
+            heap[:] = [(s, k) for s, k in heap if self._live.get(k) == (s, name)]
+            heapq.heapify(heap)
+
+    def discard(self, key: Hashable) -> None:
+        entry = self._live.pop(key, None)
+        if entry is not None:
+            self._counts[entry[1]] -= 1
+
+    def _head(self, name: str) -> Optional[Tuple[int, Hashable]]:
+        heap = self._heaps[name]
+        while heap:
+            seq, key = heap[0]
+            if self._live.get(key) == (seq, name):
+                return heap[0]
+            heapq.heappop(heap)   # stale (removed or re-pushed)
+        return None
+
+    def select(self, blocked: Iterable[str] = ()) -> Optional[Hashable]:
+        blocked = set(blocked)
+        best = None
+        for name, rank in self._rank.items():
+            if name in blocked:
+                continue
+            head = self._head(name)
+            if head is not None and (best is None or (rank, head[0]) < best[:2]):
+                best = (rank, head[0], head[1])
+        return best[2] if best else None
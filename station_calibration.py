@@ -0,0 +1,99 @@
+# station_calibration.py
+
+import json
+from pathlib import Path
+
+CALIBRATION_FILE = Path(__file__).resolve().parent / "station_calibration.json"
+CALIBRATION_VERSION = 1
+
+# per-station TCS parameters, in the order they are sent
+STATION_KEYS = ("rail", "stationtype", "palletorigin", "palletx", "pallety")
+ROBOT_KEYS = ("tool", "gripclosepos", "gripopenpos")
+
+TOLERANCE = 1e-3   # mm / deg: read-back values closer than this count as equal
+
+
+def load_calibration(path=CALIBRATION_FILE):
+    """
+    Reads station_calibration.json:
+      {"version": 1,
+       "robot":    {"tool": [...], "gripclosepos": x, "gripopenpos": x},
+       "stations": {"1": {"rail": x, "stationtype": [...], "palletorigin": [...],
+                          "palletx": [...], "pallety": [...]}, ...}}
+    Keys a station does not use (e.g. palletx for single-position stations) are left out.
+    """
+    with open(path, "r") as f:
+        cal = json.load(f)
+    if cal.get("version") != CALIBRATION_VERSION:
+        raise ValueError(f"{path}: unsupported calibration version {cal.get('version')!r}")
+    return cal
+
+
+def _values(v):
+    return list(v) if isinstance(v, (list, tuple)) else [v]
+
+
+def _fmt(x):
+    return str(x) if isinstance(x, int) else repr(float(x))
+
+
+def calibration_entries(cal):
+    """
+    [(query, set_command, values), ...] for every calibrated parameter.
+    The query is the command with only its station index (or nothing, for
+    robot-wide settings); the TCS answers it with the current values.
+    """
+    entries = []
+    for key in ROBOT_KEYS:
+        if key in cal.get("robot", {}):
+            values = _values(cal["robot"][key])
+            entries.append((key, " ".join([key] + [_fmt(x) for x in values]), values))
+
+    for station, params in sorted(cal.get("stations", {}).items(), key=lambda kv: int(kv[0])):
+        for key in STATION_KEYS:
+            if key in params:
+                values = _values(params[key])
+                query = f"{key} {station}"
+                entries.append((query, " ".join([query] + [_fmt(x) for x in values]), values))
+    return entries
+
+
+def _matches(reply, values):
+    # reply: "0 v1 v2 ..." (status code first)
+    parts = (reply or "").split()
+    if not parts or parts[0] != "0":
+        return False
+    try:
+        current = [float(x) for x in parts[1:]]
+    except ValueError:
+        return False
+    return len(current) == len(values) and all(abs(c - float(v)) <= TOLERANCE for c, v in zip(current, values))
+
+
+def apply_calibration(client, cal=None, force=False):
+    """
+    Brings the controller in line with the calibration file.
+
+    Reads back every parameter in one pipelined batch and sends (again as one
+    batch) only the set commands whose values differ. After a crash/restart
+    the controller usually still holds everything, so nothing is sent.
+    force=True, or a read-back that fails, sends the full set.
+    Returns the list of set commands sent.
+    """
+    cal = cal if cal is not None else load_calibration()
+    entries = calibration_entries(cal)
+
+    changed = entries
+    if not force:
+        try:
+            replies = client.send_batch([query for query, _, _ in entries])
+            changed = [e for e, reply in zip(entries, replies) if not _matches(reply, e[2])]
+        except Exception as e:
+            print(f"[WARN] Calibration read-back failed ({e}); sending full calibration.", flush=True)
+            changed = entries
+
+    commands = [cmd for _, cmd, _ in changed]
+    if commands:
+        client.send_batch(commands)
+    print(f"Calibration v{cal['version']}: {len(commands)} of {len(entries)} parameter(s) sent.", flush=True)
+    return commands
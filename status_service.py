@@ -11,7 +11,9 @@ app = FastAPI()
 
 STATUS_FILE = "status.json"
 TASK_API = "http://localhost:8000/add_task"
+ADD_TASKS_API = "http://localhost:8000/add_tasks"   # bulk: one queue write per check cycle
 QUEUE_API = "http://localhost:8000/queue"
+QUEUE_LONGPOLL_S = 25      # /queue?since=rev wait; the mirror gets changes as they happen
 RID_TO_LETTER = "ABCDEFGH"
 lock = threading.Lock()
 
@@ -50,11 +52,71 @@ def is_valid_status(entry):
     )
 
 
+def _task_key(t: dict):
+    return (t.get("type"), t.get("cid"), t.get("rid"), t.get("exp_id"))
+
+
+class QueueMirror:
+    """
+    Local copy of Station2's task queue, kept current by long-polling
+    /queue?since=rev: one full download, then only the add/remove/front deltas.
+    Until the first sync (or after an error) `synced` is False and callers
+    should ask /queue directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = set()
+        self.rev = None
+        self.synced = False
+
+    def contains(self, task: dict) -> bool:
+        with self._lock:
+            return _task_key(task) in self._keys
+
+    def _apply(self, body: dict):
+        with self._lock:
+            if "queue" in body:
+                self._keys = {_task_key(t) for t in body["queue"] if isinstance(t, dict)}
+            for c in body.get("changes", []):
+                t = c.get("task") or {}
+                if c.get("op") == "remove":
+                    self._keys.discard(_task_key(t))
+                elif c.get("op") in ("add", "front"):
+                    self._keys.add(_task_key(t))
+            self.rev = body.get("rev")
+            self.synced = True
+
+    def run(self):
+        while True:
+            try:
+                if self.rev is None:
+                    res = requests.get(QUEUE_API, timeout=5)
+                else:
+                    params = {"since": self.rev, "timeout": QUEUE_LONGPOLL_S}
+                    res = requests.get(QUEUE_API, params=params, timeout=QUEUE_LONGPOLL_S + 10)
+                res.raise_for_status()
+                self._apply(res.json())
+                if self.rev is None:
+                    time.sleep(5)   # Station2 without a change feed: plain polling
+            except Exception as e:
+                print(f"[WARN] Queue mirror out of sync: {e}")
+                self.synced = False
+                self.rev = None
+                time.sleep(5)
+
+
+queue_mirror = QueueMirror()
+
+
 def is_task_already_in_queue(task: dict) -> bool:
     """
     Station2 /queue now returns dict-based tasks.
     Compare dict-to-dict to avoid duplicate scheduling.
+    Answered from the local queue mirror while it is in sync.
     """
+    if queue_mirror.synced:
+        return queue_mirror.contains(task)
     try:
         res = requests.get(QUEUE_API, timeout=3)
         if res.ok:
@@ -90,6 +152,7 @@ def check_experiment_completions():
     while True:
         data = load_status()
         updated_status = []
+        cleanup_batch = []   # (status entry, cleanup task) sent together below
 
         for entry in data:
             exp_id = entry["exp_id"]
@@ -116,13 +179,8 @@ def check_experiment_completions():
                     if is_task_already_in_queue(cleanup_task):
                         print(f"⚠️ Cleanup task already in queue: {cleanup_task}")
                     else:
-                        try:
-                            print(f"🧹 Scheduling cleanup task: {cleanup_task}")
-                            requests.post(TASK_API, json={"task": cleanup_task}, timeout=5)
-                        except Exception as e:
-                            print(f"[ERROR] Failed to send cleanup task: {e}")
-                            # keep in status.json so we retry later
-                            updated_status.append(entry)
+                        print(f"🧹 Scheduling cleanup task: {cleanup_task}")
+                        cleanup_batch.append((entry, cleanup_task))
                 else:
                     updated_status.append(entry)
 
@@ -130,6 +188,16 @@ def check_experiment_completions():
                 print(f"[ERROR] Failed to check status for {exp_id}: {e}")
                 updated_status.append(entry)
 
+        if cleanup_batch:
+            try:
+                res = requests.post(ADD_TASKS_API, json={"tasks": [t for _, t in cleanup_batch]}, timeout=5)
+                res.raise_for_status()
+                print(f"🧹 {res.json().get('status')}")
+            except Exception as e:
+                print(f"[ERROR] Failed to send cleanup tasks: {e}")
+                # keep in status.json so we retry later
+                updated_status.extend(entry for entry, _ in cleanup_batch)
+
         save_status(updated_status)
         time.sleep(120)
 
@@ -155,6 +223,7 @@ def get_status():
 
 @app.on_event("startup")
 def start_background_checker():
+    threading.Thread(target=queue_mirror.run, daemon=True).start()
     thread = threading.Thread(target=check_experiment_completions, daemon=True)
     thread.start()
 
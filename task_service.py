@@ -1,80 +1,74 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 from typing import List
-from queue import Queue
 import uvicorn
-import json
-import threading
 import os
 
+from task_store import open_stores, normalize_task
+
 app = FastAPI()
 
 TASK_FILE = "tasks.json"
-task_queue = Queue()
-lock = threading.Lock()  # Ensures thread-safe file writes
+INITIATE_FILE = "initiate_task.json"
+TASK_DB = "csdfstation2.db"
+
+# Same store (and same files / advisory locks) as csdfstation2, so both
+# services can run at once without losing each other's updates.
+task_store, _ = open_stores(os.environ.get("CSDF_TASK_BACKEND", "json"), TASK_FILE, INITIATE_FILE, TASK_DB)
 
 class Task(BaseModel):
     task: List  # e.g., [1, 5, "A"]
 
-def load_tasks():
-    if os.path.exists(TASK_FILE):
-        with open(TASK_FILE, "r") as f:
-            tasks = json.load(f)
-            for task in tasks:
-                task_queue.put(task)
+def to_legacy(t):
+    # canonical dict -> [type, cid, rid(, exp_id)]
+    out = [t.get("type"), t.get("cid"), t.get("rid")]
+    if t.get("exp_id") is not None:
+        out.append(t.get("exp_id"))
+    return out
 
-def save_tasks():
-    with lock:
-        with open(TASK_FILE, "w") as f:
-            json.dump(list(task_queue.queue), f, indent=2)
+def legacy_queue():
+    return [to_legacy(t) for t in task_store.snapshot()]
 
 @app.on_event("startup")
 def startup_event():
-    load_tasks()
+    task_store.load()
 
 @app.post("/add_task")
 def add_task(task: Task):
-    if task.task in list(task_queue.queue):
+    nt = normalize_task(task.task)
+    if nt is None:
+        return {"status": "Invalid task format", "task": task.task}
+    if not task_store.append(nt):
         return {"status": "Task already exists", "task": task.task}
-    task_queue.put(task.task)
-    save_tasks()
     return {"status": "Task added", "task": task.task}
 
 @app.get("/next_task")
 def get_next_task():
-    if not task_queue.empty():
-        task = task_queue.get()
-        save_tasks()
-        return {"task": task}
-    return {"task": None}
+    t = task_store.pop()
+    return {"task": to_legacy(t) if t is not None else None}
 
 @app.get("/queue")
 def get_queue():
-    return {"queue": list(task_queue.queue)}
+    return {"queue": legacy_queue()}
 
 @app.get("/tasks")
 def get_tasks():
-    return {"tasks": list(task_queue.queue)}
+    return {"tasks": legacy_queue()}
 
 @app.post("/requeue_task")
 def requeue_task(task: Task):
-    task_queue.put(task.task)
-    save_tasks()
+    nt = normalize_task(task.task)
+    if nt is None:
+        return {"status": "Invalid task format", "task": task.task}
+    task_store.append(nt)
     return {"status": "Task requeued", "task": task.task}
 
 @app.post("/remove_task")
 def remove_task(task: Task):
-    temp = list(task_queue.queue)
-    try:
-        temp.remove(task.task)
-        with lock:
-            task_queue.queue.clear()
-            for t in temp:
-                task_queue.put(t)
-            save_tasks()
+    nt = normalize_task(task.task)
+    if nt is not None and task_store.remove(nt):
         return {"status": "Task removed", "task": task.task}
-    except ValueError:
-        return {"status": "Task not found in queue", "task": task.task}
+    return {"status": "Task not found in queue", "task": task.task}
 
 if __name__ == "__main__":
     uvicorn.run("task_service:app", host="0.0.0.0", port=8000, reload=True)
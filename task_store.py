@@ -0,0 +1,864 @@
+# task_store.py
+import os
+import json
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from scheduler import Scheduler, CLASS_PRIORITY_EXPERIMENT
+from queue_feed import FEED_ADD, FEED_FRONT, FEED_REMOVE, FEED_RESET
+from file_lock import FileLock
+
+RID_TO_LETTER = "ABCDEFGH"
+
+# pallet position of each rid letter: A-D -> row 1, E-H -> row 2
+PALLET_ROW_COL: Dict[str, Tuple[int, int]] = {
+    letter: (i // 4 + 1, i % 4 + 1) for i, letter in enumerate(RID_TO_LETTER)
+}
+
+# the rid spellings that actually occur (letters, 0..7, "0".."7"), resolved by one lookup
+_RID_LOOKUP: Dict[Any, str] = {}
+for _i, _letter in enumerate(RID_TO_LETTER):
+    _RID_LOOKUP[_letter] = _RID_LOOKUP[_letter.lower()] = _letter
+    _RID_LOOKUP[_i] = _RID_LOOKUP[str(_i)] = _letter
+
+
+# =========================
+# Task format helpers
+# =========================
+def rid_to_letter(rid_val) -> Optional[str]:
+    if type(rid_val) in (str, int):
+        letter = _RID_LOOKUP.get(rid_val)
+        if letter is not None:
+            return letter
+    if rid_val is None:
+        return None
+    s = str(rid_val).strip().upper()
+
+    # exact single letter A..H
+    if len(s) == 1 and s in RID_TO_LETTER:
+        return s
+
+    # pure integer 0..7
+    if s.isdigit():
+        try:
+            idx = int(s)
+            if 0 <= idx < len(RID_TO_LETTER):
+                return RID_TO_LETTER[idx]
+        except ValueError:
+            pass
+
+    # pick first A..H found anywhere (handles "A42", "B-1", etc.)
+    for ch in s:
+        if ch in RID_TO_LETTER:
+            return ch
+
+    # optional: if string starts with single digit 0..7, map that
+    if s and s[0] in "01234567":
+        return RID_TO_LETTER[int(s[0])]
+
+    return None
+
+
+def normalize_task(item: Union[Dict[str, Any], List[Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Normalizes task into keyword dict format:
+      {"type": int, "cid": int, "rid": "A".."H", "exp_id": optional int}
+    Also supports your "status json" style:
+      {"exp_id": 1609, "cid": 2, "rid": 0}  -> becomes {"type":1,"cid":2,"rid":"A","exp_id":1609}
+    """
+    # dict input
+    if isinstance(item, dict):
+        # status-style (no "type", rid numeric)
+        if "type" not in item and "exp_id" in item and "cid" in item and "rid" in item:
+            letter = rid_to_letter(item.get("rid"))
+            if not letter:
+                return None
+            return {
+                "type": 1,
+                "cid": int(item["cid"]),
+                "rid": letter,
+                "exp_id": int(item["exp_id"]),
+            }
+
+        # recommended task style
+        if "type" in item and "cid" in item and "rid" in item:
+            ttype = int(item["type"])
+            cid = int(item["cid"])
+            letter = rid_to_letter(item.get("rid"))
+            if not letter:
+                return None
+
+            out = {"type": ttype, "cid": cid, "rid": letter}
+            if "exp_id" in item and item["exp_id"] is not None:
+                out["exp_id"] = item["exp_id"]   # keep as-is (string or int)
+            return out
+
+        return None
+
+    # legacy list input
+    if isinstance(item, list) and len(item) >= 3:
+        try:
+            ttype = int(item[0])
+            cid = int(item[1])
+            letter = rid_to_letter(item[2])
+            if not letter:
+                return None
+
+            out = {"type": ttype, "cid": cid, "rid": letter}
+            if len(item) >= 4 and item[3] is not None:
+                out["exp_id"] = item[3]  # keep as-is
+            return out
+        except Exception:
+            return None
+
+    return None
+
+
+def task_equals(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    # strict equality on keys used by the system
+    keys = set(a.keys()) | set(b.keys())
+    for k in keys:
+        if a.get(k) != b.get(k):
+            return False
+    return True
+
+
+TaskKey = Tuple[Any, Any, Any, Any]
+
+
+def task_key(t: Dict[str, Any]) -> TaskKey:
+    """
+    Hashable identity of a canonical task (normalize_task output):
+      (type, cid, rid, exp_id or None)
+    For canonical tasks, task_key(a) == task_key(b) exactly when task_equals(a, b).
+    """
+    return (t.get("type"), t.get("cid"), t.get("rid"), t.get("exp_id"))
+
+
+_TASK_FIELDS = ("type", "cid", "rid", "exp_id")
+
+
+class TaskRecord(NamedTuple):
+    """
+    Immutable queue entry, built once from a canonical task (normalize_task
+    output) when it enters the store. row/col are the pallet position of rid,
+    so the executor does not derive them again.
+
+    get() reads it like the canonical dict, so task_key(), task_equals() and
+    scheduler.classify() accept records and dicts alike.
+    """
+    type: int
+    cid: int
+    rid: str
+    exp_id: Any = None
+    row: int = 0
+    col: int = 0
+
+    @classmethod
+    def from_task(cls, t: Union["TaskRecord", Dict[str, Any]]) -> "TaskRecord":
+        if isinstance(t, TaskRecord):
+            return t
+        row, col = PALLET_ROW_COL[t["rid"]]
+        return cls(t["type"], t["cid"], t["rid"], t.get("exp_id"), row, col)
+
+    @property
+    def key(self) -> TaskKey:
+        return (self.type, self.cid, self.rid, self.exp_id)
+
+    def get(self, k: str, default: Any = None) -> Any:
+        v = getattr(self, k) if k in _TASK_FIELDS else None
+        return default if v is None else v
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Canonical dict form (what tasks.json, the journal and the API carry)."""
+        out = {"type": self.type, "cid": self.cid, "rid": self.rid}
+        if self.exp_id is not None:
+            out["exp_id"] = self.exp_id
+        return out
+
+
+# =========================
+# File helpers
+# =========================
+def _atomic_write_json(path: str, data: Any) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)  # atomic replace
+
+
+def _read_json_list(path: str) -> List[Any]:
+    if not os.path.exists(path):
+        _atomic_write_json(path, [])
+        return []
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except Exception:
+        # reset corrupted file safely
+        _atomic_write_json(path, [])
+        return []
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int, int]]:
+    """(st_mtime_ns, st_size, st_ino) of `path`, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _read_journal(path: str, offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Reads a JSONL journal from byte `offset`. Returns (records, torn).
+    A torn last line (crash mid-append) is ignored, everything before it is
+    still replayed; torn=True tells the caller to compact before appending.
+    """
+    records: List[Dict[str, Any]] = []
+    if not os.path.exists(path):
+        return records, False
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    torn = bool(data) and not data.endswith(b"\n")
+    for line in data.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            print(f"[WARN] Ignoring torn journal record in {path}: {line[:80]!r}", flush=True)
+            torn = True
+            break
+        if isinstance(rec, dict):
+            records.append(rec)
+    return records, torn
+
+
+# =========================
+# Resident task store
+# =========================
+# journal operations (one JSON object per line)
+OP_SNAPSHOT = "snapshot"   # {"op":"snapshot","tasks":[...]}  always the first record
+OP_ADD      = "add"        # append unless duplicate
+OP_REMOVE   = "remove"     # remove first equal task
+OP_FRONT    = "front"      # move an existing task to the front
+OP_PRIORITY = "priority"   # remove duplicate + insert at front
+
+COMPACT_EVERY = 500        # journal records before tasks.json is rewritten
+
+# how each journal op is reported to on_change (queue_feed ops)
+_FEED_OPS = {OP_ADD: FEED_ADD, OP_REMOVE: FEED_REMOVE, OP_PRIORITY: FEED_FRONT, OP_FRONT: FEED_FRONT}
+
+# on_change(op, task dict or None): called under the store lock after every change
+ChangeListener = Callable[[str, Optional[Dict[str, Any]]], None]
+
+
+class TaskStore:
+    """
+    In-memory copy of tasks.json, loaded once and kept as TaskRecords.
+    Tasks are normalized before they reach the store (API endpoints) or while
+    loading tasks.json; nothing on the read path validates them again.
+
+    The queue itself is an OrderedDict keyed by task_key(), so duplicate
+    checks, removal and move-to-front are O(1). Secondary indexes map to
+    OrderedDicts with the same keys (all kept in queue order):
+      - by type          : {1: {key: task}, 2: {...}}
+      - by exp_id        : {1609: {...}}
+      - by (cid, rid)    : {(2, "A"): {...}}
+
+    Selection goes through a scheduler.Scheduler (heap per priority class),
+    so picking the next task, with or without blocked classes, is O(log n).
+
+    Persistence is an append-only write-ahead journal next to tasks.json
+    (tasks.journal.jsonl). Every mutation appends one versioned record
+    ({"v": n, "op": ..., "task": ...}) and fsyncs it, so enqueue/remove cost
+    stays O(1) however long the queue gets. Compaction rewrites tasks.json,
+    then restarts the journal with a snapshot record carrying the version and
+    the stat key of that tasks.json; it runs at startup and every
+    COMPACT_EVERY records.
+
+    Recovery: "journal snapshot + replay" is always the full queue. tasks.json
+    is only trusted on its own when its stat key no longer matches the one in
+    the snapshot (first run, edited by hand or by a legacy writer).
+
+    Several processes (csdfstation2, task_service, task_utils) can share the
+    same files. Every access holds an advisory lock on tasks.json.lock:
+    shared for reads, exclusive for mutations and compaction. Under it the
+    store compares the (tasks.json, journal) stat keys with what it saw last:
+      - unchanged        -> answer from memory, nothing is parsed
+      - journal grew     -> replay only the new records (versions must follow on)
+      - anything else    -> full reload (another process compacted, or tasks.json
+                            was edited)
+    snapshot() returns a cached list that is rebuilt only after a change.
+
+    Every change is also reported to `on_change` (add / remove / front, or
+    reset after a load or replace), e.g. QueueFeed.publish.
+    """
+
+    def __init__(self, path: str, lock: Optional[threading.RLock] = None,
+                 journal_path: Optional[str] = None, compact_every: int = COMPACT_EVERY,
+                 policy: Optional[List[Dict[str, Any]]] = None,
+                 on_change: Optional[ChangeListener] = None):
+        self.path = path
+        self.on_change = on_change
+        self.journal_path = journal_path or f"{os.path.splitext(path)[0]}.journal.jsonl"
+        self.compact_every = compact_every
+        self.lock = lock if lock is not None else threading.RLock()
+        self._flock = FileLock(f"{path}.lock")
+        self._loaded = False
+        self._version = 0           # v of the last journal record applied
+        self._journal_records = 0
+        self._journal_offset = 0    # bytes of the journal already applied
+        self._disk_key = None       # (tasks.json, journal) stat keys as last seen
+        self._snapshot: Optional[List[Dict[str, Any]]] = None
+        self._tasks: "OrderedDict[TaskKey, TaskRecord]" = OrderedDict()
+        self._by_type: Dict[int, "OrderedDict[TaskKey, TaskRecord]"] = {}
+        self._by_exp_id: Dict[Any, "OrderedDict[TaskKey, TaskRecord]"] = {}
+        self._by_slot: Dict[Tuple[int, str], "OrderedDict[TaskKey, TaskRecord]"] = {}
+        self._sched = Scheduler(policy)
+
+    # ---------- loading / persistence ----------
+    def load(self) -> None:
+        """
+        Rebuilds the queue from disk (snapshot + journal replay), normalizes
+        everything to dict-based tasks and compacts.
+        """
+        with self.lock, self._flock.exclusive():
+            self._reload(compact=True)
+
+    def _disk_state(self):
+        return (_stat_key(self.path), _stat_key(self.journal_path))
+
+    def _reload(self, compact: bool = False) -> None:
+        """Full reload from disk. Caller holds the exclusive file lock."""
+        records, torn = _read_journal(self.journal_path)
+        snap = records[0] if records and records[0].get("op") == OP_SNAPSHOT else None
+        tasks_key = _stat_key(self.path)
+        if snap is None:
+            use_journal = False
+        elif tasks_key is None:
+            use_journal = True
+        elif "tasks_file" in snap:
+            use_journal = snap["tasks_file"] == list(tasks_key)
+        else:
+            # journal from before versioning: the newer of the two files wins
+            use_journal = os.path.getmtime(self.journal_path) >= os.path.getmtime(self.path)
+
+        if use_journal:
+            raw = snap.get("tasks") or []
+            replay = records[1:]
+            version = snap.get("version", 0)
+        else:
+            if self._loaded:
+                print(f"[INFO] {self.path} changed outside the journal; reloading task queue.", flush=True)
+            raw = _read_json_list(self.path)
+            replay = []
+            version = max((rec.get("v", rec.get("version", 0)) for rec in records), default=0) + 1
+            compact = True
+
+        old_order = list(self._tasks)
+        self._clear()
+        for item in raw:
+            nt = normalize_task(item)
+            if nt is None or self._find(nt) is not None:
+                # skip invalid/duplicate entries (the snapshot below rewrites cleanly)
+                continue
+            self._insert(TaskRecord.from_task(nt))
+
+        for rec in replay:
+            t = rec.get("task")
+            if isinstance(t, dict):
+                self._apply(rec.get("op"), TaskRecord.from_task(t))
+            version = rec.get("v", version + 1)
+
+        self._version = version
+        self._loaded = True
+        self._journal_records = len(replay)
+        if compact or torn or self._journal_records >= self.compact_every:
+            self.compact()
+        else:
+            self._journal_offset = os.path.getsize(self.journal_path)
+            self._disk_key = self._disk_state()
+        if list(self._tasks) != old_order:
+            self._changed(FEED_RESET)
+
+    def _sync(self) -> bool:
+        """
+        Catches up with what other processes changed since we last looked.
+        Needs at least the shared file lock. Returns False if a full reload is
+        needed instead.
+        """
+        if not self._loaded:
+            return False
+        state = self._disk_state()
+        if state == self._disk_key:
+            return True
+
+        (tasks_key, journal_key), (old_tasks, old_journal) = state, self._disk_key
+        if (tasks_key != old_tasks or journal_key is None or old_journal is None
+                or journal_key[2] != old_journal[2] or journal_key[1] < self._journal_offset):
+            return False
+
+        records, torn = _read_journal(self.journal_path, self._journal_offset)
+        if torn:
+            return False
+        for rec in records:
+            if rec.get("v") != self._version + 1:
+                return False   # gap or rewrite: do not guess, reload
+            t = rec.get("task")
+            if isinstance(t, dict):
+                t = TaskRecord.from_task(t)
+                if self._apply(rec.get("op"), t):
+                    self._changed(_FEED_OPS[rec["op"]], t)
+            self._version = rec["v"]
+            self._journal_records += 1
+        self._journal_offset = journal_key[1]
+        self._disk_key = state
+        return True
+
+    @contextmanager
+    def _reading(self):
+        """Store lock + shared file lock, with memory caught up with disk."""
+        with self.lock:
+            with self._flock.shared():
+                if self._sync():
+                    yield
+                    return
+            with self._flock.exclusive():
+                if not self._sync():
+                    self._reload()
+                yield
+
+    @contextmanager
+    def _writing(self):
+        """Store lock + exclusive file lock, with memory caught up with disk."""
+        with self.lock, self._flock.exclusive():
+            if not self._sync():
+                self._reload()
+            yield
+
+    def compact(self) -> None:
+        """
+        Rewrites tasks.json, then restarts the journal with a snapshot of the
+        same state that records tasks.json's stat key. A crash between the two
+        leaves a tasks.json that no longer matches the old snapshot, so
+        recovery takes the (already complete) tasks.json.
+        """
+        with self.lock, self._flock.exclusive():
+            _atomic_write_json(self.path, self._dicts())
+            snap = {
+                "op": OP_SNAPSHOT,
+                "version": self._version,
+                "tasks_file": list(_stat_key(self.path)),
+                "tasks": self._dicts(),
+            }
+            tmp = f"{self.journal_path}.tmp"
+            with open(tmp, "w") as f:
+                f.write(json.dumps(snap) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.journal_path)
+            self._journal_records = 0
+            self._journal_offset = os.path.getsize(self.journal_path)
+            self._disk_key = self._disk_state()
+
+    def _log(self, op: str, t: TaskRecord) -> None:
+        self._log_many([(op, t)])
+
+    def _log_many(self, records: List[Tuple[str, TaskRecord]]) -> None:
+        """
+        Appends records with a single write + fsync (caller holds the
+        exclusive file lock). The journal is not kept open, so other processes
+        can replace it when they compact (Windows refuses to replace open files).
+        """
+        if not records:
+            return
+        lines = []
+        for op, t in records:
+            self._version += 1
+            lines.append(json.dumps({"v": self._version, "op": op, "task": t.as_dict()}) + "\n")
+        with open(self.journal_path, "a") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_records += len(records)
+        self._journal_offset = os.path.getsize(self.journal_path)
+        self._disk_key = self._disk_state()
+        if self._journal_records >= self.compact_every:
+            self.compact()
+
+    def _changed(self, op: str, t: Optional[TaskRecord] = None) -> None:
+        if self.on_change is not None:
+            self.on_change(op, t.as_dict() if t is not None else None)
+
+    def close(self) -> None:
+        with self.lock:
+            self._flock.close()
+
+    # ---------- indexes ----------
+    def _clear(self) -> None:
+        self._snapshot = None
+        self._tasks = OrderedDict()
+        self._by_type = {}
+        self._by_exp_id = {}
+        self._by_slot = {}
+        self._sched.clear()
+
+    def _dicts(self) -> List[Dict[str, Any]]:
+        return [t.as_dict() for t in self._tasks.values()]
+
+    def _buckets(self, t: TaskRecord):
+        yield self._by_type, t.type
+        yield self._by_slot, (t.cid, t.rid)
+        if t.exp_id is not None:
+            yield self._by_exp_id, t.exp_id
+
+    def _insert(self, t: TaskRecord, front: bool = False) -> None:
+        key = t.key
+        self._snapshot = None
+        self._tasks[key] = t
+        if front:
+            self._tasks.move_to_end(key, last=False)
+        self._sched.push(key, t, front=front)
+        for index, name in self._buckets(t):
+            bucket = index.setdefault(name, OrderedDict())
+            bucket[key] = t
+            if front:
+                bucket.move_to_end(key, last=False)
+
+    def _drop(self, t: TaskRecord) -> None:
+        key = t.key
+        self._snapshot = None
+        self._tasks.pop(key, None)
+        self._sched.discard(key)
+        for index, name in self._buckets(t):
+            bucket = index.get(name)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del index[name]
+
+    def _find(self, t: Union[TaskRecord, Dict[str, Any]]) -> Optional[TaskRecord]:
+        return self._tasks.get(task_key(t))
+
+    # ---------- reads ----------
+    def __len__(self) -> int:
+        with self._reading():
+            return len(self._tasks)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        Queue in order. The list is a fresh copy, the task dicts inside are
+        shared with other snapshot() callers until the next mutation, so treat
+        them as read-only.
+        """
+        with self._reading():
+            if self._snapshot is None:
+                self._snapshot = self._dicts()
+            return list(self._snapshot)
+
+    def contains(self, t: Dict[str, Any]) -> bool:
+        with self._reading():
+            return self._find(t) is not None
+
+    def has_type(self, ttype: int) -> bool:
+        with self._reading():
+            return bool(self._by_type.get(ttype))
+
+    def has_priority(self) -> bool:
+        with self._reading():
+            return self._sched.count(CLASS_PRIORITY_EXPERIMENT) > 0
+
+    def by_exp_id(self, exp_id: Any) -> List[Dict[str, Any]]:
+        with self._reading():
+            return [t.as_dict() for t in self._by_exp_id.get(exp_id, {}).values()]
+
+    def by_slot(self, cid: int, rid: str) -> List[Dict[str, Any]]:
+        with self._reading():
+            return [t.as_dict() for t in self._by_slot.get((cid, rid), {}).values()]
+
+    def select_next(self, blocked: Iterable[str] = ()) -> Optional[TaskRecord]:
+        """
+        Next task by scheduler.SCHEDULER_POLICY, skipping the `blocked` classes.
+        The queue itself is not reordered.
+        """
+        with self._reading():
+            key = self._sched.select(blocked)
+            return self._tasks[key] if key is not None else None
+
+    # ---------- mutations ----------
+    def _apply(self, op: Optional[str], t: TaskRecord) -> bool:
+        """
+        Applies one journal operation to memory. Shared by live mutations and
+        replay so both follow exactly the same rules. Returns True if the queue
+        changed.
+        """
+        existing = self._find(t)
+
+        if op == OP_ADD:
+            if existing is not None:
+                return False
+            self._insert(t)
+            return True
+
+        if op == OP_REMOVE:
+            if existing is None:
+                return False
+            self._drop(existing)
+            return True
+
+        if op == OP_PRIORITY:
+            if existing is not None:
+                self._drop(existing)
+            self._insert(t, front=True)
+            return True
+
+        if op == OP_FRONT:
+            if existing is None:
+                return False
+            self._drop(existing)
+            self._insert(existing, front=True)
+            return True
+
+        print(f"[WARN] Unknown task journal op: {op!r}", flush=True)
+        return False
+
+    def _mutate(self, op: str, t: Union[TaskRecord, Dict[str, Any]]) -> bool:
+        t = TaskRecord.from_task(t)
+        with self._writing():
+            if not self._apply(op, t):
+                return False
+            self._log(op, t)
+            self._changed(_FEED_OPS[op], t)
+            return True
+
+    def append(self, t: Dict[str, Any]) -> bool:
+        """Appends a canonical task unless an equal task is already queued."""
+        return self._mutate(OP_ADD, t)
+
+    def extend(self, tasks: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Appends many canonical tasks with ONE journal flush. Duplicates (already
+        queued, or earlier in the same batch) are skipped. Returns one bool per
+        input task: True if it was added.
+        """
+        tasks = [TaskRecord.from_task(t) for t in tasks]
+        with self._writing():
+            added = [self._apply(OP_ADD, t) for t in tasks]
+            self._log_many([(OP_ADD, t) for t, ok in zip(tasks, added) if ok])
+            for t, ok in zip(tasks, added):
+                if ok:
+                    self._changed(FEED_ADD, t)
+            return added
+
+    def push_front(self, t: Dict[str, Any]) -> None:
+        """Puts task at the FRONT of the queue, removing any duplicate."""
+        self._mutate(OP_PRIORITY, t)
+
+    def remove(self, t: Dict[str, Any]) -> bool:
+        """Removes the first task equal to `t`. Returns True if something was removed."""
+        return self._mutate(OP_REMOVE, t)
+
+    def pop(self) -> Optional[TaskRecord]:
+        """Removes and returns the first task in queue order (plain FIFO consumers)."""
+        with self._writing():
+            if not self._tasks:
+                return None
+            t = next(iter(self._tasks.values()))
+            self._mutate(OP_REMOVE, t)
+            return t
+
+    def replace(self, tasks: List[Dict[str, Any]]) -> None:
+        with self.lock, self._flock.exclusive():
+            self._clear()
+            for t in tasks:
+                if self._find(t) is None:
+                    self._insert(TaskRecord.from_task(t))
+            self._version += 1
+            self._loaded = True
+            self.compact()
+            self._changed(FEED_RESET)
+
+
+# =========================
+# Station-1 initiation queue (initiate_task.json)
+# =========================
+class InitiateQueue:
+    """
+    FIFO of Station-1 initiation payloads, persisted as initiate_task.json
+    (plain list, rewritten on compaction) plus an append-only journal
+    (initiate_task.journal.jsonl):
+      {"op": "snapshot", "next_id": n, "initiate_file": [stat key], "items": [[id, payload], ...]}
+      {"op": "push", "id": i, "payload": {...}}
+      {"op": "ack",  "id": i}
+
+    In memory it is a deque of pending (id, payload) plus the in-flight ids,
+    so push() is one fsync'd append, pop() touches no disk and len() is free.
+
+    At-least-once delivery: pop() only marks an item in flight; ack(id)
+    removes it for good once the initiation has finished. Anything popped but
+    never acked (crash mid-initiation) is pending again after a restart.
+
+    csdfstation2 is the only owner: the advisory lock on
+    initiate_task.json.lock keeps a second writer from interleaving, but the
+    queue is only read from disk by load().
+    """
+
+    def __init__(self, path: str, lock: Optional[threading.RLock] = None,
+                 journal_path: Optional[str] = None, compact_every: int = COMPACT_EVERY):
+        self.path = path
+        self.journal_path = journal_path or f"{os.path.splitext(path)[0]}.journal.jsonl"
+        self.compact_every = compact_every
+        self.lock = lock if lock is not None else threading.RLock()
+        self._flock = FileLock(f"{path}.lock")
+        self._loaded = False
+        self._pending: deque = deque()
+        self._inflight: "OrderedDict[int, dict]" = OrderedDict()
+        self._next_id = 0
+        self._journal_records = 0
+
+    # ---------- loading / persistence ----------
+    def load(self) -> None:
+        """Rebuilds the queue from disk; items that were in flight become pending again."""
+        with self.lock, self._flock.exclusive():
+            records, _ = _read_journal(self.journal_path)
+            snap = records[0] if records and records[0].get("op") == OP_SNAPSHOT else None
+            file_key = _stat_key(self.path)
+            use_journal = snap is not None and (file_key is None or snap.get("initiate_file") == list(file_key))
+
+            items: "OrderedDict[int, dict]" = OrderedDict()
+            if use_journal:
+                for item_id, payload in snap.get("items") or []:
+                    items[item_id] = payload
+                next_id = snap.get("next_id", len(items))
+                for rec in records[1:]:
+                    if rec.get("op") == "push":
+                        items[rec["id"]] = rec.get("payload") or {}
+                        next_id = max(next_id, rec["id"] + 1)
+                    elif rec.get("op") == "ack":
+                        items.pop(rec.get("id"), None)
+            else:
+                raw = _read_json_list(self.path)
+                items = OrderedDict(enumerate(raw))
+                next_id = len(raw)
+
+            self._pending = deque(items.items())
+            self._inflight = OrderedDict()
+            self._next_id = next_id
+            self._loaded = True
+            self.compact()
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def compact(self) -> None:
+        """Same order as TaskStore.compact: initiate_task.json first, then the journal snapshot."""
+        with self.lock, self._flock.exclusive():
+            items = list(self._inflight.items()) + list(self._pending)
+            _atomic_write_json(self.path, [payload for _, payload in items])
+            snap = {
+                "op": OP_SNAPSHOT,
+                "next_id": self._next_id,
+                "initiate_file": list(_stat_key(self.path)),
+                "items": [[item_id, payload] for item_id, payload in items],
+            }
+            tmp = f"{self.journal_path}.tmp"
+            with open(tmp, "w") as f:
+                f.write(json.dumps(snap) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.journal_path)
+            self._journal_records = 0
+
+    def _log(self, rec: Dict[str, Any]) -> None:
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps(rec) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_records += 1
+        if self._journal_records >= self.compact_every:
+            self.compact()
+
+    # ---------- queue ----------
+    def __len__(self) -> int:
+        """Pending items (in-flight ones are not counted)."""
+        with self.lock:
+            self._ensure_loaded()
+            return len(self._pending)
+
+    def snapshot(self) -> List[dict]:
+        with self.lock:
+            self._ensure_loaded()
+            return [payload for _, payload in self._pending]
+
+    def push(self, payload: dict) -> None:
+        with self.lock, self._flock.exclusive():
+            self._ensure_loaded()
+            item_id = self._next_id
+            self._next_id += 1
+            payload = payload or {}
+            # in memory first (as in TaskStore): a compaction triggered by _log snapshots _pending
+            self._pending.append((item_id, payload))
+            self._log({"op": "push", "id": item_id, "payload": payload})
+
+    def pop(self) -> Optional[Tuple[int, dict]]:
+        """
+        (id, payload) of the oldest pending item, or None. The item stays
+        on disk until ack(id).
+        """
+        with self.lock:
+            self._ensure_loaded()
+            if not self._pending:
+                return None
+            item_id, payload = self._pending.popleft()
+            self._inflight[item_id] = payload
+            return item_id, payload
+
+    def ack(self, item_id: int) -> None:
+        """Marks a popped item as done (removed for good)."""
+        with self.lock, self._flock.exclusive():
+            if self._inflight.pop(item_id, None) is not None:
+                self._log({"op": "ack", "id": item_id})
+
+    def close(self) -> None:
+        with self.lock:
+            self._flock.close()
+
+
+# =========================
+# Backend selection
+# =========================
+BACKEND_JSON = "json"
+BACKEND_SQLITE = "sqlite"
+
+
+def open_stores(backend: str, task_path: str, initiate_path: str, db_path: str,
+                lock: Optional[threading.RLock] = None, on_change: Optional[ChangeListener] = None):
+    """
+    Returns (task_store, initiate_queue) for the chosen backend:
+      - "json"   : tasks.json + journal, initiate_task.json
+      - "sqlite" : one SQLite database (WAL). Existing tasks.json and
+                   initiate_task.json are migrated into it on first open.
+    Nothing touches the disk until load() (or the first access).
+    on_change receives every task queue change (see TaskStore).
+    """
+    lock = lock if lock is not None else threading.RLock()
+    backend = (backend or BACKEND_JSON).strip().lower()
+
+    if backend == BACKEND_SQLITE:
+        from task_store_sqlite import SqliteDatabase, SqliteTaskStore, SqliteInitiateQueue
+        db = SqliteDatabase(db_path, lock, migrate_tasks_from=task_path,
+                            migrate_initiate_from=initiate_path)
+        return SqliteTaskStore(db, on_change=on_change), SqliteInitiateQueue(db)
+
+    if backend != BACKEND_JSON:
+        raise ValueError(f"Unknown task backend {backend!r} (expected 'json' or 'sqlite')")
+
+    return TaskStore(task_path, lock, on_change=on_change), InitiateQueue(initiate_path, lock)
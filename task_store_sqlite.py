@@ -0,0 +1,422 @@
+# task_store_sqlite.py
+import os
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from task_store import ChangeListener, TaskRecord, normalize_task
+from queue_feed import FEED_ADD, FEED_FRONT, FEED_REMOVE, FEED_RESET
+from scheduler import SCHEDULER_POLICY, CLASS_PRIORITY_EXPERIMENT, class_where
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    seq        INTEGER NOT NULL,            -- queue order (front = smallest)
+    type       INTEGER NOT NULL,
+    cid        INTEGER NOT NULL,
+    rid        TEXT    NOT NULL,
+    exp_id     TEXT,                        -- JSON encoded (keeps 101 vs "101"), NULL if absent
+    has_exp_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_select ON tasks(type, has_exp_id, seq);
+CREATE INDEX IF NOT EXISTS idx_tasks_seq    ON tasks(seq);
+DROP INDEX IF EXISTS idx_tasks_slot;
+CREATE INDEX IF NOT EXISTS idx_tasks_key    ON tasks(cid, rid, type, exp_id);  -- task_key() lookups
+
+CREATE TABLE IF NOT EXISTS initiate (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+TASK_COLUMNS = "id, type, cid, rid, exp_id"
+
+
+def _row_to_task(row) -> Dict[str, Any]:
+    t = {"type": row[1], "cid": row[2], "rid": row[3]}
+    if row[4] is not None:
+        t["exp_id"] = json.loads(row[4])
+    return t
+
+
+def _row_to_record(row) -> TaskRecord:
+    return TaskRecord.from_task(_row_to_task(row))
+
+
+def _exp_id_col(t: Dict[str, Any]) -> Optional[str]:
+    return json.dumps(t.get("exp_id")) if t.get("exp_id") is not None else None
+
+
+def _insert_task(cur: sqlite3.Cursor, t: Dict[str, Any], seq: int) -> None:
+    exp = _exp_id_col(t)
+    cur.execute(
+        "INSERT INTO tasks (seq, type, cid, rid, exp_id, has_exp_id) VALUES (?, ?, ?, ?, ?, ?)",
+        (seq, t.get("type"), t.get("cid"), t.get("rid"), exp, int(exp is not None)),
+    )
+
+
+def _read_json_file(path: Optional[str]) -> List[Any]:
+    if not path or not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except Exception as e:
+        print(f"[WARN] Could not read {path} for migration: {e}", flush=True)
+        return []
+
+
+class SqliteDatabase:
+    """
+    Shared SQLite connection for the task + initiation queues.
+
+    WAL mode, one connection guarded by the station lock (FastAPI threads and
+    the dispatcher all go through it). On first open the existing
+    tasks.json / initiate_task.json content is imported once.
+    """
+
+    def __init__(self, path: str, lock: Optional[threading.RLock] = None,
+                 migrate_tasks_from: Optional[str] = None,
+                 migrate_initiate_from: Optional[str] = None):
+        self.path = path
+        self.lock = lock if lock is not None else threading.RLock()
+        self.migrate_tasks_from = migrate_tasks_from
+        self.migrate_initiate_from = migrate_initiate_from
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        with self.lock:
+            if self._conn is None:
+                self.open()
+            return self._conn
+
+    def open(self) -> None:
+        with self.lock:
+            if self._conn is not None:
+                return
+            # timeout: other processes (task_service, task_utils) may hold the write lock briefly
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._migrate()
+
+    def _migrate(self) -> None:
+        conn = self._conn
+        done = conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()
+        if done:
+            return
+
+        tasks = []
+        for item in _read_json_file(self.migrate_tasks_from):
+            nt = normalize_task(item)
+            if nt is not None:
+                tasks.append(nt)
+        payloads = _read_json_file(self.migrate_initiate_from)
+
+        with self.transaction() as cur:
+            # re-check inside the write lock: another process may have migrated meanwhile
+            if cur.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone():
+                return
+            seq = cur.execute("SELECT COALESCE(MAX(seq), -1) FROM tasks").fetchone()[0]
+            for t in tasks:
+                seq += 1
+                _insert_task(cur, t, seq)
+            for p in payloads:
+                cur.execute("INSERT INTO initiate (payload) VALUES (?)", (json.dumps(p or {}),))
+            cur.execute("INSERT INTO meta (key, value) VALUES ('migrated', '1')")
+
+        if tasks or payloads:
+            print(f"[INFO] Migrated {len(tasks)} task(s) and {len(payloads)} initiation(s) into {self.path}",
+                  flush=True)
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def close(self) -> None:
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK under the station lock."""
+
+    def __init__(self, db: SqliteDatabase):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.db.lock.acquire()
+        self.cur = self.db.conn.cursor()
+        self.cur.execute("BEGIN IMMEDIATE")
+        return self.cur
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.cur.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db.lock.release()
+        return False
+
+
+class SqliteTaskStore:
+    """
+    Same interface as task_store.TaskStore, backed by the `tasks` table.
+    Selection runs one indexed query per scheduling class (head by seq) and
+    picks the best (rank, seq), same result as scheduler.Scheduler.
+    Changes are reported to `on_change` after commit, still under the lock,
+    so listeners see them in commit order.
+    """
+
+    def __init__(self, db: SqliteDatabase, policy: Optional[List[Dict[str, Any]]] = None,
+                 on_change: Optional[ChangeListener] = None):
+        self.db = db
+        self.on_change = on_change
+        self.lock = db.lock
+        self.policy = policy or SCHEDULER_POLICY
+        self._class_where = {cls["name"]: class_where(cls["name"], self.policy) for cls in self.policy}
+        self._snapshot: Optional[List[Dict[str, Any]]] = None
+        self._snapshot_key = None
+
+    # ---------- loading / persistence ----------
+    def load(self) -> None:
+        with self.lock:
+            self.db.open()
+            self._changed(FEED_RESET)
+
+    def compact(self) -> None:
+        with self.lock:
+            self.db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        self.db.close()
+
+    # ---------- helpers ----------
+    def _changed(self, op: str, t: Optional[Dict[str, Any]] = None) -> None:
+        if self.on_change is not None:
+            self.on_change(op, TaskRecord.from_task(t).as_dict() if t is not None else None)
+
+    def _find_id(self, cur, t: Dict[str, Any]) -> Optional[int]:
+        exp = _exp_id_col(t)
+        row = cur.execute(
+            "SELECT id FROM tasks WHERE cid = ? AND rid = ? AND type = ? AND exp_id IS ? "
+            "ORDER BY seq LIMIT 1",
+            (t.get("cid"), t.get("rid"), t.get("type"), exp),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _front_seq(self, cur) -> int:
+        return cur.execute("SELECT COALESCE(MIN(seq), 1) - 1 FROM tasks").fetchone()[0]
+
+    def _first(self, where: str = "", args=()) -> Optional[Dict[str, Any]]:
+        where = f"WHERE {where}" if where else ""
+        with self.lock:
+            row = self.db.conn.execute(
+                f"SELECT {TASK_COLUMNS} FROM tasks {where} ORDER BY seq LIMIT 1", args
+            ).fetchone()
+        return _row_to_task(row) if row else None
+
+    # ---------- reads ----------
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        Cached until the database changes: our own writes bump total_changes,
+        other connections bump PRAGMA data_version. Task dicts are shared
+        between callers, treat them as read-only.
+        """
+        with self.lock:
+            conn = self.db.conn
+            key = (conn.total_changes, conn.execute("PRAGMA data_version").fetchone()[0])
+            if self._snapshot is None or key != self._snapshot_key:
+                rows = conn.execute(f"SELECT {TASK_COLUMNS} FROM tasks ORDER BY seq").fetchall()
+                self._snapshot = [_row_to_task(r) for r in rows]
+                self._snapshot_key = key
+            return list(self._snapshot)
+
+    def contains(self, t: Dict[str, Any]) -> bool:
+        with self.lock:
+            return self._find_id(self.db.conn.cursor(), t) is not None
+
+    def has_type(self, ttype: int) -> bool:
+        return self._first("type = ?", (ttype,)) is not None
+
+    def has_priority(self) -> bool:
+        return self._first(*self._class_where[CLASS_PRIORITY_EXPERIMENT]) is not None
+
+    def by_exp_id(self, exp_id: Any) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.db.conn.execute(
+                f"SELECT {TASK_COLUMNS} FROM tasks WHERE exp_id = ? ORDER BY seq", (json.dumps(exp_id),)
+            ).fetchall()
+        return [_row_to_task(r) for r in rows]
+
+    def by_slot(self, cid: int, rid: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.db.conn.execute(
+                f"SELECT {TASK_COLUMNS} FROM tasks WHERE cid = ? AND rid = ? ORDER BY seq", (cid, rid)
+            ).fetchall()
+        return [_row_to_task(r) for r in rows]
+
+    def select_next(self, blocked: Iterable[str] = ()) -> Optional[TaskRecord]:
+        """
+        Next task by scheduler.SCHEDULER_POLICY, skipping the `blocked` classes.
+        """
+        blocked = set(blocked)
+        best = None
+        with self.lock:
+            for cls in self.policy:
+                if cls["name"] in blocked:
+                    continue
+                where, args = self._class_where[cls["name"]]
+                row = self.db.conn.execute(
+                    f"SELECT {TASK_COLUMNS}, seq FROM tasks WHERE {where} ORDER BY seq LIMIT 1", args
+                ).fetchone()
+                if row is not None and (best is None or (cls["rank"], row[5]) < best[:2]):
+                    best = (cls["rank"], row[5], row)
+        return _row_to_record(best[2]) if best else None
+
+    # ---------- mutations ----------
+    def append(self, t: Dict[str, Any]) -> bool:
+        with self.lock:
+            with self.db.transaction() as cur:
+                if self._find_id(cur, t) is not None:
+                    return False
+                seq = cur.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM tasks").fetchone()[0]
+                _insert_task(cur, t, seq)
+            self._changed(FEED_ADD, t)
+            return True
+
+    def extend(self, tasks: List[Dict[str, Any]]) -> List[bool]:
+        """Appends many tasks in one transaction; True per task that was added."""
+        added = []
+        with self.lock:
+            with self.db.transaction() as cur:
+                seq = cur.execute("SELECT COALESCE(MAX(seq), -1) FROM tasks").fetchone()[0]
+                for t in tasks:
+                    if self._find_id(cur, t) is not None:
+                        added.append(False)
+                        continue
+                    seq += 1
+                    _insert_task(cur, t, seq)
+                    added.append(True)
+            for t, ok in zip(tasks, added):
+                if ok:
+                    self._changed(FEED_ADD, t)
+        return added
+
+    def push_front(self, t: Dict[str, Any]) -> None:
+        with self.lock:
+            with self.db.transaction() as cur:
+                existing = self._find_id(cur, t)
+                if existing is not None:
+                    cur.execute("DELETE FROM tasks WHERE id = ?", (existing,))
+                _insert_task(cur, t, self._front_seq(cur))
+            self._changed(FEED_FRONT, t)
+
+    def remove(self, t: Dict[str, Any]) -> bool:
+        with self.lock:
+            with self.db.transaction() as cur:
+                existing = self._find_id(cur, t)
+                if existing is None:
+                    return False
+                cur.execute("DELETE FROM tasks WHERE id = ?", (existing,))
+            self._changed(FEED_REMOVE, t)
+            return True
+
+    def pop(self) -> Optional[TaskRecord]:
+        """Removes and returns the first task in queue order (plain FIFO consumers)."""
+        with self.lock:
+            with self.db.transaction() as cur:
+                row = cur.execute(f"SELECT {TASK_COLUMNS} FROM tasks ORDER BY seq LIMIT 1").fetchone()
+                if row is None:
+                    return None
+                cur.execute("DELETE FROM tasks WHERE id = ?", (row[0],))
+            t = _row_to_record(row)
+            self._changed(FEED_REMOVE, t)
+            return t
+
+    def replace(self, tasks: List[Dict[str, Any]]) -> None:
+        with self.lock:
+            with self.db.transaction() as cur:
+                cur.execute("DELETE FROM tasks")
+                for seq, t in enumerate(tasks):
+                    _insert_task(cur, t, seq)
+            self._changed(FEED_RESET)
+
+
+class SqliteInitiateQueue:
+    """
+    Same interface as task_store.InitiateQueue, backed by the `initiate` table.
+    pop() only moves an in-memory cursor past the row; ack(seq) deletes it.
+    Rows popped but never acked are delivered again after a restart.
+    """
+
+    def __init__(self, db: SqliteDatabase):
+        self.db = db
+        self.lock = db.lock
+        self._loaded = False
+        self._cursor = -1        # highest seq handed out by pop()
+        self._pending = 0
+
+    def load(self) -> None:
+        with self.lock:
+            self.db.open()
+            self._cursor = -1
+            self._pending = self.db.conn.execute("SELECT COUNT(*) FROM initiate").fetchone()[0]
+            self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def __len__(self) -> int:
+        with self.lock:
+            self._ensure_loaded()
+            return self._pending
+
+    def snapshot(self) -> List[dict]:
+        with self.lock:
+            self._ensure_loaded()
+            rows = self.db.conn.execute(
+                "SELECT payload FROM initiate WHERE seq > ? ORDER BY seq", (self._cursor,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def push(self, payload: dict) -> None:
+        with self.lock:
+            self._ensure_loaded()
+            with self.db.transaction() as cur:
+                cur.execute("INSERT INTO initiate (payload) VALUES (?)", (json.dumps(payload or {}),))
+            self._pending += 1
+
+    def pop(self) -> Optional[Tuple[int, dict]]:
+        with self.lock:
+            self._ensure_loaded()
+            row = self.db.conn.execute(
+                "SELECT seq, payload FROM initiate WHERE seq > ? ORDER BY seq LIMIT 1", (self._cursor,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._cursor = row[0]
+            self._pending -= 1
+            return row[0], json.loads(row[1])
+
+    def ack(self, item_id: int) -> None:
+        with self.db.transaction() as cur:
+            cur.execute("DELETE FROM initiate WHERE seq = ?", (item_id,))
+
+    def close(self) -> None:
+        self.db.close()
@@ -1,27 +1,29 @@
-import json
 import os
 
+from task_store import open_stores, normalize_task
+
 TASK_FILE = "tasks.json"
 
+# Shared, cross-process locked store (same files as csdfstation2 / task_service).
+# Reads are answered from memory until another process changes the queue.
+task_store, _ = open_stores(os.environ.get("CSDF_TASK_BACKEND", "json"), TASK_FILE,
+                            "initiate_task.json", "csdfstation2.db")
+
 def load_tasks():
-    if not os.path.exists(TASK_FILE):
-        return []
     try:
-        with open(TASK_FILE, "r") as f:
-            return json.load(f)
+        return task_store.snapshot()
     except Exception as e:
         print(f"[ERROR] Failed to load tasks: {e}")
         return []
 
 def save_tasks(tasks):
     try:
-        with open(TASK_FILE, "w") as f:
-            json.dump(tasks, f, indent=2)
+        task_store.replace([nt for nt in map(normalize_task, tasks) if nt is not None])
     except Exception as e:
         print(f"[ERROR] Failed to save tasks: {e}")
 
 def pop_task():
-    tasks = load_tasks()
-    if tasks:
-        tasks.pop(0)
-        save_tasks(tasks)
+    try:
+        task_store.pop()
+    except Exception as e:
+        print(f"[ERROR] Failed to pop task: {e}")
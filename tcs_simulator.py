@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# tcs_simulator.py
+#
+# Local stand-in for the PF400 TCS (text protocol on port 10100), so the
+# dispatcher and crystalline routines can run end-to-end without the robot:
+#
+#   python tcs_simulator.py --port 10100 --time-scale 0.1
+#   CSDF_ROBOT_HOST=127.0.0.1 python csdfstation2.py
+#
+# (balance, PLC/QR and dashboard services are separate and not simulated)
+
+import argparse
+import asyncio
+import json
+import time
+
+DEFAULT_PORT = 10100
+
+HOME_JOINTS = [1017.83, -2.902, 180.537, 178.063, 103.542, -934.686]
+
+# joint speeds at 100% profile speed: Z (mm/s), shoulder/elbow/wrist (deg/s), gripper (mm/s), rail (mm/s)
+JOINT_SPEED = [800.0, 360.0, 360.0, 720.0, 200.0, 1000.0]
+
+# fixed parts of each motion (s); pick/place/grasp run to completion before they reply
+MOTION_BASE_S = {
+    "movej": 0.3,
+    "moveoneaxis": 0.2,
+    "movec": 1.5,
+    "home": 20.0,
+    "pickplate": 6.0,
+    "placeplate": 6.0,
+    "graspplate": 0.8,
+}
+
+REPLY_OK = "0"
+REPLY_UNKNOWN = "-1000 *Unknown command*"
+
+
+class MotionModel:
+    """
+    Motion durations (simulated seconds):
+      movej / moveoneaxis: base + slowest joint's |delta| / (speed * profile%)
+      movec, home, pickplate, placeplate, graspplate: base only
+    time_scale multiplies every wait (0 = instant, for CI; 1 = real time).
+    """
+
+    def __init__(self, time_scale=1.0, base_s=None, joint_speed=None, default_speed_pct=50.0):
+        self.time_scale = time_scale
+        self.base_s = dict(MOTION_BASE_S, **(base_s or {}))
+        self.joint_speed = list(joint_speed or JOINT_SPEED)
+        self.default_speed_pct = default_speed_pct
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(time_scale=cfg.get("time_scale", 1.0), base_s=cfg.get("base_s"),
+                   joint_speed=cfg.get("joint_speed"), default_speed_pct=cfg.get("default_speed_pct", 50.0))
+
+    def joint_move(self, verb, start, target, speed_pct):
+        pct = max(speed_pct, 1.0) / 100.0
+        travel = max((abs(b - a) / (v * pct) for a, b, v in zip(start, target, self.joint_speed)), default=0.0)
+        return self.base_s.get(verb, 0.0) + travel
+
+    def fixed(self, verb):
+        return self.base_s.get(verb, 0.0)
+
+
+class RobotState:
+    """
+    One simulated controller (shared by all connections, like the real TCS).
+
+    Vials: `vials` is the set of station numbers holding a vial. pickplate n
+    takes it ("0 -1") or finds nothing ("0 0"); placeplate n puts the held
+    vial there. graspplate with a negative width closes the gripper: "0 -1"
+    if a vial is held or sits at the current station, else "0 0"; a positive
+    width opens it ("0 0").
+
+    script: {"<command prefix>": ["reply", ...]} replies consumed in order
+    before the model is asked, e.g. {"pickplate 3": ["0 0"]} for a missing
+    vial on the first pick at station 3.
+    """
+
+    def __init__(self, model, vials=(), script=None, high_power=True):
+        self.model = model
+        self.vials = set(int(v) for v in vials)
+        self.script = {k: list(v) for k, v in (script or {}).items()}
+        self.joints = list(HOME_JOINTS)
+        self.holding = False
+        self.station = None
+        self.high_power = high_power   # False: setup_robot sends "hp 1" and waits 10 s
+        self.homed = True
+        self.profiles = {}
+        self.params = {}
+        self.busy_until = 0.0      # loop time when the motion queue runs empty
+        self.commands = 0
+        self.motion_s = 0.0        # simulated motion time (unscaled)
+
+    def _scripted(self, command):
+        for prefix, replies in self.script.items():
+            if replies and (command == prefix or command.startswith(prefix + " ")):
+                return replies.pop(0)
+        return None
+
+    def _speed_pct(self, profile):
+        return self.profiles.get(profile, self.model.default_speed_pct)
+
+    def _queue_motion(self, seconds):
+        # motion commands reply at once and run one after another
+        loop = asyncio.get_running_loop()
+        self.busy_until = max(self.busy_until, loop.time()) + seconds * self.model.time_scale
+        self.motion_s += seconds
+
+    async def _wait_eom(self):
+        delay = self.busy_until - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _blocking_motion(self, verb):
+        await self._wait_eom()
+        seconds = self.model.fixed(verb)
+        self.motion_s += seconds
+        if seconds * self.model.time_scale > 0:
+            await asyncio.sleep(seconds * self.model.time_scale)
+
+    def _param(self, verb, args):
+        # calibration-style parameters: "<verb> [index]" queries, "<verb> [index] v..." sets
+        key_len = 0 if verb in ("tool", "gripclosepos", "gripopenpos") else 1
+        key = (verb,) + tuple(args[:key_len])
+        if len(args) > key_len:
+            self.params[key] = args[key_len:]
+            return REPLY_OK
+        return " ".join([REPLY_OK] + self.params.get(key, ["0"]))
+
+    async def execute(self, command):
+        self.commands += 1
+        scripted = self._scripted(command)
+
+        parts = command.split()
+        verb = parts[0].lower() if parts else ""
+        args = parts[1:]
+
+        try:
+            if verb in ("mode", "selectrobot", "attach"):
+                reply = REPLY_OK
+            elif verb == "hp":
+                if args:
+                    self.high_power = args[0] != "0"
+                    reply = REPLY_OK
+                else:
+                    reply = f"0 {int(self.high_power)}"
+            elif verb == "pd":
+                reply = self._pd(int(args[0]) if args else 0)
+            elif verb == "profile":
+                self.profiles[int(args[0])] = float(args[1])
+                reply = REPLY_OK
+            elif verb == "home":
+                self._queue_motion(self.model.fixed("home"))
+                self.joints = list(HOME_JOINTS)
+                self.homed = True
+                reply = REPLY_OK
+            elif verb == "movej":
+                target = [float(x) for x in args[1:7]]
+                self._queue_motion(self.model.joint_move("movej", self.joints, target, self._speed_pct(int(args[0]))))
+                self.joints = target
+                reply = REPLY_OK
+            elif verb == "moveoneaxis":
+                axis, pos = int(args[0]), float(args[1])
+                profile = int(args[2]) if len(args) > 2 else 1
+                target = list(self.joints)
+                target[axis - 1] = pos
+                self._queue_motion(self.model.joint_move("moveoneaxis", self.joints, target, self._speed_pct(profile)))
+                self.joints = target
+                reply = REPLY_OK
+            elif verb == "movec":
+                self._queue_motion(self.model.fixed("movec"))
+                reply = REPLY_OK
+            elif verb == "waitforeom":
+                await self._wait_eom()
+                reply = REPLY_OK
+            elif verb == "palletindex":
+                self.station = int(args[0])
+                reply = REPLY_OK
+            elif verb == "pickplate":
+                await self._blocking_motion(verb)
+                self.station = int(args[0])
+                if self.station in self.vials and not self.holding:
+                    self.vials.discard(self.station)
+                    self.holding = True
+                    reply = "0 -1"
+                else:
+                    reply = "0 0"
+            elif verb == "placeplate":
+                await self._blocking_motion(verb)
+                self.station = int(args[0])
+                if self.holding:
+                    self.vials.add(self.station)
+                    self.holding = False
+                reply = REPLY_OK
+            elif verb == "graspplate":
+                await self._blocking_motion(verb)
+                if float(args[0]) < 0:
+                    if not self.holding and self.station in self.vials:
+                        self.vials.discard(self.station)
+                        self.holding = True
+                    reply = "0 -1" if self.holding else "0 0"
+                else:
+                    if self.holding and self.station is not None:
+                        self.vials.add(self.station)
+                    self.holding = False
+                    reply = "0 0"
+            elif verb in ("tool", "gripclosepos", "gripopenpos", "rail", "stationtype",
+                          "palletorigin", "palletx", "pallety"):
+                reply = self._param(verb, args)
+            else:
+                reply = REPLY_UNKNOWN
+        except (IndexError, ValueError):
+            reply = f"-1001 *Invalid argument* {command}"
+
+        # scripted replies still run the motion (timing stays realistic)
+        return scripted if scripted is not None else reply
+
+    def _pd(self, dataid):
+        if dataid == 2800:
+            return f"0 {int(self.homed)}"
+        if dataid == 3504:
+            return "0 " + " ".join(f"{j:.3f}" for j in self.joints)
+        if dataid == 601:
+            return "0 100"
+        return "0 0"
+
+    def stats(self):
+        return {"commands": self.commands, "motion_s": round(self.motion_s, 3),
+                "vials": sorted(self.vials), "holding": self.holding}
+
+
+class TCSSimulator:
+    """asyncio TCP server: one command per line in, one "\\r\\n" reply line out (mode 1: echo line first)."""
+
+    def __init__(self, robot, host="127.0.0.1", port=DEFAULT_PORT, verbose=False):
+        self.robot = robot
+        self.host = host
+        self.port = port
+        self.verbose = verbose
+        self.server = None
+        self._lock = asyncio.Lock()
+
+    async def _handle(self, reader, writer):
+        mode = 0
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("ascii", "replace").strip()
+                if not command:
+                    continue
+                if command.split()[0].lower() == "pd":
+                    # status reads answer at once, even during another connection's waitforeom
+                    reply = await self.robot.execute(command)
+                else:
+                    # one controller: commands from several connections run one at a time
+                    async with self._lock:
+                        reply = await self.robot.execute(command)
+                if command.split()[0].lower() == "mode" and reply == REPLY_OK:
+                    mode = 1 if command.split()[1:] == ["1"] else 0
+                if self.verbose:
+                    print(f"{command!r} -> {reply!r}", flush=True)
+                if mode == 1:
+                    writer.write(command.encode("ascii") + b"\r\n")
+                writer.write(reply.encode("ascii") + b"\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+async def _serve(args):
+    cfg = {}
+    if args.config:
+        with open(args.config, "r") as f:
+            cfg = json.load(f)
+    if args.time_scale is not None:
+        cfg["time_scale"] = args.time_scale
+
+    robot = RobotState(MotionModel.from_config(cfg), vials=cfg.get("vials", range(1, 11)),
+                       script=cfg.get("script"), high_power=cfg.get("high_power", True))
+    sim = await TCSSimulator(robot, args.host, args.port, verbose=args.verbose).start()
+    print(f"TCS simulator on {sim.host}:{sim.port} (time scale {robot.model.time_scale})", flush=True)
+    started = time.time()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        stats = robot.stats()
+        stats["wall_s"] = round(time.time() - started, 3)
+        print(f"TCS simulator stats: {json.dumps(stats)}", flush=True)
+        await sim.stop()
+
+
+def main():
+    p = argparse.ArgumentParser(description="PF400 TCS simulator")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--time-scale", type=float, default=None, help="0 = instant motions, 1 = real time")
+    p.add_argument("--config", help='JSON: {"time_scale", "base_s", "joint_speed", "default_speed_pct", "vials", "script", "high_power"}')
+    p.add_argument("--verbose", action="store_true")
+    args = p.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
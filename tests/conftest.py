@@ -0,0 +1,9 @@
+# conftest.py
+#
+# The station modules live at the repository root (run as scripts, not a
+# package); make them importable from the tests.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
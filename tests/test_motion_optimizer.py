@@ -0,0 +1,107 @@
+# test_motion_optimizer.py
+import threading
+
+import pytest
+
+from motion_optimizer import HOME, MotionOptimizer
+from robot_health import LinkHealth
+
+SAFE = "movej 1 319.49 -1.398 124.000 179.77 103.064 -935.664"
+EXIT = "movej 1 732.082 -2.902 180.537 178.063 103.542 -935.664"   # folded arm, above the QR exit height
+RAIL = "moveoneaxis 6 999.837 1"
+
+
+class FakeClient:
+    def __init__(self):
+        self.io_lock = threading.RLock()
+        self.health = LinkHealth(self)
+        self.sent = []
+        self.fail_next = False
+
+    def SendCommand(self, command, timeout=None):
+        if self.fail_next:
+            self.fail_next = False
+            self.health.note_failure(EOFError("connection closed"))
+            raise EOFError("connection closed")
+        self.sent.append(command)
+        return "0"
+
+    def send_batch(self, commands, *args, **kwargs):
+        self.sent.extend(commands)
+        return ["0"] * len(commands)
+
+    def Disconnect(self):
+        pass
+
+    def Connect(self):
+        pass
+
+    def InitTCS(self):
+        pass
+
+
+@pytest.fixture
+def robot():
+    client = FakeClient()
+    return client, MotionOptimizer(client)
+
+
+def test_repeated_pose_is_skipped(robot):
+    client, opt = robot
+    opt.SendCommand(SAFE)
+    opt.SendCommand(SAFE)
+    assert client.sent == [SAFE]
+    assert opt.stats["moves_skipped"] == 1
+
+
+def test_home_before_safe_transition_is_dropped(robot):
+    client, opt = robot
+    opt.SendCommand(EXIT)
+    opt.SendCommand(HOME)
+    opt.SendCommand("waitforeom")
+    opt.SendCommand(RAIL)
+    assert client.sent == [EXIT, "waitforeom", RAIL]
+    assert opt.stats["homes_skipped"] == 1
+
+
+def test_link_failure_outside_the_wrapper_forgets_the_pose(robot):
+    client, opt = robot
+    opt.SendCommand(SAFE)
+    client.health.note_failure(EOFError("probe failed"))     # health probe on the inner client
+
+    opt.SendCommand(SAFE)
+    assert client.sent == [SAFE, SAFE]
+    assert opt.stats["pose_resets"] == 1
+
+
+def test_reconnect_forgets_the_pose(robot):
+    client, opt = robot
+    opt.SendCommand(HOME)                                    # arm at home
+    client.health.note_failure(EOFError("TCS restarted"))
+    assert client.health.reconnect()
+    client.sent.clear()
+
+    opt.SendCommand(HOME)
+    assert client.sent == [HOME]
+
+
+def test_deferred_home_is_sent_after_a_link_event(robot):
+    client, opt = robot
+    opt.SendCommand(EXIT)
+    opt.SendCommand(HOME)                                    # deferred: a rail move may follow
+    client.health.note_failure(EOFError("link lost"))
+    assert client.health.reconnect()
+    client.sent.clear()
+
+    opt.SendCommand(RAIL)
+    assert client.sent == [HOME, "waitforeom", RAIL]
+
+
+def test_failed_command_forgets_the_pose(robot):
+    client, opt = robot
+    opt.SendCommand(SAFE)
+    client.fail_next = True
+    with pytest.raises(EOFError):
+        opt.SendCommand(EXIT)
+    opt.SendCommand(SAFE)
+    assert client.sent == [SAFE, SAFE]
@@ -0,0 +1,87 @@
+# test_queue_feed.py
+import threading
+
+from queue_feed import FEED_ADD, FEED_FRONT, FEED_REMOVE, FEED_RESET, QueueFeed
+from task_store import TaskStore, task_key
+
+
+def apply(queue, changes):
+    """What a feed consumer does with the deltas."""
+    for c in changes:
+        t = c["task"]
+        if c["op"] in (FEED_REMOVE, FEED_FRONT):
+            queue = [x for x in queue if task_key(x) != task_key(t)]
+        if c["op"] == FEED_ADD:
+            queue.append(t)
+        elif c["op"] == FEED_FRONT:
+            queue.insert(0, t)
+    return queue
+
+
+def test_changes_since_returns_only_newer_deltas():
+    feed = QueueFeed()
+    start = feed.rev
+    r1 = feed.publish(FEED_ADD, {"n": 1})
+    r2 = feed.publish(FEED_REMOVE, {"n": 1})
+
+    assert (r1, r2) == (start + 1, start + 2)
+    rev, changes = feed.changes_since(start)
+    assert rev == r2 and [c["rev"] for c in changes] == [r1, r2]
+    assert feed.changes_since(r1) == (r2, [{"rev": r2, "op": FEED_REMOVE, "task": {"n": 1}}])
+    assert feed.changes_since(r2) == (r2, [])
+
+
+def test_unknown_rev_needs_full_resync():
+    feed = QueueFeed()
+    start = feed.rev
+    feed.publish(FEED_ADD, {"n": 1})
+
+    assert feed.changes_since(start - 1)[1] is None      # older than this run
+    assert feed.changes_since(feed.rev + 5)[1] is None   # from the future (another run)
+
+
+def test_reset_drops_deltas():
+    feed = QueueFeed()
+    before = feed.rev
+    feed.publish(FEED_ADD, {"n": 1})
+    reset = feed.publish(FEED_RESET)
+
+    assert feed.changes_since(before)[1] is None
+    assert feed.changes_since(reset) == (reset, [])
+
+
+def test_window_overflow_needs_full_resync():
+    feed = QueueFeed(window=3)
+    start = feed.rev
+    for n in range(5):
+        feed.publish(FEED_ADD, {"n": n})
+
+    assert feed.changes_since(start)[1] is None
+    rev, changes = feed.changes_since(feed.rev - 2)
+    assert [c["task"]["n"] for c in changes] == [3, 4]
+
+
+def test_wait_wakes_on_publish():
+    feed = QueueFeed()
+    rev = feed.rev
+    assert feed.wait(rev, timeout=0.01) is False
+
+    threading.Timer(0.05, feed.publish, (FEED_ADD, {"n": 1})).start()
+    assert feed.wait(rev, timeout=2) is True
+
+
+def test_deltas_reproduce_the_store(tmp_path):
+    feed = QueueFeed()
+    store = TaskStore(str(tmp_path / "tasks.json"), on_change=feed.publish)
+    store.load()
+    rev, mirror = feed.rev, store.snapshot()
+
+    store.append({"type": 1, "cid": 1, "rid": "A"})
+    store.extend([{"type": 2, "cid": 1, "rid": "B"}, {"type": 1, "cid": 2, "rid": "C"}])
+    store.push_front({"type": 1, "cid": 2, "rid": "C"})
+    store.remove({"type": 2, "cid": 1, "rid": "B"})
+    store.push_front({"type": 1, "cid": 3, "rid": "D", "exp_id": 4})
+
+    rev, changes = feed.changes_since(rev)
+    assert len(changes) == 6
+    assert apply(mirror, changes) == store.snapshot()
@@ -0,0 +1,66 @@
+# test_robot_data.py
+import json
+
+from robot_data import TelemetryUploader
+
+
+def spooled(uploader):
+    with open(uploader.spool_file) as f:
+        return [json.loads(line)["n"] for line in f if line.strip()]
+
+
+def make_uploader(tmp_path, monkeypatch, spool_max=10):
+    uploader = TelemetryUploader(spool_file=str(tmp_path / "spool.jsonl"), spool_max=spool_max)
+    uploader.online = False
+    uploader.posted = []
+
+    def post(payload):
+        if uploader.online:
+            uploader.posted.append(payload["n"])
+        return uploader.online
+
+    monkeypatch.setattr(uploader, "_post", post)
+    monkeypatch.setattr(uploader, "start", lambda: None)    # flush by hand, no worker thread
+    return uploader
+
+
+def test_spool_is_bounded_oldest_dropped(tmp_path, monkeypatch):
+    uploader = make_uploader(tmp_path, monkeypatch)
+    for n in range(25):
+        uploader.enqueue({"n": n})
+        if n % 4 == 3:
+            uploader.flush()
+    uploader.flush()
+
+    kept = spooled(uploader)
+    assert len(kept) <= 10
+    assert kept == list(range(25 - len(kept), 25))            # newest kept, in order
+    assert uploader.stats["dropped"] == 25 - len(kept) > 0
+    assert uploader.stats["spooled"] == 25
+
+
+def test_spool_drains_in_order_when_endpoint_returns(tmp_path, monkeypatch):
+    uploader = make_uploader(tmp_path, monkeypatch)
+    for n in range(6):
+        uploader.enqueue({"n": n})
+    uploader.flush()
+    assert spooled(uploader) == list(range(6))
+
+    uploader.online = True
+    uploader.enqueue({"n": 6})
+    uploader.flush()
+    assert uploader.posted == list(range(7))
+    assert not (tmp_path / "spool.jsonl").exists()
+
+
+def test_existing_spool_counts_towards_the_cap(tmp_path, monkeypatch):
+    with open(tmp_path / "spool.jsonl", "w") as f:
+        for n in range(9):
+            f.write(json.dumps({"n": n}) + "\n")
+    uploader = make_uploader(tmp_path, monkeypatch)
+    uploader.enqueue({"n": 9})
+    uploader.enqueue({"n": 10})
+    uploader.flush()
+
+    assert spooled(uploader) == list(range(2, 11))            # trimmed to 90% of the cap
+    assert uploader.stats["dropped"] == 2
@@ -0,0 +1,94 @@
+# test_scheduler.py
+import random
+
+from scheduler import (CLASS_CLEANUP, CLASS_EXPERIMENT, CLASS_OTHER, CLASS_PRIORITY_EXPERIMENT,
+                       Scheduler, classes_except, classify)
+from task_store import TaskStore, task_key
+
+TYPE1_ONLY = classes_except({CLASS_PRIORITY_EXPERIMENT, CLASS_EXPERIMENT})
+
+
+# ---------- baseline rules (csdfstation2 before the scheduler), on a plain list ----------
+def baseline_select(tasks):
+    for x in tasks:
+        if x.get("type") == 1 and "exp_id" in x:
+            return x
+    return tasks[0] if tasks else None
+
+
+def baseline_type1(tasks):
+    # bring_any_type1_to_front: priority experiment first, else any type-1
+    for x in tasks:
+        if x.get("type") == 1 and "exp_id" in x:
+            return x
+    for x in tasks:
+        if x.get("type") == 1:
+            return x
+    return None
+
+
+def random_task(rng):
+    t = {"type": rng.choice([1, 1, 2, 3]), "cid": rng.randint(1, 4), "rid": rng.choice("ABCDEFGH")}
+    if t["type"] == 1 and rng.random() < 0.3:
+        t["exp_id"] = rng.randint(1, 5)
+    return t
+
+
+def test_classify():
+    assert classify({"type": 1, "cid": 1, "rid": "A", "exp_id": 3}) == CLASS_PRIORITY_EXPERIMENT
+    assert classify({"type": 1, "cid": 1, "rid": "A"}) == CLASS_EXPERIMENT
+    assert classify({"type": 2, "cid": 1, "rid": "A"}) == CLASS_CLEANUP
+    assert classify({"type": 7, "cid": 1, "rid": "A"}) == CLASS_OTHER
+
+
+def test_type1_only_blocks_every_other_class():
+    assert TYPE1_ONLY == {CLASS_CLEANUP, CLASS_OTHER}
+
+
+def test_matches_baseline_order():
+    rng = random.Random(5)
+    for _ in range(50):
+        queue = []                  # the baseline tasks.json list
+        sched = Scheduler()
+        for _ in range(60):
+            roll = rng.random()
+            if roll < 0.6 or not queue:
+                t = random_task(rng)
+                if any(task_key(x) == task_key(t) for x in queue):
+                    continue
+                queue.append(t)
+                sched.push(task_key(t), t)
+            elif roll < 0.85:
+                t = queue.pop(rng.randrange(len(queue)))
+                sched.discard(task_key(t))
+            else:
+                t = queue.pop(rng.randrange(len(queue)))
+                queue.insert(0, t)
+                sched.push(task_key(t), t, front=True)
+
+            expected = baseline_select(queue)
+            assert sched.select() == (task_key(expected) if expected else None)
+            expected = baseline_type1(queue)
+            assert sched.select(TYPE1_ONLY) == (task_key(expected) if expected else None)
+
+
+def test_store_selection_survives_reload(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    store = TaskStore(path)
+    store.load()
+    tasks = [
+        {"type": 2, "cid": 1, "rid": "A"},
+        {"type": 3, "cid": 1, "rid": "B"},
+        {"type": 1, "cid": 2, "rid": "C"},
+        {"type": 1, "cid": 2, "rid": "D", "exp_id": 9},
+    ]
+    store.extend(tasks)
+    store.close()
+
+    reopened = TaskStore(path)
+    assert reopened.select_next().as_dict() == tasks[3]
+    reopened.remove(tasks[3])
+    assert reopened.select_next().as_dict() == tasks[0]
+    assert reopened.select_next(TYPE1_ONLY).as_dict() == tasks[2]
+    reopened.remove(tasks[2])
+    assert reopened.select_next(TYPE1_ONLY) is None      # the type-3 task is not a type-1
@@ -0,0 +1,133 @@
+# test_task_store.py
+import json
+
+from task_store import InitiateQueue, TaskStore
+
+
+def task(cid, rid, ttype=1, exp_id=None):
+    t = {"type": ttype, "cid": cid, "rid": rid}
+    if exp_id is not None:
+        t["exp_id"] = exp_id
+    return t
+
+
+def journal_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ---------- TaskStore ----------
+def test_mutations_are_journaled_not_rewritten(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    store = TaskStore(path)
+    store.load()
+    with open(path) as f:
+        on_disk = f.read()
+
+    store.append(task(1, "A"))
+    store.append(task(2, "B", ttype=2))
+
+    with open(path) as f:
+        assert f.read() == on_disk                      # tasks.json untouched
+    ops = [rec["op"] for rec in journal_lines(store.journal_path)]
+    assert ops[0] == "snapshot" and len(ops) == 3
+
+
+def test_journal_replay_restores_queue(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    store = TaskStore(path)
+    store.load()
+    store.append(task(1, "A"))
+    store.append(task(2, "B", ttype=2))
+    store.append(task(3, "C"))
+    store.remove(task(2, "B", ttype=2))
+    store.push_front(task(4, "D", exp_id=7))
+    expected = store.snapshot()
+    store.close()
+
+    reopened = TaskStore(path)
+    assert reopened.snapshot() == expected
+    assert [t["cid"] for t in expected] == [4, 1, 3]
+
+
+def test_replay_ignores_torn_last_record(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    store = TaskStore(path)
+    store.load()
+    store.append(task(1, "A"))
+    store.close()
+    with open(store.journal_path, "a") as f:
+        f.write('{"v": 99, "op": "add", "task": {"type": 1, "ci')   # crash mid-write
+
+    reopened = TaskStore(path)
+    assert reopened.snapshot() == [task(1, "A")]
+
+
+def test_compaction_keeps_every_task(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    store = TaskStore(path, compact_every=2)
+    store.load()
+    for cid in range(1, 6):
+        store.append(task(cid, "A"))
+    store.remove(task(3, "A"))
+    expected = store.snapshot()
+
+    assert len(journal_lines(store.journal_path)) <= 2   # snapshot + at most one record
+    store.close()
+
+    assert TaskStore(path).snapshot() == expected
+    assert [t["cid"] for t in expected] == [1, 2, 4, 5]
+
+
+def test_tasks_json_edited_by_hand_wins(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    store = TaskStore(path)
+    store.load()
+    store.append(task(1, "A"))
+    store.close()
+    with open(path, "w") as f:
+        json.dump([task(5, "E")], f)
+
+    assert TaskStore(path).snapshot() == [task(5, "E")]
+
+
+# ---------- InitiateQueue ----------
+def test_initiate_push_survives_compaction(tmp_path):
+    path = str(tmp_path / "initiate_task.json")
+    queue = InitiateQueue(path, compact_every=1)
+    queue.push({"a": 1})
+    queue.push({"b": 2})
+    assert queue.snapshot() == [{"a": 1}, {"b": 2}]
+    queue.close()
+
+    assert InitiateQueue(path).snapshot() == [{"a": 1}, {"b": 2}]
+
+
+def test_initiate_unacked_item_is_redelivered(tmp_path):
+    path = str(tmp_path / "initiate_task.json")
+    queue = InitiateQueue(path)
+    for n in range(3):
+        queue.push({"n": n})
+    first = queue.pop()
+    second = queue.pop()
+    queue.ack(first[0])
+    assert len(queue) == 1
+    queue.close()
+
+    reopened = InitiateQueue(path)
+    assert reopened.snapshot() == [second[1], {"n": 2}]
+    assert reopened.pop()[1] == {"n": 1}
+
+
+def test_initiate_replay_across_compactions(tmp_path):
+    path = str(tmp_path / "initiate_task.json")
+    queue = InitiateQueue(path, compact_every=3)
+    for n in range(10):
+        queue.push({"n": n})
+        if n % 3 == 2:
+            queue.ack(queue.pop()[0])
+    expected = queue.snapshot()
+    queue.close()
+
+    assert expected == [{"n": n} for n in range(3, 10)]
+    assert InitiateQueue(path).snapshot() == expected